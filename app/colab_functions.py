@@ -1,49 +1,403 @@
-import subprocess
-from contextlib import contextmanager
+import gzip
+import hashlib
+import itertools
+import json
+import shlex
+import tarfile
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from contextlib import closing, contextmanager
 from pathlib import Path
-from typing import BinaryIO, Iterator, Union
+from queue import Queue
+from threading import Thread
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Tuple,
+    TypeVar,
+    Union,
+)
+from uuid import uuid4
 
+import boto3
+from botocore.exceptions import IncompleteReadError
 from botocore.response import StreamingBody
-from paramiko import AutoAddPolicy, SSHClient, SSHException
+from paramiko import (
+    AuthenticationException,
+    Channel,
+    SFTPClient,
+    SSHClient,
+    SSHException,
+)
+from paramiko.file import BufferedFile
 
+from .compression import compress_chunks, select_codec
+from .concurrency import get_host_key
 from .constants import (
-    AWS_ACCESS_KEY_ID,
-    AWS_SECRET_ACCESS_KEY,
-    COLAB_OUTPUT_DIRECTORY,
+    COLAB_BUNDLE_COMPRESSION_LEVEL,
+    COLAB_CAS_DIRECTORY,
+    COLAB_CAS_MIN_SIZE,
+    COLAB_CHUNK_SIZE,
+    COLAB_TRANSFER_ATTEMPTS,
+    COLAB_TRANSFER_BACKOFF,
     COLAB_UPLOAD_DIRECTORY,
-    S3_ENDPOINT_URL,
 )
+from .content_store import StoreHost, content_index, get_content_key
 from .errors import FileIntegrityError
 from .logger import get_logger
-from .schemas import DownloadColabSchema
+from .metrics import COLAB_BACKEND, instrumented, record_transfer
+from .minio_functions import FileInfo, get_minio_object, get_presigned_url
+from .prefetch import PrefetchedObject
+from .remote_scripts import (
+    CAS_SCRIPT,
+    CHUNKS_SCRIPT,
+    DECOMPRESS_SCRIPT,
+    FETCH_SCRIPT,
+    JOB_SCRIPT,
+    MANIFEST_SCRIPT,
+)
+from .schemas import (
+    ColabCredentials,
+    DownloadColabSchema,
+    PlannedFileSchema,
+    SyncActions,
+    TransferMode,
+    TransferPlanSchema,
+    TransferStatsSchema,
+    UploadColabSchema,
+)
+from .ssh_pool import SSHLease, ssh_pool
+from .transfer_filters import (
+    get_transfer_filter,
+    is_minio_file_selected,
+    is_path_selected,
+)
 
 colab_logger = get_logger(__name__)
 
+# Transfer modes that use ssh channel per worker.
+CHANNEL_TRANSFER_MODES = (TransferMode.sftp, TransferMode.compressed)
+# Sync from colab has no bundle mode and transfers such files by sftp.
+SYNC_CHANNEL_TRANSFER_MODES = CHANNEL_TRANSFER_MODES + (TransferMode.bundle,)
+
+T = TypeVar("T")
+
 
 @contextmanager
-def connect_ssh_colab(credentials: DownloadColabSchema) -> Iterator[SSHClient]:
-    """Connects to colab via ssh with provided credentials and returns client.
+def connect_ssh_colab(
+    credentials: ColabCredentials, channels: int = 1
+) -> Iterator[SSHLease]:
+    """Leases pooled ssh connection to colab with provided credentials.
 
     :param credentials: credentials generated colab_ssh_config_script on colab.
-    :return: iterator that yields paramiko SSHClient.
+    :param channels: maximum number of channels that will be used.
+    :return: iterator that yields lease with paramiko SSHClient.
     """
-    ssh_client = SSHClient()
-    ssh_client.set_missing_host_key_policy(AutoAddPolicy())
+    lease = ssh_pool.acquire(credentials, channels)
     try:
-        ssh_client.connect(
-            hostname=credentials.host,
-            port=credentials.port,
-            username=credentials.user,
-            password=credentials.password,
-        )
-        yield ssh_client
+        yield lease
     except SSHException as error:
         colab_logger.warning(f"Colab SSH connection error: {error}")
         raise
     finally:
-        ssh_client.close()
+        ssh_pool.release(lease)
+
+
+@instrumented()
+def run_colab_transfer(
+    credentials: ColabCredentials,
+    channels: int,
+    transfer: Callable[[SSHLease], T],
+) -> T:
+    """Runs transfer over leased ssh connection retrying failed attempts.
+
+    Transfers are retried up to COLAB_TRANSFER_ATTEMPTS times with
+    exponential backoff if connection breaks or transferred content is
+    corrupted. Every attempt leases connection again, so broken connection is
+    replaced, and resumes from chunks transferred by previous attempts.
+    :param credentials: credentials generated colab_ssh_config_script on colab.
+    :param channels: maximum number of channels that will be used.
+    :param transfer: function that transfers files over leased connection.
+    :return: result of transfer.
+    """
+    attempt = 1
+    while True:
+        try:
+            with connect_ssh_colab(credentials, channels) as lease:
+                return transfer(lease)
+        except AuthenticationException:
+            raise
+        except (
+            SSHException,
+            OSError,
+            EOFError,
+            FileIntegrityError,
+        ) as error:
+            if attempt >= COLAB_TRANSFER_ATTEMPTS:
+                raise
+            delay = COLAB_TRANSFER_BACKOFF * 2 ** (attempt - 1)
+            colab_logger.warning(
+                f"Colab transfer attempt {attempt} failed: {error}, "
+                f"retrying in {delay} seconds"
+            )
+            time.sleep(delay)
+            attempt += 1
+
+
+def get_transfer_channels(transfer_info: DownloadColabSchema) -> int:
+    """Returns number of ssh channels used by transfer between minio and colab.
+
+    Only sftp and compressed transfers use channel per worker, other modes run
+    single remote command. Bundle sync from colab is sftp transfer.
+    :param transfer_info: transfer options.
+    :return: number of channels.
+    """
+    channel_modes: Tuple[TransferMode, ...] = SYNC_CHANNEL_TRANSFER_MODES
+    if isinstance(transfer_info, UploadColabSchema):
+        channel_modes = CHANNEL_TRANSFER_MODES
+    if transfer_info.transfer_mode in channel_modes:
+        return transfer_info.max_workers
+    return 1
 
 
+@instrumented("exec", COLAB_BACKEND)
+def run_colab_command(
+    ssh_client: SSHClient, command: str, input_data: bytes = b""
+) -> str:
+    """Executes command on colab and waits for it to finish.
+
+    If command exits with non-zero status - raises SSHException.
+    :param ssh_client: paramiko ssh client connected to colab session.
+    :param command: shell command to execute.
+    :param input_data: bytes to write into command stdin.
+    :return: decoded stdout of executed command.
+    """
+    stdin, stdout, stderr = ssh_client.exec_command(command)
+    if input_data:
+        stdin.write(input_data)
+        stdin.flush()
+    stdin.channel.shutdown_write()
+    output: str = stdout.read().decode()
+    if stdout.channel.recv_exit_status() != 0:
+        error = stderr.read().decode().strip()
+        colab_logger.warning(f"Colab command {command} error: {error}")
+        raise SSHException(f"Colab command {command} failed: {error}")
+    return output
+
+
+def get_python_command(script: str, arguments: List[str]) -> str:
+    """Returns shell command that runs python script from remote_scripts.
+
+    :param script: source code of python script to execute.
+    :param arguments: command line arguments of script.
+    :return: shell command.
+    """
+    return " ".join(
+        ["python3", "-c", shlex.quote(script), *map(shlex.quote, arguments)]
+    )
+
+
+@instrumented()
+def run_colab_script(
+    ssh_client: SSHClient, script: str, arguments: List[str], input_obj: Any
+) -> Any:
+    """Executes python script from remote_scripts on colab.
+
+    :param ssh_client: paramiko ssh client connected to colab session.
+    :param script: source code of python script to execute.
+    :param arguments: command line arguments of script.
+    :param input_obj: json serializable object to pass into script stdin.
+    :return: deserialized json output of script.
+    """
+    output = run_colab_command(
+        ssh_client,
+        get_python_command(script, arguments),
+        json.dumps(input_obj).encode(),
+    )
+    return json.loads(output)
+
+
+@instrumented("exec", COLAB_BACKEND)
+def start_colab_script(
+    ssh_client: SSHClient, script: str, arguments: List[str]
+) -> Channel:
+    """Starts long-running python script from remote_scripts on colab.
+
+    :param ssh_client: paramiko ssh client connected to colab session.
+    :param script: source code of python script to execute.
+    :param arguments: command line arguments of script.
+    :return: paramiko channel of running script.
+    """
+    try:
+        channel = ssh_client.get_transport().open_session()
+        channel.exec_command(get_python_command(script, arguments))
+    except SSHException as error:
+        colab_logger.warning(f"Colab script start error: {error}")
+        raise
+    return channel
+
+
+class RemoteChunks(NamedTuple):
+    size: int
+    md5: List[str]
+
+
+class PutFileResult(NamedTuple):
+    file_path: str
+    target_path: str
+    bytes_sent: int
+    chunks: RemoteChunks
+
+
+@instrumented()
+def get_colab_chunks(
+    ssh_client: SSHClient, file_paths: List[str], chunk_size: int
+) -> Dict[str, RemoteChunks]:
+    """Gets sizes and md5 of chunk_size chunks of files on colab.
+
+    Chunks of all files are collected with single remote command.
+    :param ssh_client: paramiko ssh client connected to colab session.
+    :param file_paths: absolute paths of files on colab.
+    :param chunk_size: size of chunks in bytes.
+    :return: dict with paths of existing files and their chunks.
+    """
+    if not file_paths:
+        return {}
+    chunks = run_colab_script(
+        ssh_client, CHUNKS_SCRIPT, [str(chunk_size)], file_paths
+    )
+    return {
+        file_path: RemoteChunks(size, md5)
+        for file_path, (size, md5) in chunks.items()
+    }
+
+
+def get_resumable_paths(file_names: List[str]) -> List[str]:
+    """Returns colab paths that may contain content of uploaded files.
+
+    :param file_names: names of files uploaded into /content/uploaded.
+    :return: paths of files and their ".part" files of interrupted uploads.
+    """
+    file_paths = [f"{COLAB_UPLOAD_DIRECTORY}/{name}" for name in file_names]
+    return [
+        path
+        for file_path in file_paths
+        for path in (file_path, f"{file_path}.part")
+    ]
+
+
+def read_file_chunks(
+    file_obj: Union[StreamingBody, BinaryIO], file_size: int, file_name: str
+) -> Iterator[bytes]:
+    """Reads file-like object by COLAB_CHUNK_SIZE chunks.
+
+    If file_obj is shorter than file_size - raises FileIntegrityError.
+    :param file_obj: file-like object to read.
+    :param file_size: size of file object in bytes.
+    :param file_name: name of file object.
+    :return: iterator over chunks.
+    """
+    for offset in range(0, file_size, COLAB_CHUNK_SIZE):
+        chunk_size = min(COLAB_CHUNK_SIZE, file_size - offset)
+        chunk = file_obj.read(chunk_size)
+        if len(chunk) != chunk_size:
+            colab_logger.warning(f"File {file_name} was truncated")
+            raise FileIntegrityError(
+                f"File {file_name} was corrupted during upload"
+            )
+        yield chunk
+
+
+@instrumented("put", COLAB_BACKEND)
+def put_file_to_colab(
+    sftp_session: SFTPClient,
+    file_obj: Union[StreamingBody, BinaryIO],
+    file_size: int,
+    file_name: str,
+    remote_chunks: Dict[str, RemoteChunks],
+) -> PutFileResult:
+    """Puts file into existing colab /content/uploaded directory by chunks.
+
+    File is written into "<name>.part" file that is renamed by
+    verify_colab_files, so uploaded files are never modified in place.
+    Chunks of COLAB_CHUNK_SIZE bytes with md5 equal to md5 of chunks written
+    by previous attempts are skipped, so interrupted uploads are resumed. If
+    file_obj is shorter than file_size - raises FileIntegrityError exception.
+    :param sftp_session: paramiko sftp session opened on colab.
+    :param file_obj: file-like object to upload.
+    :param file_size: size of file object in bytes.
+    :param file_name: name of uploaded file object.
+    :param remote_chunks: chunks of get_resumable_paths files from colab.
+    :return: paths of file, written file, number of sent bytes and chunks.
+    """
+    file_path = f"{COLAB_UPLOAD_DIRECTORY}/{file_name}"
+    target_path = f"{file_path}.part"
+    written_chunks = remote_chunks.get(target_path, RemoteChunks(0, []))
+    chunks_md5: List[str] = []
+    bytes_sent = 0
+    open_mode = "r+b" if target_path in remote_chunks else "wb"
+    with sftp_session.open(target_path, open_mode) as remote_file:
+        remote_file.set_pipelined(True)
+        chunks = read_file_chunks(file_obj, file_size, file_name)
+        for chunk_index, chunk in enumerate(chunks):
+            chunks_md5.append(hashlib.md5(chunk).hexdigest())
+            if (
+                chunk_index < len(written_chunks.md5)
+                and written_chunks.md5[chunk_index] == chunks_md5[-1]
+            ):
+                continue
+            remote_file.seek(chunk_index * COLAB_CHUNK_SIZE)
+            remote_file.write(chunk)
+            bytes_sent += len(chunk)
+        if written_chunks.size > file_size:
+            remote_file.truncate(file_size)
+    return PutFileResult(
+        file_path, target_path, bytes_sent, RemoteChunks(file_size, chunks_md5)
+    )
+
+
+@instrumented()
+def verify_colab_files(
+    ssh_client: SSHClient, put_results: List[PutFileResult]
+) -> None:
+    """Compares chunks of written colab files with chunks of sent files.
+
+    Verified ".part" files are renamed into uploaded files. If any chunk
+    differs - raises FileIntegrityError exception, so the next attempt will
+    send only corrupted chunks.
+    :param ssh_client: paramiko ssh client connected to colab session.
+    :param put_results: results of put_file_to_colab.
+    :return: None.
+    """
+    written_chunks = get_colab_chunks(
+        ssh_client,
+        [put_result.target_path for put_result in put_results],
+        COLAB_CHUNK_SIZE,
+    )
+    for put_result in put_results:
+        if written_chunks.get(put_result.target_path) != put_result.chunks:
+            file_name = Path(put_result.file_path).name
+            colab_logger.warning(f"File {file_name} was corrupted on colab")
+            raise FileIntegrityError(
+                f"File {file_name} was corrupted during upload"
+            )
+    renamed_files = [
+        f"mv -f -- {shlex.quote(put_result.target_path)} "
+        f"{shlex.quote(put_result.file_path)}"
+        for put_result in put_results
+        if put_result.target_path != put_result.file_path
+    ]
+    if renamed_files:
+        run_colab_command(ssh_client, " && ".join(renamed_files))
+
+
+@instrumented()
 def upload_file_to_colab(
     ssh_client: SSHClient,
     file_obj: Union[StreamingBody, BinaryIO],
@@ -59,124 +413,978 @@ def upload_file_to_colab(
     :param file_name: name of uploaded file object.
     :return: None.
     """
-    ssh_client.exec_command(f"mkdir -p {COLAB_UPLOAD_DIRECTORY}")
-    file_path = f"{COLAB_UPLOAD_DIRECTORY}/{file_name}"
+    run_colab_command(ssh_client, f"mkdir -p {COLAB_UPLOAD_DIRECTORY}")
+    remote_chunks = get_colab_chunks(
+        ssh_client, get_resumable_paths([file_name]), COLAB_CHUNK_SIZE
+    )
     with ssh_client.open_sftp() as sftp_session:
-        response = sftp_session.putfo(file_obj, file_path, confirm=True)
-    if response.st_size != file_size:
-        colab_logger.warning(f"File {file_name} was corrupted during upload")
-        raise FileIntegrityError(
-            f"File {file_name} was corrupted during upload"
+        put_result = put_file_to_colab(
+            sftp_session, file_obj, file_size, file_name, remote_chunks
         )
+    verify_colab_files(ssh_client, [put_result])
 
 
-def execute_script(ssh_client: SSHClient, script_name: str) -> None:
-    """Executes uploaded script with provided script_name on colab.
+@contextmanager
+def open_sftp_sessions(
+    ssh_client: SSHClient, sessions_number: int
+) -> Iterator["Queue[SFTPClient]"]:
+    """Opens pool of sftp sessions over single ssh connection to colab.
 
-    If script has .ipynb extension - firstly converts script to .py extension.
+    Sessions are shared between upload workers: each worker takes session
+    from queue for a single file and puts it back after upload.
     :param ssh_client: paramiko ssh client connected to colab session.
-    :param script_name: name of script to execute
-    :return: None.
+    :param sessions_number: number of sftp channels to open.
+    :return: iterator that yields queue with opened sftp sessions.
     """
-    run_command = "python {0}"
-    script_name_path = Path(f"{COLAB_UPLOAD_DIRECTORY}/{script_name}")
-    if script_name_path.suffix == ".ipynb":
-        colab_logger.info(
-            f"Convert script {script_name_path} from ipynb to py"
-        )
-        try:
-            run_command = (
-                f"jupyter nbconvert {script_name_path} --to python; "
-                f"rm {script_name_path}; {run_command}"
+    sessions: "Queue[SFTPClient]" = Queue()
+    opened_sessions = []
+    try:
+        for _ in range(sessions_number):
+            sftp_session = ssh_client.open_sftp()
+            opened_sessions.append(sftp_session)
+            sessions.put(sftp_session)
+        yield sessions
+    finally:
+        for sftp_session in opened_sessions:
+            sftp_session.close()
+
+
+def _upload_minio_object_to_colab(
+    minio_client: boto3.client,
+    bucket: str,
+    file_obj: Dict[str, Any],
+    sessions: "Queue[SFTPClient]",
+    remote_chunks: Dict[str, RemoteChunks],
+) -> PutFileResult:
+    """Streams single minio object into colab using free sftp session.
+
+    Object is prefetched by parallel ranged GETs while chunks are written to
+    colab, chunks equal to chunks of seeded ".part" file aren't sent.
+    :param minio_client: boto3 client connected to minio storage.
+    :param bucket: bucket to stream file from.
+    :param file_obj: object properties from list_minio_prefix_files.
+    :param sessions: queue with opened sftp sessions.
+    :param remote_chunks: chunks of get_resumable_paths files from colab.
+    :return: result of put_file_to_colab.
+    """
+    file_key, file_size = file_obj["Key"], file_obj["Size"]
+    sftp_session = sessions.get()
+    try:
+        with closing(
+            PrefetchedObject(
+                minio_client, bucket, file_key, file_size, file_obj["ETag"]
             )
-            script_name_path = script_name_path.with_suffix(".py")
-        except SSHException as error:
-            colab_logger.warning(f"Script conversion error: {error}")
+        ) as file_object:
+            return put_file_to_colab(
+                sftp_session,
+                file_object,
+                file_size,
+                Path(file_key).name,
+                remote_chunks,
+            )
+    finally:
+        sessions.put(sftp_session)
+
+
+def seed_part_files(
+    ssh_client: SSHClient,
+    files: FileInfo,
+    remote_chunks: Dict[str, RemoteChunks],
+) -> Dict[str, RemoteChunks]:
+    """Copies colab files overwritten by objects of the same size to ".part".
+
+    Uploads of such objects resume copied ".part" files, so object is read
+    from minio once and only chunks that differ from existing file are sent.
+    Files are copied with single remote command.
+    :param ssh_client: paramiko ssh client connected to colab session.
+    :param files: minio objects properties from list_minio_prefix_files.
+    :param remote_chunks: chunks of get_resumable_paths files from colab.
+    :return: chunks of seeded ".part" files.
+    """
+    seeded_chunks = {}
+    for file_obj in files:
+        file_path = f"{COLAB_UPLOAD_DIRECTORY}/{Path(file_obj['Key']).name}"
+        existing_chunks = remote_chunks.get(file_path)
+        if (
+            existing_chunks is not None
+            and existing_chunks.size == file_obj["Size"]
+            and f"{file_path}.part" not in remote_chunks
+        ):
+            seeded_chunks[f"{file_path}.part"] = existing_chunks
+    if seeded_chunks:
+        run_colab_command(
+            ssh_client,
+            " && ".join(
+                f"cp -p --reflink=auto -- {shlex.quote(part_path[:-5])} "
+                f"{shlex.quote(part_path)}"
+                for part_path in seeded_chunks
+            ),
+        )
+    return seeded_chunks
+
+
+def get_transfer_stats(
+    files_count: int,
+    bytes_sent: int,
+    start_time: float,
+    content_bytes: int = None,
+) -> TransferStatsSchema:
+    """Builds transfer statistics for transfer started at start_time.
+
+    :param files_count: number of transferred files.
+    :param bytes_sent: number of bytes sent over connection.
+    :param start_time: time.monotonic() value taken before transfer.
+    :param content_bytes: size of transferred files content, equals to
+    bytes_sent by default.
+    :return: transfer statistics with throughput of sent bytes and effective
+    throughput of content in bytes per second.
+    """
+    if content_bytes is None:
+        content_bytes = bytes_sent
+    elapsed_seconds = time.monotonic() - start_time
+    throughput = bytes_sent / elapsed_seconds if elapsed_seconds else 0.0
+    effective_throughput = (
+        content_bytes / elapsed_seconds if elapsed_seconds else 0.0
+    )
+    return TransferStatsSchema(
+        files_count=files_count,
+        bytes_sent=bytes_sent,
+        elapsed_seconds=round(elapsed_seconds, 3),
+        throughput=round(throughput, 2),
+        files_skipped=0,
+        files_deleted=0,
+        files_linked=0,
+        content_bytes=content_bytes,
+        effective_throughput=round(effective_throughput, 2),
+    )
+
+
+@instrumented()
+def upload_minio_files_to_colab(
+    ssh_client: SSHClient,
+    minio_client: boto3.client,
+    bucket: str,
+    files: FileInfo,
+    max_workers: int,
+) -> TransferStatsSchema:
+    """Concurrently streams minio objects into colab /content/uploaded.
+
+    Upload directory is created once, then files are uploaded by bounded pool
+    of workers that share sftp sessions opened over single ssh connection.
+    Chunks already written on colab by previous attempts or equal to chunks
+    of overwritten files aren't sent again (see seed_part_files) and every
+    chunk of uploaded files is verified by md5 on colab. If any
+    file upload fails - cancels pending uploads and reraises error.
+    :param ssh_client: paramiko ssh client connected to colab session.
+    :param minio_client: boto3 client connected to minio storage.
+    :param bucket: bucket to stream files from.
+    :param files: minio objects properties from list_minio_prefix_files.
+    :param max_workers: maximum number of concurrent uploads.
+    :return: upload statistics.
+    """
+    start_time = time.monotonic()
+    run_colab_command(ssh_client, f"mkdir -p {COLAB_UPLOAD_DIRECTORY}")
+    if not files:
+        return get_transfer_stats(0, 0, start_time)
+    remote_chunks = get_colab_chunks(
+        ssh_client,
+        get_resumable_paths(
+            [Path(file_obj["Key"]).name for file_obj in files]
+        ),
+        COLAB_CHUNK_SIZE,
+    )
+    remote_chunks.update(seed_part_files(ssh_client, files, remote_chunks))
+    workers_number = min(max_workers, len(files))
+    with open_sftp_sessions(ssh_client, workers_number) as sessions:
+        with ThreadPoolExecutor(max_workers=workers_number) as executor:
+            futures = [
+                executor.submit(
+                    _upload_minio_object_to_colab,
+                    minio_client,
+                    bucket,
+                    file_obj,
+                    sessions,
+                    remote_chunks,
+                )
+                for file_obj in files
+            ]
+            done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in not_done:
+                future.cancel()
+            put_results = [future.result() for future in done]
+    verify_colab_files(ssh_client, put_results)
+    bytes_sent = sum(put_result.bytes_sent for put_result in put_results)
+    content_bytes = sum(put_result.chunks.size for put_result in put_results)
+    colab_logger.info(f"{len(files)} files were uploaded to colab")
+    return get_transfer_stats(
+        len(files), bytes_sent, start_time, content_bytes
+    )
+
+
+@instrumented("put", COLAB_BACKEND)
+def put_file_to_colab_compressed(
+    ssh_client: SSHClient,
+    file_obj: Union[StreamingBody, BinaryIO],
+    file_size: int,
+    file_name: str,
+) -> PutFileResult:
+    """Streams file into colab /content/uploaded over exec channel.
+
+    Codec is selected by select_codec, compressed files are decompressed on
+    colab by DECOMPRESS_SCRIPT. File is written into "<name>.part" file that
+    is renamed by verify_colab_files. If file_obj is shorter than file_size -
+    raises FileIntegrityError exception.
+    :param ssh_client: paramiko ssh client connected to colab session.
+    :param file_obj: file-like object to upload.
+    :param file_size: size of file object in bytes.
+    :param file_name: name of uploaded file object.
+    :return: paths of file, written file, number of sent bytes and chunks.
+    """
+    file_path = f"{COLAB_UPLOAD_DIRECTORY}/{file_name}"
+    target_path = f"{file_path}.part"
+    stdin, stdout, stderr = ssh_client.exec_command(
+        get_python_command(DECOMPRESS_SCRIPT, [target_path])
+    )
+    channel_writer = _CountingWriter(stdin)
+    chunks_md5: List[str] = []
+    chunks = read_file_chunks(file_obj, file_size, file_name)
+
+    def hash_chunks(first_chunk: bytes) -> Iterator[bytes]:
+        for chunk in itertools.chain([first_chunk], chunks):
+            if chunk:
+                chunks_md5.append(hashlib.md5(chunk).hexdigest())
+                yield chunk
+
     try:
-        ssh_client.exec_command(run_command.format(script_name_path))
-    except SSHException as error:
-        colab_logger.warning(f"Script execution error: {error}")
+        first_chunk = next(chunks, b"")
+        codec = select_codec(file_name, first_chunk)
+        for data in compress_chunks(hash_chunks(first_chunk), codec):
+            channel_writer.write(data)
+        stdin.flush()
+        stdin.channel.shutdown_write()
+        if stdout.channel.recv_exit_status() != 0:
+            error_message = stderr.read().decode().strip()
+            colab_logger.warning(f"Colab decompression error: {error_message}")
+            raise SSHException(f"Colab decompression failed: {error_message}")
+    finally:
+        stdout.channel.close()
+    return PutFileResult(
+        file_path,
+        target_path,
+        channel_writer.bytes_written,
+        RemoteChunks(file_size, chunks_md5),
+    )
+
+
+def _upload_minio_object_to_colab_compressed(
+    ssh_client: SSHClient,
+    minio_client: boto3.client,
+    bucket: str,
+    file_obj: Dict[str, Any],
+) -> PutFileResult:
+    file_key, file_size = file_obj["Key"], file_obj["Size"]
+    with closing(
+        PrefetchedObject(
+            minio_client, bucket, file_key, file_size, file_obj["ETag"]
+        )
+    ) as file_object:
+        return put_file_to_colab_compressed(
+            ssh_client, file_object, file_size, Path(file_key).name
+        )
 
 
-def get_aws_credentials(home_directory: Path) -> None:
-    """Checks that required for aws CLI connections credentials file exists.
+@instrumented()
+def upload_minio_files_to_colab_compressed(
+    ssh_client: SSHClient,
+    minio_client: boto3.client,
+    bucket: str,
+    files: FileInfo,
+    max_workers: int,
+) -> TransferStatsSchema:
+    """Concurrently streams minio objects into colab with compression.
 
-    File should be located at ~/.aws/ directory. If not exists - creates that
-    directory and file with minio connection credentials.
-    :param home_directory: absolute path to user's home directory.
-    :return: None.
+    Every file is sent over its own exec channel by bounded pool of workers.
+    Files with compressible content are compressed with zlib, already
+    compressed files are sent as is. Every chunk of uploaded files is
+    verified by md5 on colab. If any file upload fails - cancels pending
+    uploads and reraises error.
+    :param ssh_client: paramiko ssh client connected to colab session.
+    :param minio_client: boto3 client connected to minio storage.
+    :param bucket: bucket to stream files from.
+    :param files: minio objects properties from list_minio_prefix_files.
+    :param max_workers: maximum number of concurrent uploads.
+    :return: upload statistics with compressed bytes sent to colab.
     """
-    credentials_file = home_directory / ".aws" / "credentials"
-    if not credentials_file.is_file():
-        colab_logger.info("Creating credentials file...")
-        credentials_file.parent.mkdir(parents=True, exist_ok=True)
-        with credentials_file.open("w") as cred_file:
-            cred_file.writelines(
-                (
-                    "[default]\n",
-                    f"aws_access_key_id={AWS_ACCESS_KEY_ID}\n",
-                    f"aws_secret_access_key={AWS_SECRET_ACCESS_KEY}\n",
-                ),
+    start_time = time.monotonic()
+    run_colab_command(ssh_client, f"mkdir -p {COLAB_UPLOAD_DIRECTORY}")
+    if not files:
+        return get_transfer_stats(0, 0, start_time)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(files))) as pool:
+        futures = [
+            pool.submit(
+                _upload_minio_object_to_colab_compressed,
+                ssh_client,
+                minio_client,
+                bucket,
+                file_obj,
             )
-    colab_logger.info("AWS credentials file provided")
+            for file_obj in files
+        ]
+        done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in not_done:
+            future.cancel()
+        put_results = [future.result() for future in done]
+    verify_colab_files(ssh_client, put_results)
+    bytes_sent = sum(put_result.bytes_sent for put_result in put_results)
+    content_bytes = sum(put_result.chunks.size for put_result in put_results)
+    colab_logger.info(
+        f"{len(files)} files were uploaded to colab, {bytes_sent} of "
+        f"{content_bytes} bytes were sent"
+    )
+    return get_transfer_stats(
+        len(files), bytes_sent, start_time, content_bytes
+    )
+
+
+class _CountingWriter:
+    """Write-only file-like wrapper that counts bytes passed to ssh channel."""
+
+    def __init__(self, file_obj: "BufferedFile[bytes]"):
+        self.file_obj = file_obj
+        self.bytes_written = 0
+
+    def write(self, data: bytes) -> int:
+        self.file_obj.write(data)
+        self.bytes_written += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        self.file_obj.flush()
+
 
+class _SizedReader:
+    """Read-only file-like wrapper that detects truncated minio objects."""
 
-def local_mount_colab_directory(
-    local_directory: str, colab_info: DownloadColabSchema
+    def __init__(self, file_obj: BinaryIO, file_name: str, file_size: int):
+        self.file_obj = file_obj
+        self.file_name = file_name
+        self.bytes_left = file_size
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.file_obj.read(size)
+        self.bytes_left -= len(data)
+        if self.bytes_left > 0 and (size < 0 or len(data) < size):
+            colab_logger.warning(f"Object {self.file_name} was truncated")
+            raise FileIntegrityError(
+                f"File {self.file_name} was truncated during upload"
+            )
+        return data
+
+
+def _read_remote_manifest(manifest_lines: List[str]) -> Dict[str, int]:
+    """Parses "<size> <name>" lines echoed back by colab after extraction.
+
+    :param manifest_lines: lines of remote stat command output.
+    :return: dict with extracted file names and their sizes in bytes.
+    """
+    manifest = {}
+    for line in manifest_lines:
+        size, _, name = line.partition(" ")
+        if name:
+            manifest[name] = int(size)
+    return manifest
+
+
+def _start_channel_reader(
+    channel_file: "BufferedFile[bytes]", lines: List[str]
+) -> Thread:
+    """Drains ssh channel stream in background so it never fills window.
+
+    :param channel_file: stdout or stderr file of remote command.
+    :param lines: list to extend with decoded lines of the stream.
+    :return: started daemon thread that reads the stream until EOF.
+    """
+    channel_reader = Thread(
+        target=lambda: lines.extend(channel_file.read().decode().splitlines()),
+        daemon=True,
+    )
+    channel_reader.start()
+    return channel_reader
+
+
+def _remove_staging_directory(
+    ssh_client: SSHClient, staging_directory: str
 ) -> None:
-    """Mount remote colab directory using sshfs connection to local directory.
+    """Removes partially extracted bundle so it never reaches upload dir.
 
-    :param local_directory: mounting directory path in application container.
-    :param colab_info: credentials for sshfs connection.
+    :param ssh_client: paramiko ssh client connected to colab.
+    :param staging_directory: quoted path of bundle staging directory.
     :return: None.
     """
-    mount_command = (
-        f"sshfs -o StrictHostKeyChecking=no,password_stdin "
-        f"-p {colab_info.port} {colab_info.user}@{colab_info.host}:"
-        f"{COLAB_OUTPUT_DIRECTORY} {local_directory}"
+    try:
+        run_colab_command(ssh_client, f"rm -rf {staging_directory}")
+    except (SSHException, OSError, EOFError) as error:
+        colab_logger.warning(f"Staging directory was not removed: {error}")
+
+
+@instrumented()
+def upload_minio_files_to_colab_bundled(
+    ssh_client: SSHClient,
+    minio_client: boto3.client,
+    bucket: str,
+    files: FileInfo,
+) -> TransferStatsSchema:
+    """Streams minio objects into colab as single gzip compressed tar stream.
+
+    Objects are packed into tar archive on the fly and piped into remote tar
+    extraction over single ssh channel, so nothing is stored on local disk.
+    Colab echoes back sizes of extracted files - if any file is missing or
+    has wrong size - raises FileIntegrityError exception.
+    :param ssh_client: paramiko ssh client connected to colab session.
+    :param minio_client: boto3 client connected to minio storage.
+    :param bucket: bucket to stream files from.
+    :param files: minio objects properties from list_minio_prefix_files.
+    :return: upload statistics with compressed bytes sent to colab.
+    """
+    start_time = time.monotonic()
+    if not files:
+        return get_transfer_stats(0, 0, start_time)
+    staging_directory = shlex.quote(
+        f"{COLAB_UPLOAD_DIRECTORY}/.bundle-{uuid4().hex}"
+    )
+    extract_command = (
+        f"set -o pipefail; mkdir -p {staging_directory} && "
+        f"cd {staging_directory} && "
+        "tar -xzv --quoting-style=literal -f - | "
+        "tr '\\n' '\\0' | xargs -0 -r stat -c '%s %n' --"
     )
+    stdin, stdout, stderr = ssh_client.exec_command(extract_command)
+    manifest_lines: List[str] = []
+    error_lines: List[str] = []
+    channel_readers = [
+        _start_channel_reader(stdout, manifest_lines),
+        _start_channel_reader(stderr, error_lines),
+    ]
+    channel_writer = _CountingWriter(stdin)
+    expected_files = {}
     try:
-        subprocess.run(
-            mount_command,
-            shell=True,
-            capture_output=True,
-            text=True,
-            check=True,
-            input=colab_info.password,
+        try:
+            with gzip.GzipFile(
+                fileobj=channel_writer,
+                mode="wb",
+                compresslevel=COLAB_BUNDLE_COMPRESSION_LEVEL,
+            ) as gzip_stream:
+                with tarfile.open(
+                    fileobj=gzip_stream, mode="w|"
+                ) as tar_stream:
+                    for file_obj in files:
+                        file_object, file_size = get_minio_object(
+                            minio_client, bucket, file_obj["Key"]
+                        )
+                        tar_info = tarfile.TarInfo(Path(file_obj["Key"]).name)
+                        tar_info.size = file_size
+                        tar_info.mtime = int(
+                            file_obj["LastModified"].timestamp()
+                        )
+                        with closing(file_object):
+                            file_reader = _SizedReader(
+                                file_object, tar_info.name, file_size
+                            )
+                            tar_stream.addfile(tar_info, file_reader)
+                        expected_files[tar_info.name] = file_size
+        except IncompleteReadError as error:
+            colab_logger.warning(f"Minio object was truncated: {error}")
+            raise FileIntegrityError(f"Files bundle was corrupted: {error}")
+        finally:
+            stdin.flush()
+            stdin.channel.shutdown_write()
+        for channel_reader in channel_readers:
+            channel_reader.join()
+        if stdout.channel.recv_exit_status() != 0:
+            error_message = "\n".join(error_lines).strip()
+            colab_logger.warning(
+                f"Colab bundle extraction error: {error_message}"
+            )
+            raise SSHException(
+                f"Colab bundle extraction failed: {error_message}"
+            )
+        uploaded_files = _read_remote_manifest(manifest_lines)
+        for file_name, file_size in expected_files.items():
+            if uploaded_files.get(file_name) != file_size:
+                colab_logger.warning(
+                    f"File {file_name} was corrupted in bundle"
+                )
+                raise FileIntegrityError(
+                    f"File {file_name} was corrupted during upload"
+                )
+        run_colab_command(
+            ssh_client,
+            f"find {staging_directory} -mindepth 1 -maxdepth 1 -exec "
+            f"mv -f -t {shlex.quote(COLAB_UPLOAD_DIRECTORY)} -- {{}} + && "
+            f"rmdir {staging_directory}",
         )
-    except subprocess.SubprocessError as error:
-        colab_logger.warning(f"sshfs connection error: {error}")
+    except (FileIntegrityError, SSHException, OSError, EOFError):
+        _remove_staging_directory(ssh_client, staging_directory)
         raise
+    finally:
+        stdout.channel.close()
+    colab_logger.info(f"Bundle of {len(files)} files was uploaded to colab")
+    return get_transfer_stats(
+        len(files),
+        channel_writer.bytes_written,
+        start_time,
+        sum(expected_files.values()),
+    )
+
+
+@instrumented()
+def upload_minio_files_to_colab_presigned(
+    ssh_client: SSHClient,
+    bucket: str,
+    files: FileInfo,
+    max_workers: int,
+) -> TransferStatsSchema:
+    """Makes colab download minio objects by presigned urls.
+
+    Colab fetches objects directly from S3_PUBLIC_ENDPOINT_URL with
+    max_workers threads of single remote command, so file content doesn't
+    pass through application. If any file has wrong size after download -
+    raises FileIntegrityError exception.
+    :param ssh_client: paramiko ssh client connected to colab session.
+    :param bucket: bucket to download files from.
+    :param files: minio objects properties from list_minio_prefix_files.
+    :param max_workers: number of parallel downloads on colab.
+    :return: upload statistics.
+    """
+    start_time = time.monotonic()
+    if not files:
+        return get_transfer_stats(0, 0, start_time)
+    fetched_files = [
+        {
+            "name": Path(file_obj["Key"]).name,
+            "url": get_presigned_url(
+                "get_object", Bucket=bucket, Key=file_obj["Key"]
+            ),
+        }
+        for file_obj in files
+    ]
+    uploaded_files: Dict[str, int] = run_colab_script(
+        ssh_client,
+        FETCH_SCRIPT,
+        [COLAB_UPLOAD_DIRECTORY, str(max_workers)],
+        fetched_files,
+    )
+    for file_obj in files:
+        file_name = Path(file_obj["Key"]).name
+        if uploaded_files.get(file_name) != file_obj["Size"]:
+            colab_logger.warning(f"File {file_name} was corrupted on fetch")
+            raise FileIntegrityError(
+                f"File {file_name} was corrupted during upload"
+            )
+    colab_logger.info(f"{len(files)} files were fetched by colab")
+    return get_transfer_stats(
+        len(files), sum(file_obj["Size"] for file_obj in files), start_time
+    )
+
 
+class RemoteFileInfo(NamedTuple):
+    size: int
+    mtime: float
+    md5: Union[str, None]
 
-def sync_files_with_minio(
-    local_directory: str, bucket: str, colab_info: DownloadColabSchema
+
+@instrumented()
+def get_colab_manifest(
+    ssh_client: SSHClient, files: FileInfo
+) -> Dict[str, RemoteFileInfo]:
+    """Gets size, mtime and md5 of files in colab /content/uploaded directory.
+
+    Manifest is collected with single remote command. md5 is calculated only
+    for remote files that have the same name and size as minio objects.
+    :param ssh_client: paramiko ssh client connected to colab session.
+    :param files: minio objects properties from list_minio_prefix_files.
+    :return: dict with remote file names and their properties.
+    """
+    expected_sizes = {Path(obj["Key"]).name: obj["Size"] for obj in files}
+    manifest = run_colab_script(
+        ssh_client, MANIFEST_SCRIPT, [COLAB_UPLOAD_DIRECTORY], expected_sizes
+    )
+    return {
+        name: RemoteFileInfo(*properties)
+        for name, properties in manifest.items()
+    }
+
+
+def is_colab_file_changed(
+    file_obj: Dict[str, Any], remote_file: Union[RemoteFileInfo, None]
+) -> bool:
+    """Compares minio object properties with remote file properties.
+
+    Single part uploaded objects are compared by md5 ETag. Multipart ETag is
+    not md5 of content - such objects are considered unchanged if remote file
+    has the same size and wasn't modified before object.
+    :param file_obj: minio object properties from list_minio_prefix_files.
+    :param remote_file: properties of remote file with the same name.
+    :return: True if object should be uploaded to colab.
+    """
+    if remote_file is None or remote_file.size != file_obj["Size"]:
+        return True
+    etag: str = file_obj["ETag"].strip('"')
+    if "-" in etag:
+        modified: float = file_obj["LastModified"].timestamp()
+        return remote_file.mtime < modified
+    return remote_file.md5 != etag
+
+
+def plan_incremental_upload(
+    files: FileInfo, remote_manifest: Dict[str, RemoteFileInfo]
+) -> Tuple[FileInfo, List[str]]:
+    """Selects changed minio objects and stale remote files.
+
+    :param files: minio objects properties from list_minio_prefix_files.
+    :param remote_manifest: manifest returned by get_colab_manifest.
+    :return: tuple of changed objects and names of stale remote files.
+    """
+    file_names = {Path(file_obj["Key"]).name for file_obj in files}
+    changed_files = [
+        file_obj
+        for file_obj in files
+        if is_colab_file_changed(
+            file_obj, remote_manifest.get(Path(file_obj["Key"]).name)
+        )
+    ]
+    stale_files = sorted(set(remote_manifest) - file_names)
+    return changed_files, stale_files
+
+
+def deduplicate_file_names(files: Iterable[Dict[str, Any]]) -> FileInfo:
+    """Keeps only the last listed object of objects with the same name.
+
+    Objects are stored on colab by name, so objects with the same name from
+    different directories would overwrite each other.
+    :param files: minio objects properties from list_minio_prefix_files.
+    :return: objects with unique names in order of first listed ones.
+    """
+    return list(
+        {Path(file_obj["Key"]).name: file_obj for file_obj in files}.values()
+    )
+
+
+class UploadPlan(NamedTuple):
+    files: FileInfo
+    changed_files: FileInfo
+    stale_files: Dict[str, int]
+
+
+@instrumented()
+def plan_colab_upload(
+    ssh_client: SSHClient, files: FileInfo, upload_info: UploadColabSchema
+) -> UploadPlan:
+    """Selects minio objects that will be uploaded to colab.
+
+    Objects are stored on colab by name, so for objects with the same name only
+    the last listed one is uploaded. Objects larger than max_size or modified
+    before newer_than of upload_info are skipped. In incremental mode only
+    objects that differ from files already uploaded to colab are selected.
+    In incremental or delete_stale mode remote files that are absent in files
+    and pass patterns of upload_info are stale.
+    :param ssh_client: paramiko ssh client connected to colab session, used
+    only in incremental or delete_stale mode.
+    :param files: objects properties selected by filter_minio_paths.
+    :param upload_info: upload options.
+    :return: deduplicated objects, changed objects and sizes of stale remote
+    files.
+    """
+    files = deduplicate_file_names(files)
+    keys_prefix = upload_info.keys_prefix.strip("/") + "/"
+    transfer_filter = get_transfer_filter(upload_info)
+    selected_files = [
+        file_obj
+        for file_obj in files
+        if is_minio_file_selected(transfer_filter, file_obj, keys_prefix)
+    ]
+    if not upload_info.incremental and not upload_info.delete_stale:
+        return UploadPlan(files, selected_files, {})
+    remote_manifest = get_colab_manifest(
+        ssh_client, selected_files if upload_info.incremental else []
+    )
+    changed_files, stale_files = plan_incremental_upload(
+        selected_files, remote_manifest
+    )
+    if not upload_info.incremental:
+        changed_files = selected_files
+    file_names = {Path(file_obj["Key"]).name for file_obj in files}
+    return UploadPlan(
+        files,
+        changed_files,
+        {
+            file_name: remote_manifest[file_name].size
+            for file_name in stale_files
+            if file_name not in file_names
+            and is_path_selected(transfer_filter, file_name)
+        },
+    )
+
+
+def get_upload_plan_schema(
+    upload_plan: UploadPlan, delete_stale: bool
+) -> TransferPlanSchema:
+    """Builds description of planned upload to colab.
+
+    :param upload_plan: plan returned by plan_colab_upload.
+    :param delete_stale: whether stale remote files will be removed.
+    :return: planned files with total size of uploaded files.
+    """
+    planned_files = [
+        PlannedFileSchema(
+            key=file_obj["Key"],
+            action=SyncActions.uploaded,
+            size=file_obj["Size"],
+        )
+        for file_obj in upload_plan.changed_files
+    ]
+    total_bytes = sum(planned_file.size for planned_file in planned_files)
+    if delete_stale:
+        planned_files.extend(
+            PlannedFileSchema(
+                key=f"{COLAB_UPLOAD_DIRECTORY}/{file_name}",
+                action=SyncActions.deleted,
+                size=file_size,
+            )
+            for file_name, file_size in upload_plan.stale_files.items()
+        )
+    return TransferPlanSchema(
+        files_count=len(upload_plan.changed_files),
+        total_bytes=total_bytes,
+        files=planned_files,
+    )
+
+
+@instrumented()
+def delete_colab_files(ssh_client: SSHClient, file_names: List[str]) -> None:
+    """Removes files with file_names from colab /content/uploaded directory.
+
+    :param ssh_client: paramiko ssh client connected to colab session.
+    :param file_names: names of files to remove.
+    :return: None.
+    """
+    if not file_names:
+        return
+    file_paths = (
+        shlex.quote(f"{COLAB_UPLOAD_DIRECTORY}/{file_name}")
+        for file_name in file_names
+    )
+    run_colab_command(ssh_client, f"rm -f -- {' '.join(file_paths)}")
+    colab_logger.info(f"{len(file_names)} stale files were removed on colab")
+
+
+@instrumented()
+def link_stored_files(
+    ssh_client: SSHClient, host: StoreHost, content_keys: Dict[str, str]
+) -> List[str]:
+    """Links files which content is stored on colab into /content/uploaded.
+
+    Only files found in content_index are linked, entries that are missing in
+    colab content-addressed store are discarded from index.
+    :param ssh_client: paramiko ssh client connected to colab session.
+    :param host: colab host and port.
+    :param content_keys: dict with names of uploaded files and content keys.
+    :return: names of linked files.
+    """
+    cached_keys = content_index.get_cached(host, content_keys.values())
+    linked_keys = {
+        file_name: content_key
+        for file_name, content_key in content_keys.items()
+        if content_key in cached_keys
+    }
+    if not linked_keys:
+        return []
+    store_request = {
+        "evict": content_index.pop_evicted(host),
+        "link": linked_keys,
+        "store": {},
+    }
+    linked_files: List[str] = run_colab_script(
+        ssh_client,
+        CAS_SCRIPT,
+        [COLAB_UPLOAD_DIRECTORY, COLAB_CAS_DIRECTORY],
+        store_request,
+    )["linked"]
+    content_index.discard(
+        host,
+        [
+            content_key
+            for file_name, content_key in linked_keys.items()
+            if file_name not in linked_files
+        ],
+    )
+    colab_logger.info(f"{len(linked_files)} files were linked on colab")
+    return linked_files
+
+
+@instrumented()
+def store_uploaded_files(
+    ssh_client: SSHClient, host: StoreHost, content_keys: Dict[str, str]
 ) -> None:
-    """Synchronize files on colab and files in minio storage.
+    """Stores uploaded files in colab content-addressed store.
 
-    Minio files will be located at <colab_info.keys_prefix>/output/ directory.
-    After files transfer - unmounts remote directory.
-    :param local_directory: mounting directory path in application container.
-    :param bucket: bucket to upload file into.
-    :param colab_info: credentials for minio and colab connection.
+    Evicted entries of content_index are removed from store by the same
+    remote command.
+    :param ssh_client: paramiko ssh client connected to colab session.
+    :param host: colab host and port.
+    :param content_keys: dict with names of uploaded files and content keys.
     :return: None.
     """
-    keys_prefix = colab_info.keys_prefix.strip("/") + "/"
-    sync_command = (
-        f"aws --endpoint-url {S3_ENDPOINT_URL} s3 sync {local_directory} "
-        f"s3://{bucket}/{keys_prefix}/output/ --delete"
+    evicted_keys = content_index.pop_evicted(host)
+    if not content_keys and not evicted_keys:
+        return
+    store_request = {
+        "evict": evicted_keys,
+        "link": {},
+        "store": content_keys,
+    }
+    run_colab_script(
+        ssh_client,
+        CAS_SCRIPT,
+        [COLAB_UPLOAD_DIRECTORY, COLAB_CAS_DIRECTORY],
+        store_request,
     )
-    try:
-        subprocess.run(
-            sync_command,
-            shell=True,
-            capture_output=True,
-            text=True,
-            check=True,
+    content_index.add(host, content_keys.values())
+
+
+@instrumented()
+def transfer_files_to_colab(
+    ssh_client: SSHClient,
+    minio_client: boto3.client,
+    bucket: str,
+    files: FileInfo,
+    upload_info: UploadColabSchema,
+) -> TransferStatsSchema:
+    """Uploads minio objects to colab with options from upload_info.
+
+    Objects are selected by plan_colab_upload and, if requested, stale remote
+    files are removed. Files of at least
+    COLAB_CAS_MIN_SIZE bytes which content was uploaded to the same colab
+    before are linked from colab content-addressed store instead of transfer.
+    :param ssh_client: paramiko ssh client connected to colab session.
+    :param minio_client: boto3 client connected to minio storage.
+    :param bucket: bucket to stream files from.
+    :param files: minio objects properties from list_minio_prefix_files.
+    :param upload_info: upload options.
+    :return: upload statistics.
+    """
+    files, files_to_upload, stale_files = plan_colab_upload(
+        ssh_client, files, upload_info
+    )
+    host = (upload_info.host, upload_info.port)
+    content_keys = {
+        Path(file_obj["Key"]).name: get_content_key(file_obj)
+        for file_obj in files_to_upload
+        if file_obj["Size"] >= COLAB_CAS_MIN_SIZE
+    }
+    linked_files = link_stored_files(ssh_client, host, content_keys)
+    transferred_files = [
+        file_obj
+        for file_obj in files_to_upload
+        if Path(file_obj["Key"]).name not in linked_files
+    ]
+    if upload_info.transfer_mode == TransferMode.bundle:
+        stats = upload_minio_files_to_colab_bundled(
+            ssh_client, minio_client, bucket, transferred_files
+        )
+    elif upload_info.transfer_mode == TransferMode.compressed:
+        stats = upload_minio_files_to_colab_compressed(
+            ssh_client,
+            minio_client,
+            bucket,
+            transferred_files,
+            upload_info.max_workers,
+        )
+    elif upload_info.transfer_mode == TransferMode.presigned:
+        stats = upload_minio_files_to_colab_presigned(
+            ssh_client, bucket, transferred_files, upload_info.max_workers
+        )
+    else:
+        stats = upload_minio_files_to_colab(
+            ssh_client,
+            minio_client,
+            bucket,
+            transferred_files,
+            upload_info.max_workers,
+        )
+    store_uploaded_files(
+        ssh_client,
+        host,
+        {
+            file_name: content_key
+            for file_name, content_key in content_keys.items()
+            if file_name not in linked_files
+        },
+    )
+    if upload_info.delete_stale:
+        delete_colab_files(ssh_client, list(stale_files))
+    record_transfer(
+        "minio_to_colab",
+        bucket,
+        get_host_key(upload_info.host, upload_info.port),
+        stats.bytes_sent,
+    )
+    return stats.copy(
+        update={
+            "files_skipped": len(files) - len(files_to_upload),
+            "files_deleted": len(stale_files),
+            "files_linked": len(linked_files),
+        }
+    )
+
+
+def get_script_command(script_name: str) -> str:
+    """Returns shell command that runs script with script_name on colab.
+
+    If script has .ipynb extension - firstly converts script to .py extension.
+    :param script_name: name of script to execute.
+    :return: shell command.
+    """
+    run_command = "python {0}"
+    script_name_path = Path(f"{COLAB_UPLOAD_DIRECTORY}/{script_name}")
+    if script_name_path.suffix == ".ipynb":
+        colab_logger.info(
+            f"Convert script {script_name_path} from ipynb to py"
         )
-    except subprocess.SubprocessError as error:
-        colab_logger.warning(f"Files synchronization error: {error}")
+        run_command = (
+            f"jupyter nbconvert {script_name_path} --to python; "
+            f"rm {script_name_path}; {run_command}"
+        )
+        script_name_path = script_name_path.with_suffix(".py")
+    return run_command.format(script_name_path)
+
+
+@instrumented("exec", COLAB_BACKEND)
+def execute_script(
+    ssh_client: SSHClient, script_name: str, usage_path: str
+) -> Channel:
+    """Executes uploaded script with provided script_name on colab.
+
+    Script is started with remote wrapper that saves its resource usage into
+    usage_path file after script exits.
+    :param ssh_client: paramiko ssh client connected to colab session.
+    :param script_name: name of script to execute
+    :param usage_path: colab path of file to save resource usage into.
+    :return: paramiko channel of running script.
+    """
+    job_command = " ".join(
+        [
+            "python3",
+            "-c",
+            shlex.quote(JOB_SCRIPT),
+            shlex.quote(get_script_command(script_name)),
+            shlex.quote(usage_path),
+        ]
+    )
+    try:
+        channel = ssh_client.get_transport().open_session()
+        channel.exec_command(job_command)
+    except SSHException as error:
+        colab_logger.warning(f"Script execution error: {error}")
         raise
-    finally:
-        subprocess.run(f"fusermount -u {local_directory}", shell=True)
-        colab_logger.info("Remote directory successfully unmounted")
+    return channel
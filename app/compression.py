@@ -0,0 +1,134 @@
+import math
+import zlib
+from collections import Counter
+from typing import Iterable, Iterator
+
+from .constants import (
+    COLAB_COMPRESSION_LEVEL,
+    COLAB_COMPRESSION_MAX_ENTROPY,
+    COLAB_COMPRESSION_SAMPLE_SIZE,
+)
+from .errors import FileIntegrityError
+
+# First byte of compressed transfer stream, the rest is zlib stream or file.
+ZLIB_CODEC = b"z"
+RAW_CODEC = b"r"
+# Extensions of files which content is already compressed.
+COMPRESSED_EXTENSIONS = (
+    ".7z",
+    ".avi",
+    ".bz2",
+    ".feather",
+    ".gif",
+    ".gz",
+    ".jpeg",
+    ".jpg",
+    ".mkv",
+    ".mp3",
+    ".mp4",
+    ".npz",
+    ".parquet",
+    ".png",
+    ".rar",
+    ".tgz",
+    ".webp",
+    ".xz",
+    ".zip",
+    ".zst",
+)
+
+
+def get_entropy(data: bytes) -> float:
+    """Calculates Shannon entropy of bytes.
+
+    :param data: sample of file content.
+    :return: entropy in bits per byte from 0 to 8.
+    """
+    if not data:
+        return 0.0
+    return -sum(
+        count / len(data) * math.log2(count / len(data))
+        for count in Counter(data).values()
+    )
+
+
+def select_codec(file_name: str, sample: bytes) -> bytes:
+    """Selects codec of file by its extension and entropy of its content.
+
+    Files with COMPRESSED_EXTENSIONS and files which first
+    COLAB_COMPRESSION_SAMPLE_SIZE bytes have entropy higher than
+    COLAB_COMPRESSION_MAX_ENTROPY are sent without compression.
+    :param file_name: name of transferred file.
+    :param sample: first bytes of file content.
+    :return: ZLIB_CODEC or RAW_CODEC.
+    """
+    if file_name.lower().endswith(COMPRESSED_EXTENSIONS):
+        return RAW_CODEC
+    entropy = get_entropy(sample[:COLAB_COMPRESSION_SAMPLE_SIZE])
+    if entropy > COLAB_COMPRESSION_MAX_ENTROPY:
+        return RAW_CODEC
+    return ZLIB_CODEC
+
+
+def compress_chunks(chunks: Iterable[bytes], codec: bytes) -> Iterator[bytes]:
+    """Encodes file chunks into compressed transfer stream.
+
+    :param chunks: chunks of file content.
+    :param codec: ZLIB_CODEC or RAW_CODEC.
+    :return: iterator over codec byte and encoded chunks.
+    """
+    yield codec
+    if codec == RAW_CODEC:
+        yield from chunks
+        return
+    compressor = zlib.compressobj(COLAB_COMPRESSION_LEVEL)
+    for chunk in chunks:
+        compressed_chunk = compressor.compress(chunk)
+        if compressed_chunk:
+            yield compressed_chunk
+    yield compressor.flush()
+
+
+def decompress_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Decodes compressed transfer stream into file chunks.
+
+    If zlib stream is truncated or corrupted - raises FileIntegrityError.
+    :param chunks: chunks of stream produced by compress_chunks.
+    :return: iterator over chunks of file content.
+    """
+    chunks = iter(chunks)
+    first_chunk = next(chunks, b"")
+    codec, first_chunk = first_chunk[:1], first_chunk[1:]
+    if codec == RAW_CODEC:
+        yield first_chunk
+        yield from chunks
+        return
+    if codec != ZLIB_CODEC:
+        raise FileIntegrityError("Compressed stream has unknown codec")
+    decompressor = zlib.decompressobj()
+    try:
+        yield decompressor.decompress(first_chunk)
+        for chunk in chunks:
+            yield decompressor.decompress(chunk)
+        yield decompressor.flush()
+    except zlib.error as error:
+        raise FileIntegrityError(f"Compressed stream was corrupted: {error}")
+    if not decompressor.eof:
+        raise FileIntegrityError("Compressed stream was truncated")
+
+
+def iter_parts(chunks: Iterable[bytes], part_size: int) -> Iterator[bytes]:
+    """Splits chunks of stream into parts of part_size bytes.
+
+    :param chunks: chunks of stream.
+    :param part_size: size of parts, the last part may be shorter.
+    :return: iterator over non-empty parts.
+    """
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer.extend(chunk)
+        while len(buffer) >= part_size:
+            yield bytes(buffer[:part_size])
+            del buffer[:part_size]
+    if buffer:
+        yield bytes(buffer)
@@ -0,0 +1,251 @@
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import Lock
+from typing import Any, Callable, Dict, Iterator, Tuple, TypeVar
+
+from anyio import CapacityLimiter, to_thread
+
+from .constants import (
+    COLAB_HOST_LIMITER_TTL,
+    COLAB_HOST_RATE_BURST,
+    COLAB_HOST_RATE_LIMIT,
+    MINIO_CONCURRENCY,
+)
+from .logger import SAMPLED, get_logger
+
+concurrency_logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+MINIO_HOST = "minio"
+
+
+def get_host_key(host: str, port: int) -> str:
+    """Returns key of colab runtime used by limiters and scheduler.
+
+    Colab runtimes exposed by ngrok share the same host and differ by port,
+    so both of them identify runtime.
+    :param host: colab host.
+    :param port: colab ssh port.
+    :return: "<host>:<port>" key.
+    """
+    return f"{host}:{port}"
+
+
+class HostLimiters:
+    """Capacity limiters of blocking operations for every remote host.
+
+    Limiters are created on first use inside event loop, every host has the
+    same capacity. Limiters that weren't requested for ttl seconds and have
+    no running or waiting tasks are evicted, so short-lived hosts don't pile
+    up.
+    """
+
+    def __init__(self, capacity: int, ttl: float = COLAB_HOST_LIMITER_TTL):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._limiters: "OrderedDict[str, Tuple[CapacityLimiter, float]]" = (
+            OrderedDict()
+        )
+
+    def _evict_idle(self, now: float) -> None:
+        for host, (limiter, used_at) in list(self._limiters.items()):
+            if used_at + self.ttl > now:
+                break
+            statistics = limiter.statistics()
+            if not statistics.borrowed_tokens and not statistics.tasks_waiting:
+                del self._limiters[host]
+
+    def get(self, host: str) -> CapacityLimiter:
+        """Returns limiter of host, creates it if it doesn't exist.
+
+        :param host: MINIO_HOST or other remote host key.
+        :return: anyio capacity limiter.
+        """
+        now = time.monotonic()
+        self._evict_idle(now)
+        if host in self._limiters:
+            limiter = self._limiters.pop(host)[0]
+        else:
+            limiter = CapacityLimiter(self.capacity)
+        self._limiters[host] = (limiter, now)
+        return limiter
+
+    def __len__(self) -> int:
+        return len(self._limiters)
+
+
+host_limiters = HostLimiters(MINIO_CONCURRENCY)
+
+
+async def run_on_host(host: str, func: Callable[..., T], *args: Any) -> T:
+    """Runs blocking function in worker thread limited by host capacity.
+
+    Requests to the same host wait for free capacity of its limiter without
+    holding worker threads, so slow hosts don't block requests to other hosts.
+    Transfers to colab are limited per runtime by transfer scheduler and run
+    on MINIO_HOST.
+    :param host: MINIO_HOST or other remote host key.
+    :param func: blocking function.
+    :param args: positional arguments of function.
+    :return: result of function.
+    """
+    limiter = host_limiters.get(host)
+    if not limiter.available_tokens:
+        concurrency_logger.info(
+            f"Waiting for free capacity of {host}", extra=SAMPLED
+        )
+    return await to_thread.run_sync(func, *args, limiter=limiter)
+
+
+class TokenBucket:
+    """Thread-safe token bucket that limits rate of transferred bytes.
+
+    Bucket holds up to capacity tokens and is refilled with rate tokens per
+    second. Consumer that takes more tokens than bucket holds sleeps until
+    debt is refilled, so consumers of the same bucket share its rate.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._charged_at = self._updated_at
+        self._lock = Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    def charge(self, amount: int) -> float:
+        """Takes amount tokens without waiting, bucket may go into debt.
+
+        :param amount: number of tokens (bytes) to take.
+        :return: seconds until debt of bucket is refilled.
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            if amount:
+                self._charged_at = self._updated_at
+            return max(-self._tokens / self.rate, 0.0)
+
+    def get_delay(self) -> float:
+        """Returns seconds until debt of bucket is refilled.
+
+        :return: 0 if bucket isn't in debt or doesn't limit consumers.
+        """
+        return self.charge(0)
+
+    def is_idle(self, ttl: float) -> bool:
+        """Checks if bucket is full and wasn't charged for ttl seconds.
+
+        :param ttl: seconds since last charge.
+        :return: True if bucket may be replaced with new one.
+        """
+        with self._lock:
+            self._refill()
+            return (
+                self._tokens >= self.capacity
+                and self._updated_at - self._charged_at >= ttl
+            )
+
+    def consume(self, amount: int) -> None:
+        """Takes amount tokens, waits for refill if there are not enough.
+
+        Buckets with non-positive rate don't limit consumers.
+        :param amount: number of tokens (bytes) to take.
+        :return: None.
+        """
+        time.sleep(self.charge(amount))
+
+
+class RateLimiters:
+    """Token buckets that limit transfer rate to every colab host or bucket.
+
+    Full buckets that weren't charged for ttl seconds are evicted, new bucket
+    of the same name starts full, so eviction doesn't change limited rate.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        ttl: float = COLAB_HOST_LIMITER_TTL,
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self.ttl = ttl
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._evicted_at = time.monotonic()
+        self._lock = Lock()
+
+    def _evict_idle(self) -> None:
+        now = time.monotonic()
+        if now - self._evicted_at < self.ttl:
+            return
+        self._evicted_at = now
+        for name, bucket in list(self._buckets.items()):
+            if bucket.is_idle(self.ttl):
+                del self._buckets[name]
+
+    def get(self, name: str) -> TokenBucket:
+        """Returns token bucket of name, creates it if it doesn't exist.
+
+        :param name: colab host key from get_host_key or minio bucket.
+        :return: token bucket shared by all transfers of name.
+        """
+        with self._lock:
+            self._evict_idle()
+            if name not in self._buckets:
+                self._buckets[name] = TokenBucket(self.rate, self.capacity)
+            return self._buckets[name]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+host_rate_limiters = RateLimiters(COLAB_HOST_RATE_LIMIT, COLAB_HOST_RATE_BURST)
+
+
+class KeyLocks:
+    """Thread locks that serialize writers of the same key.
+
+    Lock of key is created by its first holder and dropped when the last
+    holder or waiter releases it, so keys don't pile up.
+    """
+
+    def __init__(self) -> None:
+        self._locks: Dict[str, Tuple[Lock, int]] = {}
+        self._lock = Lock()
+
+    @contextmanager
+    def hold(self, key: str) -> Iterator[None]:
+        """Waits until no other thread holds key and holds it.
+
+        :param key: key of serialized resource, e.g. "<bucket>/<object key>".
+        :return: context manager that releases key on exit.
+        """
+        with self._lock:
+            key_lock, holders = self._locks.get(key, (Lock(), 0))
+            self._locks[key] = (key_lock, holders + 1)
+        try:
+            with key_lock:
+                yield
+        finally:
+            with self._lock:
+                holders = self._locks[key][1] - 1
+                if holders:
+                    self._locks[key] = (key_lock, holders)
+                else:
+                    del self._locks[key]
+
+    def __len__(self) -> int:
+        return len(self._locks)
@@ -7,10 +7,138 @@ load_dotenv(find_dotenv())
 APP_HOST = os.environ.get("APP_HOST")
 APP_PORT = os.environ.get("APP_PORT")
 S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL")
+S3_PUBLIC_ENDPOINT_URL = os.environ.get(
+    "S3_PUBLIC_ENDPOINT_URL", S3_ENDPOINT_URL
+)
 AWS_ACCESS_KEY_ID = os.environ.get("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.environ.get("AWS_SECRET_ACCESS_KEY")
 
 ROUTES_PREFIX = "/files"
 COLAB_UPLOAD_DIRECTORY = "/content/uploaded"
 COLAB_OUTPUT_DIRECTORY = f"{COLAB_UPLOAD_DIRECTORY}/output"
+COLAB_JOBS_DIRECTORY = "/content/.jobs"
 TAG = "Colab and Minio resources"
+
+COLAB_UPLOAD_WORKERS = int(os.environ.get("COLAB_UPLOAD_WORKERS", 4))
+COLAB_MAX_UPLOAD_WORKERS = int(os.environ.get("COLAB_MAX_UPLOAD_WORKERS", 16))
+COLAB_BUNDLE_COMPRESSION_LEVEL = int(
+    os.environ.get("COLAB_BUNDLE_COMPRESSION_LEVEL", 6)
+)
+COLAB_COMPRESSION_LEVEL = int(os.environ.get("COLAB_COMPRESSION_LEVEL", 6))
+COLAB_COMPRESSION_MAX_ENTROPY = float(
+    os.environ.get("COLAB_COMPRESSION_MAX_ENTROPY", 7.5)
+)
+COLAB_COMPRESSION_SAMPLE_SIZE = int(
+    os.environ.get("COLAB_COMPRESSION_SAMPLE_SIZE", 64 * 1024)
+)
+MINIO_DELETE_BATCH_SIZE = 1000
+MINIO_DELETE_WORKERS = int(os.environ.get("MINIO_DELETE_WORKERS", 4))
+MINIO_MAX_POOL_CONNECTIONS = int(
+    os.environ.get("MINIO_MAX_POOL_CONNECTIONS", 50)
+)
+MINIO_CONNECT_TIMEOUT = float(os.environ.get("MINIO_CONNECT_TIMEOUT", 5))
+MINIO_READ_TIMEOUT = float(os.environ.get("MINIO_READ_TIMEOUT", 60))
+MINIO_MAX_ATTEMPTS = int(os.environ.get("MINIO_MAX_ATTEMPTS", 3))
+MINIO_BUCKET_CACHE_TTL = float(os.environ.get("MINIO_BUCKET_CACHE_TTL", 60))
+MINIO_BUCKET_CACHE_SIZE = int(os.environ.get("MINIO_BUCKET_CACHE_SIZE", 128))
+MINIO_MIN_PART_SIZE = 5 * 1024 * 1024
+MINIO_MULTIPART_THRESHOLD = int(
+    os.environ.get("MINIO_MULTIPART_THRESHOLD", 8 * 1024 * 1024)
+)
+MINIO_MULTIPART_CHUNKSIZE = int(
+    os.environ.get("MINIO_MULTIPART_CHUNKSIZE", 8 * 1024 * 1024)
+)
+MINIO_MAX_CONCURRENCY = int(os.environ.get("MINIO_MAX_CONCURRENCY", 10))
+MINIO_UPLOAD_MAX_AGE = float(
+    os.environ.get("MINIO_UPLOAD_MAX_AGE", 24 * 60 * 60)
+)
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", 0.5))
+JOB_RETENTION = int(os.environ.get("JOB_RETENTION", 1000))
+JOB_OUTPUT_BUFFER_SIZE = int(
+    os.environ.get("JOB_OUTPUT_BUFFER_SIZE", 1024 * 1024)
+)
+JOB_LOG_CHUNK_SIZE = int(os.environ.get("JOB_LOG_CHUNK_SIZE", 1024 * 1024))
+JOB_LOG_MAX_BACKLOG = int(
+    os.environ.get("JOB_LOG_MAX_BACKLOG", 8 * 1024 * 1024)
+)
+JOB_LOG_UPLOAD_WORKERS = int(os.environ.get("JOB_LOG_UPLOAD_WORKERS", 2))
+JOB_LOGS_KEEPALIVE = float(os.environ.get("JOB_LOGS_KEEPALIVE", 15))
+JOB_LOGS_POLL_INTERVAL = float(os.environ.get("JOB_LOGS_POLL_INTERVAL", 0.1))
+COLAB_SSH_MAX_CHANNELS = int(os.environ.get("COLAB_SSH_MAX_CHANNELS", 10))
+COLAB_SSH_IDLE_TIMEOUT = float(os.environ.get("COLAB_SSH_IDLE_TIMEOUT", 300))
+COLAB_SSH_KEEPALIVE = int(os.environ.get("COLAB_SSH_KEEPALIVE", 30))
+COLAB_SSH_ACQUIRE_TIMEOUT = float(
+    os.environ.get("COLAB_SSH_ACQUIRE_TIMEOUT", 30)
+)
+MINIO_CONCURRENCY = int(os.environ.get("MINIO_CONCURRENCY", 32))
+COLAB_HOST_LIMITER_TTL = float(os.environ.get("COLAB_HOST_LIMITER_TTL", 600))
+MINIO_STREAM_PENDING_PARTS = int(
+    os.environ.get("MINIO_STREAM_PENDING_PARTS", 2)
+)
+MINIO_PRESIGNED_URL_EXPIRATION = int(
+    os.environ.get("MINIO_PRESIGNED_URL_EXPIRATION", 3600)
+)
+COLAB_CHUNK_SIZE = int(os.environ.get("COLAB_CHUNK_SIZE", 8 * 1024 * 1024))
+COLAB_PREFETCH_BLOCK_SIZE = int(
+    os.environ.get("COLAB_PREFETCH_BLOCK_SIZE", COLAB_CHUNK_SIZE)
+)
+COLAB_PREFETCH_WINDOW = int(os.environ.get("COLAB_PREFETCH_WINDOW", 4))
+COLAB_PREFETCH_MAX_BUFFERS = int(
+    os.environ.get("COLAB_PREFETCH_MAX_BUFFERS", 16)
+)
+COLAB_TRANSFER_ATTEMPTS = int(os.environ.get("COLAB_TRANSFER_ATTEMPTS", 3))
+COLAB_TRANSFER_BACKOFF = float(os.environ.get("COLAB_TRANSFER_BACKOFF", 1))
+COLAB_CAS_DIRECTORY = "/content/.cas"
+COLAB_CAS_MIN_SIZE = int(os.environ.get("COLAB_CAS_MIN_SIZE", 1024 * 1024))
+COLAB_CAS_MAX_ENTRIES = int(os.environ.get("COLAB_CAS_MAX_ENTRIES", 1000))
+COLAB_CAS_TTL = float(os.environ.get("COLAB_CAS_TTL", 12 * 60 * 60))
+COLAB_WATCH_INTERVAL = float(os.environ.get("COLAB_WATCH_INTERVAL", 1))
+COLAB_WATCH_DEBOUNCE = float(os.environ.get("COLAB_WATCH_DEBOUNCE", 2))
+WATCH_RETENTION = int(os.environ.get("WATCH_RETENTION", 100))
+SYNC_INDEX_RECONCILE_INTERVAL = float(
+    os.environ.get("SYNC_INDEX_RECONCILE_INTERVAL", 24 * 60 * 60)
+)
+COLAB_BATCH_MAX_HOSTS = int(os.environ.get("COLAB_BATCH_MAX_HOSTS", 64))
+COLAB_FANOUT_QUEUE_CHUNKS = int(os.environ.get("COLAB_FANOUT_QUEUE_CHUNKS", 4))
+COLAB_HOST_RATE_LIMIT = float(os.environ.get("COLAB_HOST_RATE_LIMIT", 0))
+COLAB_HOST_RATE_BURST = float(
+    os.environ.get("COLAB_HOST_RATE_BURST", 8 * 1024 * 1024)
+)
+SCHEDULER_HOST_TRANSFERS = int(os.environ.get("SCHEDULER_HOST_TRANSFERS", 2))
+SCHEDULER_BUCKET_TRANSFERS = int(
+    os.environ.get("SCHEDULER_BUCKET_TRANSFERS", 8)
+)
+SCHEDULER_HOST_BANDWIDTH = float(os.environ.get("SCHEDULER_HOST_BANDWIDTH", 0))
+SCHEDULER_BUCKET_BANDWIDTH = float(
+    os.environ.get("SCHEDULER_BUCKET_BANDWIDTH", 0)
+)
+SCHEDULER_BANDWIDTH_BURST = float(
+    os.environ.get("SCHEDULER_BANDWIDTH_BURST", 64 * 1024 * 1024)
+)
+SCHEDULER_MAX_QUEUED = int(os.environ.get("SCHEDULER_MAX_QUEUED", 100))
+SCHEDULER_RETRY_AFTER = int(os.environ.get("SCHEDULER_RETRY_AFTER", 5))
+LOG_FILE = os.environ.get("LOG_FILE", "./documentation/app.log")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+LOG_ROTATION = os.environ.get("LOG_ROTATION", "size")
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_ROTATION_WHEN = os.environ.get("LOG_ROTATION_WHEN", "midnight")
+LOG_BACKUP_COUNT = int(os.environ.get("LOG_BACKUP_COUNT", 5))
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", 0.1))
+
+METRICS_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+)
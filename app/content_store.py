@@ -0,0 +1,110 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from .constants import COLAB_CAS_MAX_ENTRIES, COLAB_CAS_TTL
+from .logger import get_logger
+
+store_logger = get_logger(__name__)
+
+StoreHost = Tuple[str, int]
+
+
+def get_content_key(file_obj: Dict[str, Any]) -> str:
+    """Returns key of minio object content in colab content-addressed store.
+
+    Key consists of ETag and size, so objects with the same content uploaded
+    with the same parts have the same key without reading their content.
+    :param file_obj: minio object properties from list_minio_prefix_files.
+    :return: content key that is safe to use as file name.
+    """
+    etag: str = file_obj["ETag"].strip('"')
+    return f"{etag}-{file_obj['Size']}"
+
+
+class ContentIndex:
+    """Thread-safe LRU index of content stored on every colab host.
+
+    Each entry is kept for ttl seconds after last use, the least recently used
+    entries are evicted when host has more than max_entries entries. Evicted
+    keys are kept until they are removed from colab store with pop_evicted.
+    Index is only a hint: entries missing on colab are discarded on use.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._hosts: Dict[StoreHost, "OrderedDict[str, float]"] = {}
+        self._evicted: Dict[StoreHost, Set[str]] = {}
+        self._lock = Lock()
+
+    def get_cached(self, host: StoreHost, keys: Iterable[str]) -> Set[str]:
+        """Returns keys that are stored on host and refreshes their ttl.
+
+        :param host: colab host and port.
+        :param keys: content keys of uploaded files.
+        :return: keys found in index.
+        """
+        with self._lock:
+            entries = self._expire(host)
+            cached_keys = {key for key in keys if key in entries}
+            for key in cached_keys:
+                entries[key] = time.monotonic() + self.ttl
+                entries.move_to_end(key)
+            return cached_keys
+
+    def add(self, host: StoreHost, keys: Iterable[str]) -> None:
+        """Adds keys stored on host evicting the least recently used ones.
+
+        :param host: colab host and port.
+        :param keys: content keys of stored files.
+        :return: None.
+        """
+        with self._lock:
+            entries = self._expire(host)
+            evicted = self._evicted.setdefault(host, set())
+            for key in keys:
+                entries[key] = time.monotonic() + self.ttl
+                entries.move_to_end(key)
+                evicted.discard(key)
+            while len(entries) > self.max_entries:
+                evicted.add(entries.popitem(last=False)[0])
+
+    def discard(self, host: StoreHost, keys: Iterable[str]) -> None:
+        """Removes keys that are missing on host from index.
+
+        :param host: colab host and port.
+        :param keys: content keys.
+        :return: None.
+        """
+        with self._lock:
+            entries = self._hosts.get(host, OrderedDict())
+            for key in keys:
+                entries.pop(key, None)
+
+    def pop_evicted(self, host: StoreHost) -> List[str]:
+        """Returns evicted keys that should be removed from colab store.
+
+        :param host: colab host and port.
+        :return: evicted content keys.
+        """
+        with self._lock:
+            self._expire(host)
+            return sorted(self._evicted.pop(host, set()))
+
+    def _expire(self, host: StoreHost) -> "OrderedDict[str, float]":
+        entries = self._hosts.setdefault(host, OrderedDict())
+        now = time.monotonic()
+        expired_keys = [
+            key for key, expires_at in entries.items() if expires_at < now
+        ]
+        for key in expired_keys:
+            del entries[key]
+        if expired_keys:
+            store_logger.info(f"{len(expired_keys)} entries of {host} expired")
+            self._evicted.setdefault(host, set()).update(expired_keys)
+        return entries
+
+
+content_index = ContentIndex(COLAB_CAS_TTL, COLAB_CAS_MAX_ENTRIES)
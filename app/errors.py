@@ -1,5 +1,3 @@
-from subprocess import SubprocessError
-
 from botocore.exceptions import BotoCoreError, ClientError
 from fastapi.requests import Request
 from fastapi.responses import JSONResponse
@@ -20,6 +18,42 @@ class FileIntegrityError(Exception):
         self.message = message
 
 
+class ObjectsDeleteError(Exception):
+    """Custom exception that will be raised if objects weren't deleted."""
+
+    def __init__(self, message: str):
+        self.message = message
+
+
+class JobNotFound(Exception):
+    """Custom exception that will be raised if colab job doesn't exist."""
+
+    def __init__(self, message: str):
+        self.message = message
+
+
+class WatchNotFound(Exception):
+    """Custom exception that will be raised if watch session doesn't exist."""
+
+    def __init__(self, message: str):
+        self.message = message
+
+
+class InvalidFormData(Exception):
+    """Custom exception that will be raised if form data can't be parsed."""
+
+    def __init__(self, message: str):
+        self.message = message
+
+
+class SchedulerQueueFull(Exception):
+    """Custom exception that will be raised if transfer can't be queued."""
+
+    def __init__(self, message: str, retry_after: int):
+        self.message = message
+        self.retry_after = retry_after
+
+
 def botocore_error_handler(
     request: Request, exc: BotoCoreError
 ) -> JSONResponse:
@@ -56,19 +90,56 @@ def ssh_connection_error_handler(
     )
 
 
-def subprocess_run_error_handler(
-    request: Request, exc: SubprocessError
+def file_integrity_error_handler(
+    request: Request, exc: FileIntegrityError
 ) -> JSONResponse:
     return JSONResponse(
         status_code=404,
-        content={"detail": f"Error: {exc}"},
+        content={"detail": f"Error: {exc.message}"},
     )
 
 
-def file_integrity_error_handler(
-    request: Request, exc: FileIntegrityError
+def objects_delete_error_handler(
+    request: Request, exc: ObjectsDeleteError
+) -> JSONResponse:
+    return JSONResponse(
+        status_code=500,
+        content={"detail": f"Error: {exc.message}"},
+    )
+
+
+def job_not_found_error_handler(
+    request: Request, exc: JobNotFound
+) -> JSONResponse:
+    return JSONResponse(
+        status_code=404,
+        content={"detail": f"Error: {exc.message}"},
+    )
+
+
+def watch_not_found_error_handler(
+    request: Request, exc: WatchNotFound
 ) -> JSONResponse:
     return JSONResponse(
         status_code=404,
         content={"detail": f"Error: {exc.message}"},
     )
+
+
+def invalid_form_data_error_handler(
+    request: Request, exc: InvalidFormData
+) -> JSONResponse:
+    return JSONResponse(
+        status_code=400,
+        content={"detail": f"Error: {exc.message}"},
+    )
+
+
+def scheduler_queue_full_error_handler(
+    request: Request, exc: SchedulerQueueFull
+) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": f"Error: {exc.message}"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
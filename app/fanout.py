@@ -0,0 +1,222 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from pathlib import Path
+from queue import Queue
+from typing import BinaryIO, Dict, List, Tuple, cast
+
+import boto3
+from paramiko import SSHException
+
+from .colab_functions import (
+    PutFileResult,
+    connect_ssh_colab,
+    deduplicate_file_names,
+    get_colab_chunks,
+    get_resumable_paths,
+    get_transfer_stats,
+    put_file_to_colab,
+    read_file_chunks,
+    run_colab_command,
+    verify_colab_files,
+)
+from .concurrency import TokenBucket, get_host_key, host_rate_limiters
+from .constants import (
+    COLAB_CHUNK_SIZE,
+    COLAB_FANOUT_QUEUE_CHUNKS,
+    COLAB_UPLOAD_DIRECTORY,
+)
+from .errors import FileIntegrityError
+from .logger import get_logger
+from .metrics import instrumented, record_transfer
+from .minio_functions import FileInfo
+from .prefetch import PrefetchedObject
+from .schemas import ColabCredentials, TransferStatsSchema
+
+fanout_logger = get_logger(__name__)
+
+
+class FanoutTarget:
+    """Colab host that receives chunks of fanned out minio objects.
+
+    Chunks are passed through bounded queue, so producer can't get more than
+    COLAB_FANOUT_QUEUE_CHUNKS chunks ahead of the slowest host. None in queue
+    means that producer finished or failed. Reads of chunks are limited by
+    token bucket of host.
+    """
+
+    def __init__(self, credentials: ColabCredentials):
+        self.credentials = credentials
+        self.chunks: "Queue[bytes]" = Queue(COLAB_FANOUT_QUEUE_CHUNKS)
+        self.rate_limiter: TokenBucket = host_rate_limiters.get(
+            get_host_key(credentials.host, credentials.port)
+        )
+        self.stats: TransferStatsSchema = None
+        self.error: str = None
+        self.is_finished = False
+
+    def read(self, size: int) -> bytes:
+        """Returns next chunk of currently uploaded file.
+
+        Producer puts chunks of COLAB_CHUNK_SIZE bytes, that are requested by
+        read_file_chunks. If producer stopped before file end - raises
+        FileIntegrityError exception.
+        :param size: requested number of bytes, equals to size of chunk.
+        :return: chunk of file.
+        """
+        chunk = self.chunks.get()
+        if chunk is None:
+            self.is_finished = True
+            raise FileIntegrityError("Source of uploaded files failed")
+        self.rate_limiter.consume(len(chunk))
+        return chunk
+
+    def drain(self) -> None:
+        """Skips remaining chunks, so failed host doesn't block producer.
+
+        :return: None.
+        """
+        while not self.is_finished:
+            self.is_finished = self.chunks.get() is None
+
+
+def _upload_fanned_out_files(
+    target: FanoutTarget, bucket: str, files: FileInfo
+) -> None:
+    """Writes chunks received by target into colab /content/uploaded.
+
+    Files are written in order of files, resumable chunks of previous uploads
+    aren't sent again and written files are verified by md5 on colab. Any
+    error is saved into target and remaining chunks are drained.
+    :param target: colab host with queue of chunks.
+    :param bucket: bucket of uploaded files.
+    :param files: minio objects properties in order of producer.
+    :return: None.
+    """
+    start_time = time.monotonic()
+    credentials = target.credentials
+    file_names = [Path(file_obj["Key"]).name for file_obj in files]
+    try:
+        with connect_ssh_colab(credentials) as lease:
+            ssh_client = lease.ssh_client
+            run_colab_command(ssh_client, f"mkdir -p {COLAB_UPLOAD_DIRECTORY}")
+            remote_chunks = get_colab_chunks(
+                ssh_client, get_resumable_paths(file_names), COLAB_CHUNK_SIZE
+            )
+            put_results: List[PutFileResult] = []
+            with ssh_client.open_sftp() as sftp_session:
+                for file_obj, file_name in zip(files, file_names):
+                    put_results.append(
+                        put_file_to_colab(
+                            sftp_session,
+                            cast(BinaryIO, target),
+                            file_obj["Size"],
+                            file_name,
+                            remote_chunks,
+                        )
+                    )
+            target.is_finished = target.chunks.get() is None
+            verify_colab_files(ssh_client, put_results)
+        bytes_sent = sum(put_result.bytes_sent for put_result in put_results)
+        target.stats = get_transfer_stats(len(files), bytes_sent, start_time)
+        record_transfer(
+            "minio_to_colab",
+            bucket,
+            get_host_key(credentials.host, credentials.port),
+            bytes_sent,
+        )
+    except (SSHException, OSError, EOFError, FileIntegrityError) as error:
+        fanout_logger.warning(
+            f"Upload to colab {credentials.host}:{credentials.port} "
+            f"failed: {error}"
+        )
+        target.error = str(error) or error.__class__.__name__
+    finally:
+        target.drain()
+
+
+def _produce_chunks(
+    minio_client: boto3.client,
+    bucket: str,
+    files: FileInfo,
+    targets: List[FanoutTarget],
+) -> int:
+    """Reads every minio object once and puts its chunks to all targets.
+
+    Objects are prefetched by parallel ranged GETs while chunks are consumed.
+    Chunks aren't put to targets that already failed. None is put to every
+    target queue after the last chunk or on error.
+    :param minio_client: boto3 client connected to minio storage.
+    :param bucket: bucket to stream files from.
+    :param files: minio objects properties from list_minio_prefix_files.
+    :param targets: colab hosts that receive chunks.
+    :return: number of bytes read from minio.
+    """
+    bytes_read = 0
+    try:
+        for file_obj in files:
+            with closing(
+                PrefetchedObject(
+                    minio_client,
+                    bucket,
+                    file_obj["Key"],
+                    file_obj["Size"],
+                    file_obj["ETag"],
+                )
+            ) as file_object:
+                for chunk in read_file_chunks(
+                    file_object, file_obj["Size"], file_obj["Key"]
+                ):
+                    bytes_read += len(chunk)
+                    for target in targets:
+                        if target.error is None:
+                            target.chunks.put(chunk)
+    finally:
+        for target in targets:
+            target.chunks.put(None)
+    return bytes_read
+
+
+@instrumented()
+def fan_out_minio_files_to_colab(
+    minio_client: boto3.client,
+    bucket: str,
+    files: FileInfo,
+    hosts: List[ColabCredentials],
+) -> Tuple[int, List[FanoutTarget]]:
+    """Uploads minio objects into /content/uploaded of many colab hosts.
+
+    Every object is read from minio only once and its chunks are sent to all
+    hosts concurrently, so the slowest host sets pace of upload. Hosts with
+    the same host and port receive files once, for objects with the same
+    name only the last listed one is uploaded. Failure of one host doesn't
+    stop uploads to other hosts, its error is returned in target. If minio
+    object can't be read - uploads to all hosts fail and error is reraised.
+    :param minio_client: boto3 client connected to minio storage.
+    :param bucket: bucket to stream files from.
+    :param files: minio objects properties from list_minio_prefix_files.
+    :param hosts: credentials of colab hosts.
+    :return: number of bytes read from minio and targets with results.
+    """
+    files = deduplicate_file_names(files)
+    unique_hosts: Dict[Tuple[str, int], ColabCredentials] = {}
+    for credentials in hosts:
+        unique_hosts.setdefault(
+            (credentials.host, credentials.port), credentials
+        )
+    targets = [
+        FanoutTarget(credentials) for credentials in unique_hosts.values()
+    ]
+    with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        futures = [
+            executor.submit(_upload_fanned_out_files, target, bucket, files)
+            for target in targets
+        ]
+        bytes_read = _produce_chunks(minio_client, bucket, files, targets)
+        for future in futures:
+            future.result()
+    fanout_logger.info(
+        f"{len(files)} files were uploaded to {len(targets)} colab hosts",
+        extra={"files": len(files), "bytes": bytes_read},
+    )
+    return bytes_read, targets
@@ -0,0 +1,221 @@
+import time
+from typing import AsyncIterator, Dict, List, Tuple
+
+import anyio
+import boto3
+from multipart.multipart import MultipartParser, parse_options_header
+
+from .concurrency import MINIO_HOST, run_on_host
+from .constants import MINIO_STREAM_PENDING_PARTS
+from .errors import InvalidFormData
+from .logger import get_logger
+from .metrics import record_transfer
+from .minio_functions import MinioMultipartUpload
+from .schemas import UploadedFileStatsSchema
+
+streaming_logger = get_logger(__name__)
+
+FormEvent = Tuple[str, bytes]
+
+
+def get_form_boundary(content_type: str) -> bytes:
+    """Returns boundary of multipart/form-data request body.
+
+    If request isn't multipart/form-data - raises InvalidFormData exception.
+    :param content_type: value of Content-Type header.
+    :return: boundary.
+    """
+    media_type, options = parse_options_header(content_type)
+    boundary: bytes = options.get(b"boundary")
+    if media_type != b"multipart/form-data" or not boundary:
+        raise InvalidFormData("Request body should be multipart/form-data")
+    return boundary
+
+
+class FormEventsParser:
+    """Incremental multipart/form-data parser that records parts events.
+
+    Events are ("file", filename) at the beginning of file part, ("data",
+    bytes) for every piece of its content and ("end", b"") after it. Parts
+    without filename (i.e. plain form fields) are skipped.
+    """
+
+    def __init__(self, boundary: bytes):
+        self.events: List[FormEvent] = []
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = bytearray()
+        self._header_value = bytearray()
+        self._is_file = False
+        self._parser = MultipartParser(
+            boundary,
+            {
+                "on_part_begin": self._on_part_begin,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+            },
+        )
+
+    def write(self, data: bytes) -> List[FormEvent]:
+        """Parses next piece of request body.
+
+        :param data: piece of request body.
+        :return: events of parts found in data.
+        """
+        self.events = []
+        try:
+            self._parser.write(data)
+        except ValueError as error:
+            raise InvalidFormData(f"Invalid form data: {error}")
+        return self.events
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        header_field = bytes(self._header_field).lower()
+        self._headers[header_field] = bytes(self._header_value)
+        self._header_field.clear()
+        self._header_value.clear()
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(
+            self._headers.get(b"content-disposition", b"")
+        )
+        file_name = options.get(b"filename")
+        self._is_file = bool(file_name)
+        if self._is_file:
+            self.events.append(("file", file_name))
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._is_file:
+            self.events.append(("data", data[start:end]))
+
+    def _on_part_end(self) -> None:
+        if self._is_file:
+            self.events.append(("end", b""))
+
+
+class _StreamedFile:
+    """File from request body that is forwarded to minio part by part."""
+
+    def __init__(self, upload: MinioMultipartUpload):
+        self.upload = upload
+        self.buffer = bytearray()
+        self.parts_count = 0
+        self.size = 0
+        self.start_time = time.monotonic()
+
+
+async def stream_form_files_to_minio(
+    body: AsyncIterator[bytes],
+    content_type: str,
+    minio_client: boto3.client,
+    bucket: str,
+    keys_prefix: str,
+    part_size: int,
+) -> List[UploadedFileStatsSchema]:
+    """Forwards files from multipart/form-data body into minio uploads.
+
+    Body is parsed while it is received, content of every file is collected
+    into part_size parts that are uploaded in background. Reading of body
+    waits while MINIO_STREAM_PENDING_PARTS parts are being uploaded, so
+    memory usage is bounded and no temporary files are created. Upload of
+    file that wasn't received completely is aborted.
+    :param body: asynchronous iterator over request body pieces.
+    :param content_type: value of Content-Type header of request.
+    :param minio_client: boto3 client connected to minio storage.
+    :param bucket: bucket to upload files into.
+    :param keys_prefix: prefix that is added to files names.
+    :param part_size: size of multipart upload parts in bytes.
+    :return: per-file upload statistics.
+    """
+    parser = FormEventsParser(get_form_boundary(content_type))
+    pending_parts = anyio.Semaphore(MINIO_STREAM_PENDING_PARTS)
+    files_stats: List[UploadedFileStatsSchema] = []
+    streamed_file: _StreamedFile = None
+
+    async def upload_part(
+        upload: MinioMultipartUpload, part_number: int, data: bytes
+    ) -> None:
+        try:
+            await run_on_host(
+                MINIO_HOST, upload.upload_part, part_number, data
+            )
+        finally:
+            pending_parts.release()
+
+    async def wait_pending_parts() -> None:
+        for _ in range(MINIO_STREAM_PENDING_PARTS):
+            await pending_parts.acquire()
+        for _ in range(MINIO_STREAM_PENDING_PARTS):
+            pending_parts.release()
+
+    try:
+        async with anyio.create_task_group() as task_group:
+            async for chunk in body:
+                for event, data in parser.write(chunk):
+                    if event == "file":
+                        object_key = f"{keys_prefix}/{data.decode()}"
+                        streamed_file = _StreamedFile(
+                            MinioMultipartUpload(
+                                minio_client, bucket, object_key
+                            )
+                        )
+                    elif event == "data":
+                        streamed_file.buffer += data
+                        streamed_file.size += len(data)
+                        while len(streamed_file.buffer) >= part_size:
+                            part = bytes(streamed_file.buffer[:part_size])
+                            del streamed_file.buffer[:part_size]
+                            streamed_file.parts_count += 1
+                            await pending_parts.acquire()
+                            task_group.start_soon(
+                                upload_part,
+                                streamed_file.upload,
+                                streamed_file.parts_count,
+                                part,
+                            )
+                    else:
+                        await wait_pending_parts()
+                        await run_on_host(
+                            MINIO_HOST,
+                            streamed_file.upload.complete,
+                            bytes(streamed_file.buffer),
+                        )
+                        files_stats.append(
+                            UploadedFileStatsSchema(
+                                key=streamed_file.upload.object_key,
+                                size=streamed_file.size,
+                                elapsed_seconds=round(
+                                    time.monotonic()
+                                    - streamed_file.start_time,
+                                    3,
+                                ),
+                            )
+                        )
+                        streamed_file = None
+        if streamed_file is not None or not files_stats:
+            raise InvalidFormData("Request body doesn't contain whole files")
+    except BaseException:
+        if streamed_file is not None:
+            with anyio.CancelScope(shield=True):
+                await run_on_host(MINIO_HOST, streamed_file.upload.abort)
+        raise
+    streaming_logger.info(f"Streamed {len(files_stats)} files to {bucket}")
+    record_transfer(
+        "client_to_minio",
+        bucket,
+        "",
+        sum(file_stats.size for file_stats in files_stats),
+    )
+    return files_stats
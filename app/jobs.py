@@ -0,0 +1,454 @@
+import codecs
+import json
+import select
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from threading import Condition, Event, Lock, Thread
+from typing import Any, AsyncIterator, Deque, Dict, List, Tuple
+from uuid import uuid4
+
+import anyio
+import boto3
+from paramiko import Channel, SSHException
+
+from .colab_functions import execute_script, run_colab_command
+from .constants import (
+    COLAB_JOBS_DIRECTORY,
+    JOB_LOG_CHUNK_SIZE,
+    JOB_LOG_MAX_BACKLOG,
+    JOB_LOG_UPLOAD_WORKERS,
+    JOB_OUTPUT_BUFFER_SIZE,
+    JOB_POLL_INTERVAL,
+    JOB_RETENTION,
+)
+from .errors import JobNotFound
+from .logger import get_logger
+from .minio_functions import put_minio_object
+from .schemas import ColabCredentials, JobSchema, JobStates
+from .ssh_pool import SSHLease, ssh_pool
+
+jobs_logger = get_logger(__name__)
+
+CHANNEL_READ_SIZE = 32768
+OUTPUT_STREAMS = ("stdout", "stderr")
+
+OutputChunk = Tuple[int, str, bytes]
+
+
+class JobOutput:
+    """Bounded in-memory buffer of job output shared by log readers.
+
+    Chunks are numbered sequentially. When buffered size exceeds max_size
+    the oldest chunks are dropped, so slow readers never hold output of
+    running script - they notice skipped sequence numbers instead.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._chunks: Deque[OutputChunk] = deque()
+        self._size = 0
+        self._next_sequence = 0
+        self._closed = False
+        self._condition = Condition()
+
+    def append(self, stream: str, data: bytes) -> None:
+        with self._condition:
+            self._chunks.append((self._next_sequence, stream, data))
+            self._next_sequence += 1
+            self._size += len(data)
+            while self._size > self.max_size and len(self._chunks) > 1:
+                self._size -= len(self._chunks.popleft()[2])
+            self._condition.notify_all()
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def read(
+        self, sequence: int, timeout: float
+    ) -> Tuple[List[OutputChunk], bool]:
+        """Returns buffered chunks starting from sequence number.
+
+        Waits up to timeout seconds if there are no such chunks yet.
+        :param sequence: number of first chunk to return.
+        :param timeout: maximum time to wait for new output in seconds.
+        :return: list of chunks and flag showing that output is complete.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._closed or self._next_sequence > sequence,
+                timeout,
+            )
+            chunks = [chunk for chunk in self._chunks if chunk[0] >= sequence]
+            return chunks, self._closed and not chunks
+
+
+class JobLogWriter:
+    """Persists job output to minio as sequence of numbered log objects.
+
+    Output of every stream is accumulated until chunk_size bytes and then
+    put as <logs_prefix><stream>-<part>.log object in background. Bytes that
+    are not yet stored are counted as backlog, supervisor stops reading job
+    channel while backlog is exceeded.
+    """
+
+    def __init__(
+        self,
+        minio_client: boto3.client,
+        bucket: str,
+        logs_prefix: str,
+        executor: ThreadPoolExecutor,
+    ):
+        self.minio_client = minio_client
+        self.bucket = bucket
+        self.logs_prefix = logs_prefix
+        self._executor = executor
+        self._pending = {stream: bytearray() for stream in OUTPUT_STREAMS}
+        self._parts = {stream: 0 for stream in OUTPUT_STREAMS}
+        self._backlog = 0
+        self._lock = Lock()
+
+    @property
+    def is_backlogged(self) -> bool:
+        with self._lock:
+            return self._backlog >= JOB_LOG_MAX_BACKLOG
+
+    def write(self, stream: str, data: bytes) -> None:
+        self._pending[stream] += data
+        with self._lock:
+            self._backlog += len(data)
+        if len(self._pending[stream]) >= JOB_LOG_CHUNK_SIZE:
+            self._flush(stream)
+
+    def close(self) -> None:
+        for stream in OUTPUT_STREAMS:
+            self._flush(stream)
+
+    def _flush(self, stream: str) -> None:
+        data = bytes(self._pending[stream])
+        self._pending[stream].clear()
+        if not data:
+            return
+        object_key = (
+            f"{self.logs_prefix}{stream}-{self._parts[stream]:06d}.log"
+        )
+        self._parts[stream] += 1
+        future = self._executor.submit(
+            put_minio_object, self.minio_client, data, object_key, self.bucket
+        )
+        future.add_done_callback(
+            lambda done: self._on_stored(done, object_key, len(data))
+        )
+
+    def _on_stored(self, future: "Future[None]", key: str, size: int) -> None:
+        with self._lock:
+            self._backlog -= size
+        if future.exception() is not None:
+            jobs_logger.warning(
+                f"Log {key} wasn't stored: {future.exception()}"
+            )
+
+
+class ColabJob:
+    """Script running on colab with leased ssh connection of job."""
+
+    def __init__(
+        self,
+        job_id: str,
+        script_name: str,
+        host: str,
+        ssh_lease: SSHLease,
+        channel: Channel,
+        log_writer: JobLogWriter,
+    ):
+        self.job_id = job_id
+        self.script_name = script_name
+        self.host = host
+        self.ssh_lease = ssh_lease
+        self.ssh_client = ssh_lease.ssh_client
+        self.channel = channel
+        self.log_writer = log_writer
+        self.output = JobOutput(JOB_OUTPUT_BUFFER_SIZE)
+        self.state = JobStates.running
+        self.exit_status: int = None
+        self.started_at = datetime.now(timezone.utc)
+        self.finished_at: datetime = None
+        self.usage: Dict[str, Any] = {}
+
+    @property
+    def usage_path(self) -> str:
+        return get_usage_path(self.job_id)
+
+    def to_schema(self) -> JobSchema:
+        finished_at = self.finished_at or datetime.now(timezone.utc)
+        return JobSchema(
+            job_id=self.job_id,
+            script_name=self.script_name,
+            host=self.host,
+            state=self.state,
+            exit_status=self.exit_status,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            elapsed_seconds=(finished_at - self.started_at).total_seconds(),
+            user_time=self.usage.get("user_time"),
+            system_time=self.usage.get("system_time"),
+            max_rss_kb=self.usage.get("max_rss_kb"),
+            logs_prefix=self.log_writer.logs_prefix,
+        )
+
+
+def get_usage_path(job_id: str) -> str:
+    """Returns colab path of file with resource usage of job.
+
+    :param job_id: id of job.
+    :return: absolute path on colab.
+    """
+    return f"{COLAB_JOBS_DIRECTORY}/{job_id}.json"
+
+
+def format_output_event(sequence: int, stream: str, text: str) -> str:
+    """Formats chunk of job output as server-sent event.
+
+    :param sequence: sequence number of chunk used as event id.
+    :param stream: name of output stream used as event type.
+    :param text: decoded chunk of output.
+    :return: event ready to be sent.
+    """
+    data = "".join(f"data: {line}\n" for line in text.split("\n"))
+    return f"id: {sequence}\nevent: {stream}\n{data}\n"
+
+
+async def iter_job_events(
+    job: ColabJob, sequence: int, keepalive: float, poll_interval: float
+) -> AsyncIterator[str]:
+    """Yields job output as server-sent events until job is finished.
+
+    Every chunk of output is sent as "stdout" or "stderr" event with chunk
+    sequence number as event id. If requested chunks were already dropped
+    from buffer - "gap" event with number of lost chunks is sent. Comment is
+    sent every keepalive seconds without output. Last "end" event contains
+    final job state. Output buffer is polled without blocking event loop.
+    :param job: tracked colab job.
+    :param sequence: number of first chunk to send.
+    :param keepalive: interval between keepalive comments in seconds.
+    :param poll_interval: interval between output buffer reads in seconds.
+    :return: asynchronous iterator over formatted events.
+    """
+    decoders = {
+        stream: codecs.getincrementaldecoder("utf-8")("replace")
+        for stream in OUTPUT_STREAMS
+    }
+    last_event_time = time.monotonic()
+    while True:
+        chunks, finished = job.output.read(sequence, 0)
+        if finished:
+            break
+        if not chunks:
+            if time.monotonic() - last_event_time >= keepalive:
+                last_event_time = time.monotonic()
+                yield ": keepalive\n\n"
+            await anyio.sleep(poll_interval)
+            continue
+        if chunks[0][0] > sequence:
+            yield f"event: gap\ndata: {chunks[0][0] - sequence}\n\n"
+        for chunk_sequence, stream, data in chunks:
+            text = decoders[stream].decode(data)
+            yield format_output_event(chunk_sequence, stream, text)
+        sequence = chunks[-1][0] + 1
+        last_event_time = time.monotonic()
+    yield f"event: end\ndata: {job.state.value}\n\n"
+
+
+class JobSupervisor:
+    """Starts scripts on colab and tracks them in background thread.
+
+    Thread waits for output on channels of running jobs up to poll_interval
+    seconds, passes it to job output buffer and log writer and, after script
+    exits, collects exit status and resource usage and closes job ssh
+    connection. Channels of jobs with log backlog are not read, so remote
+    script is paused by ssh flow control. Only retention latest finished jobs
+    are kept.
+    """
+
+    def __init__(self, poll_interval: float, retention: int):
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._jobs: "OrderedDict[str, ColabJob]" = OrderedDict()
+        self._lock = Lock()
+        self._stopped = Event()
+        self._thread: Thread = None
+        self._logs_executor = ThreadPoolExecutor(
+            max_workers=JOB_LOG_UPLOAD_WORKERS
+        )
+
+    def start_job(
+        self,
+        credentials: ColabCredentials,
+        script_name: str,
+        minio_client: boto3.client,
+        bucket: str,
+        keys_prefix: str,
+    ) -> ColabJob:
+        """Executes script on colab over pooled ssh connection.
+
+        Script output is stored in minio at <keys_prefix>/logs/<job_id>/.
+        :param credentials: credentials for ssh connection.
+        :param script_name: name of uploaded script to execute.
+        :param minio_client: boto3 client connected to minio storage.
+        :param bucket: bucket to store logs in.
+        :param keys_prefix: prefix of logs objects keys.
+        :return: started job.
+        """
+        job_id = uuid4().hex
+        log_writer = JobLogWriter(
+            minio_client,
+            bucket,
+            f"{keys_prefix.strip('/')}/logs/{job_id}/",
+            self._logs_executor,
+        )
+        ssh_lease = ssh_pool.acquire(credentials)
+        try:
+            channel = execute_script(
+                ssh_lease.ssh_client, script_name, get_usage_path(job_id)
+            )
+        except SSHException:
+            ssh_pool.release(ssh_lease)
+            raise
+        job = ColabJob(
+            job_id,
+            script_name,
+            credentials.host,
+            ssh_lease,
+            channel,
+            log_writer,
+        )
+        with self._lock:
+            self._jobs[job_id] = job
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped.clear()
+                self._thread = Thread(target=self._supervise, daemon=True)
+                self._thread.start()
+        jobs_logger.info(f"Job {job_id} started script {script_name}")
+        return job
+
+    def get_job(self, job_id: str) -> ColabJob:
+        """Returns job with job_id or raises JobNotFound exception.
+
+        :param job_id: id of job.
+        :return: job.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise JobNotFound(f"Job {job_id} doesn't exist")
+        return job
+
+    def stop(self) -> None:
+        """Stops supervisor thread and closes channels of running jobs.
+
+        :return: None.
+        """
+        self._stopped.set()
+        with self._lock:
+            for job in self._jobs.values():
+                if job.state == JobStates.running:
+                    job.channel.close()
+                    job.output.close()
+
+    def _running_jobs(self) -> List[ColabJob]:
+        with self._lock:
+            return [
+                job
+                for job in self._jobs.values()
+                if job.state == JobStates.running
+            ]
+
+    def _wait_output(self, jobs: List[ColabJob]) -> None:
+        channels = [
+            job.channel for job in jobs if not job.log_writer.is_backlogged
+        ]
+        if channels:
+            select.select(channels, [], [], self.poll_interval)
+        else:
+            self._stopped.wait(self.poll_interval)
+
+    def _supervise(self) -> None:
+        while not self._stopped.is_set():
+            jobs = self._running_jobs()
+            self._wait_output(jobs)
+            for job in jobs:
+                try:
+                    self._check_job(job)
+                except (SSHException, OSError) as error:
+                    jobs_logger.warning(f"Job {job.job_id} error: {error}")
+                    self._finish_job(job, JobStates.lost)
+
+    def _check_job(self, job: ColabJob) -> None:
+        if job.log_writer.is_backlogged:
+            return
+        channel = job.channel
+        while channel.recv_ready() or channel.recv_stderr_ready():
+            if channel.recv_ready():
+                self._write_output(
+                    job, "stdout", channel.recv(CHANNEL_READ_SIZE)
+                )
+            if channel.recv_stderr_ready():
+                self._write_output(
+                    job, "stderr", channel.recv_stderr(CHANNEL_READ_SIZE)
+                )
+            if job.log_writer.is_backlogged:
+                return
+        if channel.exit_status_ready():
+            job.exit_status = channel.recv_exit_status()
+            job.usage = self._read_usage(job)
+            state = JobStates.succeeded
+            if job.exit_status != 0:
+                state = JobStates.failed
+            self._finish_job(job, state)
+        elif not job.ssh_client.get_transport().is_active():
+            self._finish_job(job, JobStates.lost)
+
+    @staticmethod
+    def _write_output(job: ColabJob, stream: str, data: bytes) -> None:
+        if data:
+            job.output.append(stream, data)
+            job.log_writer.write(stream, data)
+
+    @staticmethod
+    def _read_usage(job: ColabJob) -> Dict[str, Any]:
+        try:
+            usage = run_colab_command(
+                job.ssh_client,
+                f"cat {job.usage_path} && rm -f {job.usage_path}",
+            )
+        except (SSHException, OSError):
+            return {}
+        try:
+            usage_info: Dict[str, Any] = json.loads(usage)
+        except ValueError as error:
+            jobs_logger.warning(f"Job {job.job_id} usage is invalid: {error}")
+            return {}
+        return usage_info
+
+    def _finish_job(self, job: ColabJob, state: JobStates) -> None:
+        job.state = state
+        job.finished_at = datetime.now(timezone.utc)
+        job.channel.close()
+        ssh_pool.release(job.ssh_lease)
+        job.log_writer.close()
+        job.output.close()
+        jobs_logger.info(f"Job {job.job_id} {state.value}")
+        with self._lock:
+            finished_jobs = [
+                job_id
+                for job_id, tracked_job in self._jobs.items()
+                if tracked_job.state != JobStates.running
+            ]
+            for job_id in finished_jobs[: -self.retention or None]:
+                del self._jobs[job_id]
+
+
+job_supervisor = JobSupervisor(JOB_POLL_INTERVAL, JOB_RETENTION)
@@ -1,15 +1,177 @@
+import atexit
+import json
 import logging
+import random
 import sys
+from contextvars import ContextVar, Token
+from datetime import datetime, timezone
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+    TimedRotatingFileHandler,
+)
+from queue import Queue
+from typing import Any, Dict
+from uuid import uuid4
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .constants import (
+    LOG_BACKUP_COUNT,
+    LOG_FILE,
+    LOG_FORMAT,
+    LOG_MAX_BYTES,
+    LOG_ROTATION,
+    LOG_ROTATION_WHEN,
+    LOG_SAMPLE_RATE,
+)
 
 log_format = (
     "%(asctime)s - [%(levelname)s] - %(name)s - "
     "(%(filename)s).%(funcName)s(%(lineno)d) - %(message)s"
 )
-file_handler = logging.FileHandler("./documentation/app.log")
-stream_handler = logging.StreamHandler(sys.stdout)
-logging.basicConfig(
-    format=log_format, level="INFO", handlers=(file_handler, stream_handler)
+# Fields of log records that are written as separate keys of json records.
+STRUCTURED_FIELDS = (
+    "request_id",
+    "bucket",
+    "prefix",
+    "host",
+    "files",
+    "bytes",
 )
+# Extra of noisy per-file info records that are written with LOG_SAMPLE_RATE.
+SAMPLED = {"sampled": True}
+
+log_context: "ContextVar[Dict[str, Any]]" = ContextVar(
+    "log_context", default={}
+)
+
+
+def set_log_context(**fields: Any) -> "Token[Dict[str, Any]]":
+    """Adds fields to all records logged in current context.
+
+    Context is copied into worker threads started by run_on_host, so fields
+    set by request handler are added to records of its helpers.
+    :param fields: values of STRUCTURED_FIELDS.
+    :return: token to reset context.
+    """
+    return log_context.set({**log_context.get(), **fields})
+
+
+class ContextFilter(logging.Filter):
+    """Adds fields of log_context to records that don't have them."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for field, value in log_context.get().items():
+            if value is not None and not hasattr(record, field):
+                setattr(record, field, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps only sample_rate part of info records logged with SAMPLED."""
+
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or not getattr(
+            record, "sampled", False
+        ):
+            return True
+        return random.random() < self.sample_rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as json objects with STRUCTURED_FIELDS keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        log_record = {
+            "time": datetime.fromtimestamp(
+                record.created, timezone.utc
+            ).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "location": f"({record.filename}).{record.funcName}"
+            f"({record.lineno})",
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            if getattr(record, field, None) is not None:
+                log_record[field] = getattr(record, field)
+        if record.exc_info:
+            log_record["exception"] = self.formatException(record.exc_info)
+        return json.dumps(log_record, default=str)
+
+
+def create_file_handler() -> logging.Handler:
+    """Creates handler of LOG_FILE with LOG_ROTATION rotation.
+
+    :return: rotating by size, by time or not rotating file handler.
+    """
+    if LOG_ROTATION == "size":
+        return RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT
+        )
+    if LOG_ROTATION == "time":
+        return TimedRotatingFileHandler(
+            LOG_FILE, when=LOG_ROTATION_WHEN, backupCount=LOG_BACKUP_COUNT
+        )
+    return logging.FileHandler(LOG_FILE)
+
+
+class RequestContextMiddleware:
+    """ASGI middleware that sets request id and bucket of log_context.
+
+    Request id is taken from X-Request-ID header or generated, it is
+    returned in X-Request-ID header of response.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        request_id = headers.get("x-request-id") or uuid4().hex
+        token = log_context.set(
+            {"request_id": request_id, "bucket": headers.get("bucket")}
+        )
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Request-ID"] = request_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            log_context.reset(token)
+
+
+formatter = (
+    JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(log_format)
+)
+file_handler = create_file_handler()
+stream_handler = logging.StreamHandler(sys.stdout)
+for handler in (file_handler, stream_handler):
+    handler.setFormatter(formatter)
+log_queue: "Queue[logging.LogRecord]" = Queue()
+queue_handler = QueueHandler(log_queue)
+queue_handler.setFormatter(logging.Formatter("%(message)s"))
+queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))
+queue_handler.addFilter(ContextFilter())
+queue_listener = QueueListener(log_queue, file_handler, stream_handler)
+logging.basicConfig(level="INFO", handlers=(queue_handler,))
+queue_listener.start()
+atexit.register(queue_listener.stop)
 
 
 def get_logger(name: str) -> logging.Logger:
@@ -1,49 +1,92 @@
 import logging
-from pathlib import Path
-from subprocess import SubprocessError
-from tempfile import TemporaryDirectory
 from typing import List
 
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import BotoCoreError, ClientError
-from fastapi import FastAPI, Form, Header, UploadFile, status
-from fastapi.responses import Response
+from fastapi import FastAPI, Form, Header, Query, Request, UploadFile, status
+from fastapi.responses import Response, StreamingResponse
 from paramiko import SSHException
 
 from .colab_functions import (
-    connect_ssh_colab,
-    execute_script,
-    get_aws_credentials,
-    local_mount_colab_directory,
-    sync_files_with_minio,
-    upload_file_to_colab,
-)
-from .constants import ROUTES_PREFIX, TAG
+    CHANNEL_TRANSFER_MODES,
+    SYNC_CHANNEL_TRANSFER_MODES,
+    deduplicate_file_names,
+    get_transfer_channels,
+    get_upload_plan_schema,
+    plan_colab_upload,
+    run_colab_transfer,
+    transfer_files_to_colab,
+)
+from .concurrency import MINIO_HOST, get_host_key, run_on_host
+from .constants import (
+    JOB_LOGS_KEEPALIVE,
+    JOB_LOGS_POLL_INTERVAL,
+    MINIO_MIN_PART_SIZE,
+    MINIO_MULTIPART_CHUNKSIZE,
+    ROUTES_PREFIX,
+    TAG,
+)
 from .errors import (
     FileIntegrityError,
+    InvalidFormData,
+    JobNotFound,
     NoSuchBucket,
+    ObjectsDeleteError,
+    SchedulerQueueFull,
+    WatchNotFound,
     botocore_error_handler,
     file_integrity_error_handler,
+    invalid_form_data_error_handler,
+    job_not_found_error_handler,
     minio_client_error_handler,
     no_such_bucket_error_handler,
+    objects_delete_error_handler,
+    scheduler_queue_full_error_handler,
     ssh_connection_error_handler,
-    subprocess_run_error_handler,
+    watch_not_found_error_handler,
 )
-from .logger import get_logger
+from .fanout import fan_out_minio_files_to_colab
+from .form_streaming import stream_form_files_to_minio
+from .jobs import iter_job_events, job_supervisor
+from .logger import RequestContextMiddleware, get_logger, set_log_context
+from .metrics import CONTENT_TYPE, record_transfer, registry
 from .minio_functions import (
     clear_minio_prefix,
+    create_minio_client,
     get_minio_client,
-    get_minio_object,
+    get_transfer_config,
     list_minio_prefix_files,
-    upload_file_to_minio,
+    upload_files_to_minio,
 )
+from .scheduler import transfer_scheduler
 from .schemas import (
     BadRequestErrorSchema,
+    BatchUploadColabResponseSchema,
+    BatchUploadColabSchema,
     ConnectionErrorSchema,
+    DownloadColabResponseSchema,
     DownloadColabSchema,
+    HostUploadResultSchema,
+    JobSchema,
     NotFoundErrorSchema,
-    ResponseSchema,
+    SyncStatsSchema,
+    TooManyRequestsErrorSchema,
+    TransferStatsSchema,
+    UploadColabResponseSchema,
     UploadColabSchema,
+    UploadMinioResponseSchema,
+    WatchColabSchema,
+    WatchSchema,
+)
+from .ssh_pool import SSHLease, ssh_pool
+from .sync_functions import (
+    get_sync_plan_schema,
+    plan_colab_output_sync,
+    sync_colab_output_to_minio,
 )
+from .sync_index import get_sync_index_key
+from .transfer_filters import filter_minio_paths, get_transfer_filter
+from .watches import watch_supervisor
 
 app = FastAPI(
     title="Colab SSH uploader and executor",
@@ -51,107 +94,577 @@ app = FastAPI(
     responses={
         400: {"model": BadRequestErrorSchema},
         404: {"model": NotFoundErrorSchema},
+        429: {"model": TooManyRequestsErrorSchema},
         500: {"model": ConnectionErrorSchema},
     },
 )
+app.add_middleware(RequestContextMiddleware)
 app.add_exception_handler(BotoCoreError, botocore_error_handler)
 app.add_exception_handler(NoSuchBucket, no_such_bucket_error_handler)
 app.add_exception_handler(ClientError, minio_client_error_handler)
 app.add_exception_handler(SSHException, ssh_connection_error_handler)
-app.add_exception_handler(SubprocessError, subprocess_run_error_handler)
 app.add_exception_handler(FileIntegrityError, file_integrity_error_handler)
+app.add_exception_handler(ObjectsDeleteError, objects_delete_error_handler)
+app.add_exception_handler(JobNotFound, job_not_found_error_handler)
+app.add_exception_handler(InvalidFormData, invalid_form_data_error_handler)
+app.add_exception_handler(WatchNotFound, watch_not_found_error_handler)
+app.add_exception_handler(
+    SchedulerQueueFull, scheduler_queue_full_error_handler
+)
 
 main_logger = get_logger(__name__)
 
 
+@app.on_event("startup")
+def create_shared_clients() -> None:
+    """Creates shared minio client before first request."""
+    create_minio_client()
+
+
+@app.on_event("shutdown")
+def stop_jobs_supervisor() -> None:
+    """Stops running colab jobs and watches, closes pooled ssh connections."""
+    job_supervisor.stop()
+    watch_supervisor.stop()
+    ssh_pool.close_all()
+
+
+def _upload_minio_files(
+    files: List[UploadFile],
+    keys_prefix: str,
+    transfer_config: TransferConfig,
+    bucket: str,
+) -> UploadMinioResponseSchema:
+    keys_prefix = keys_prefix.strip("/")
+    set_log_context(prefix=keys_prefix)
+    minio_client = get_minio_client(bucket)
+    clear_minio_prefix(minio_client, bucket, keys_prefix)
+    files_stats = upload_files_to_minio(
+        minio_client,
+        [
+            (file_object.file, f"{keys_prefix}/{file_object.filename}")
+            for file_object in files
+        ],
+        bucket,
+        transfer_config,
+    )
+    response_message = f"Files were uploaded to minio with {keys_prefix}"
+    main_logger.info(
+        response_message,
+        extra={
+            "files": len(files_stats),
+            "bytes": sum(file_stats.size for file_stats in files_stats),
+        },
+    )
+    return UploadMinioResponseSchema.parse_obj(
+        {"message": response_message, "files": files_stats}
+    )
+
+
 @app.put(
     f"{ROUTES_PREFIX}/upload_minio",
-    status_code=status.HTTP_204_NO_CONTENT,
+    status_code=status.HTTP_200_OK,
+    response_model=UploadMinioResponseSchema,
     summary="Upload multiple files to minio storage using multipart/form-data",
     tags=[TAG],
 )
-def upload_minio_files(
+async def upload_minio_files(
     files: List[UploadFile],
     keys_prefix: str = Form(..., example="project_1/script_files"),
+    multipart_threshold: int = Form(None, ge=MINIO_MIN_PART_SIZE),
+    multipart_chunksize: int = Form(None, ge=MINIO_MIN_PART_SIZE),
+    max_concurrency: int = Form(None, ge=1),
     bucket: str = Header(..., example="root"),
-) -> Response:
+) -> UploadMinioResponseSchema:
     """Custom key_prefix will be added to uploaded files names. In order to
     make resource idempotent - will remove all files that have the same prefix
-    from storage before upload.
+    from storage before upload. Files are uploaded concurrently, multipart
+    upload settings may be overridden for request.
     """
     logging.info("STARTING")
+    transfer_config = get_transfer_config(
+        multipart_threshold, multipart_chunksize, max_concurrency
+    )
+    return await transfer_scheduler.run(
+        (),
+        bucket,
+        keys_prefix,
+        _upload_minio_files,
+        files,
+        keys_prefix,
+        transfer_config,
+        bucket,
+    )
+
+
+@app.put(
+    f"{ROUTES_PREFIX}/upload_minio_stream",
+    status_code=status.HTTP_200_OK,
+    response_model=UploadMinioResponseSchema,
+    summary="Stream multipart/form-data files to minio storage",
+    tags=[TAG],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["files"],
+                        "properties": {
+                            "files": {
+                                "type": "array",
+                                "items": {
+                                    "type": "string",
+                                    "format": "binary",
+                                },
+                            }
+                        },
+                    }
+                }
+            },
+        }
+    },
+)
+async def stream_minio_files(
+    request: Request,
+    keys_prefix: str = Query(..., example="project_1/script_files"),
+    part_size: int = Query(MINIO_MULTIPART_CHUNKSIZE, ge=MINIO_MIN_PART_SIZE),
+    bucket: str = Header(..., example="root"),
+) -> UploadMinioResponseSchema:
+    """Works like upload_minio resource, but files are forwarded to minio
+    while request body is received: every part_size bytes of file are sent as
+    part of multipart upload, so files aren't stored in temporary files and
+    memory usage is bounded. All files that have the same keys_prefix are
+    removed from storage before upload.
+    """
     keys_prefix = keys_prefix.strip("/")
+    set_log_context(prefix=keys_prefix)
+    async with transfer_scheduler.slot((), bucket, keys_prefix):
+        minio_client = await run_on_host(MINIO_HOST, get_minio_client, bucket)
+        await run_on_host(
+            MINIO_HOST, clear_minio_prefix, minio_client, bucket, keys_prefix
+        )
+        files_stats = await stream_form_files_to_minio(
+            request.stream(),
+            request.headers.get("content-type", ""),
+            minio_client,
+            bucket,
+            keys_prefix,
+            part_size,
+        )
+    response_message = f"Files were streamed to minio with {keys_prefix}"
+    main_logger.info(
+        response_message,
+        extra={
+            "files": len(files_stats),
+            "bytes": sum(file_stats.size for file_stats in files_stats),
+        },
+    )
+    return UploadMinioResponseSchema.parse_obj(
+        {"message": response_message, "files": files_stats}
+    )
+
+
+def _upload_files_to_colab(
+    upload_info: UploadColabSchema, bucket: str
+) -> UploadColabResponseSchema:
     minio_client = get_minio_client(bucket)
-    clear_minio_prefix(minio_client, bucket, keys_prefix)
-    for file_object in files:
-        file_key = f"{keys_prefix}/{file_object.filename}"
-        upload_file_to_minio(minio_client, file_object.file, file_key, bucket)
-    main_logger.info(f"Files were uploaded to colab with {keys_prefix}")
-    return Response(status_code=status.HTTP_204_NO_CONTENT)
+    keys_prefix = upload_info.keys_prefix.strip("/") + "/"
+    set_log_context(prefix=keys_prefix, host=upload_info.host)
+    transfer_filter = get_transfer_filter(upload_info)
+    files = [
+        file_obj
+        for file_obj in filter_minio_paths(
+            list_minio_prefix_files(minio_client, bucket, keys_prefix),
+            keys_prefix,
+            transfer_filter,
+        )
+        if not file_obj["Key"].startswith(f"{keys_prefix}logs/")
+        and file_obj["Key"] != get_sync_index_key(f"{keys_prefix}output/")
+    ]
+    if upload_info.dry_run:
+        if upload_info.incremental or upload_info.delete_stale:
+            upload_plan = run_colab_transfer(
+                upload_info,
+                1,
+                lambda lease: plan_colab_upload(
+                    lease.ssh_client, files, upload_info
+                ),
+            )
+        else:
+            upload_plan = plan_colab_upload(None, files, upload_info)
+        transfer_plan = get_upload_plan_schema(
+            upload_plan, upload_info.delete_stale
+        )
+        return UploadColabResponseSchema(
+            message=f"Planned upload of {transfer_plan.files_count} files "
+            f"({transfer_plan.total_bytes} bytes) from {keys_prefix} on colab",
+            stats=None,
+            plan=transfer_plan,
+            job_id=None,
+        )
+    response_message = f"Successfully upload files from {keys_prefix} on colab"
+
+    def transfer(lease: SSHLease) -> TransferStatsSchema:
+        transfer_info = upload_info
+        if upload_info.transfer_mode in CHANNEL_TRANSFER_MODES:
+            transfer_info = upload_info.copy(
+                update={"max_workers": lease.channels}
+            )
+        return transfer_files_to_colab(
+            lease.ssh_client, minio_client, bucket, files, transfer_info
+        )
+
+    stats = run_colab_transfer(
+        upload_info, get_transfer_channels(upload_info), transfer
+    )
+    main_logger.info(
+        f"Files from {keys_prefix} were uploaded to colab",
+        extra={"files": stats.files_count, "bytes": stats.bytes_sent},
+    )
+    job_id = None
+    if upload_info.script_name:
+        script_name = upload_info.script_name
+        job = job_supervisor.start_job(
+            upload_info, script_name, minio_client, bucket, keys_prefix
+        )
+        job_id = job.job_id
+        main_logger.info("Successfully start execution of script")
+        response_message = (
+            f"{response_message} and start executing of {script_name}"
+        )
+    return UploadColabResponseSchema.parse_obj(
+        {"message": response_message, "stats": stats, "job_id": job_id}
+    )
 
 
 @app.post(
     f"{ROUTES_PREFIX}/upload_colab",
     status_code=status.HTTP_200_OK,
-    response_model=ResponseSchema,
+    response_model=UploadColabResponseSchema,
     summary="Upload files with specified prefix from minio storage to colab.",
     tags=[TAG],
 )
-def upload_files_to_colab(
+async def upload_files_to_colab(
     upload_info: UploadColabSchema,
     bucket: str = Header(..., example="root"),
-) -> ResponseSchema:
+) -> UploadColabResponseSchema:
     """All uploaded files will be stored at "/content/uploaded/" directory.
     If script_name with python script provided - executes script. In order to
     use download resource make sure to save script results at
-    "/content/uploaded/output/" directory.
+    "/content/uploaded/output/" directory. Returned job_id may be used to poll
+    state of script execution. Use "bundle" transfer_mode to send
+    many small files as single compressed tar stream. Use incremental mode to
+    send only files that were changed since previous upload. Use include,
+    exclude, max_size and newer_than to select uploaded files, dry_run returns
+    planned files without upload.
     """
+    return await transfer_scheduler.run(
+        (get_host_key(upload_info.host, upload_info.port),),
+        bucket,
+        upload_info.keys_prefix,
+        _upload_files_to_colab,
+        upload_info,
+        bucket,
+    )
+
+
+def _upload_files_to_colab_hosts(
+    upload_info: BatchUploadColabSchema, bucket: str
+) -> BatchUploadColabResponseSchema:
     minio_client = get_minio_client(bucket)
     keys_prefix = upload_info.keys_prefix.strip("/") + "/"
-    files = list_minio_prefix_files(minio_client, bucket, keys_prefix)
-    response_message = f"Successfully upload files from {keys_prefix} on colab"
-    with connect_ssh_colab(upload_info) as ssh_client:
-        for file_obj in files:
-            file_key = file_obj["Key"]
-            file_name = Path(file_key).name
-            file_object, file_size = get_minio_object(
-                minio_client, bucket, file_key
+    set_log_context(prefix=keys_prefix)
+    files = deduplicate_file_names(
+        file_obj
+        for file_obj in list_minio_prefix_files(
+            minio_client, bucket, keys_prefix
+        )
+        if not file_obj["Key"].startswith(f"{keys_prefix}logs/")
+        and file_obj["Key"] != get_sync_index_key(f"{keys_prefix}output/")
+    )
+    bytes_read, targets = fan_out_minio_files_to_colab(
+        minio_client, bucket, files, upload_info.hosts
+    )
+    hosts_results = []
+    for target in targets:
+        credentials = target.credentials
+        job_id = None
+        if upload_info.script_name and target.error is None:
+            try:
+                job = job_supervisor.start_job(
+                    credentials,
+                    upload_info.script_name,
+                    minio_client,
+                    bucket,
+                    keys_prefix,
+                )
+                job_id = job.job_id
+            except (SSHException, OSError, EOFError) as error:
+                target.error = f"Script execution failed: {error}"
+        hosts_results.append(
+            HostUploadResultSchema(
+                host=credentials.host,
+                port=credentials.port,
+                stats=target.stats,
+                job_id=job_id,
+                error=target.error,
             )
-            upload_file_to_colab(ssh_client, file_object, file_size, file_name)
-        main_logger.info(f"Files from {keys_prefix} were uploaded to colab")
-        if upload_info.script_name:
-            script_name = upload_info.script_name
-            execute_script(ssh_client, script_name)
-            main_logger.info("Successfully start execution of script")
-            response_message = (
-                f"{response_message} and start executing of {script_name}"
+        )
+    failed_hosts = sum(result.error is not None for result in hosts_results)
+    main_logger.info(
+        f"Files from {keys_prefix} were uploaded to "
+        f"{len(hosts_results) - failed_hosts} of {len(hosts_results)} "
+        f"colab hosts",
+        extra={"files": len(files), "bytes": bytes_read},
+    )
+    response_message = (
+        f"Successfully upload files from {keys_prefix} on "
+        f"{len(hosts_results) - failed_hosts} of {len(hosts_results)} "
+        f"colab hosts"
+    )
+    return BatchUploadColabResponseSchema(
+        message=response_message, bytes_read=bytes_read, hosts=hosts_results
+    )
+
+
+@app.post(
+    f"{ROUTES_PREFIX}/upload_colab/batch",
+    status_code=status.HTTP_200_OK,
+    response_model=BatchUploadColabResponseSchema,
+    summary="Upload files with specified prefix from minio to many colabs.",
+    tags=[TAG],
+)
+async def upload_files_to_colab_hosts(
+    upload_info: BatchUploadColabSchema,
+    bucket: str = Header(..., example="root"),
+) -> BatchUploadColabResponseSchema:
+    """Every minio object is read once and streamed to all hosts
+    concurrently, files are stored at "/content/uploaded/" directory of every
+    host. Failed hosts don't stop uploads to other hosts - results and errors
+    are returned for every host. If script_name provided - starts script on
+    every host where upload succeeded and returns its job_id. Transfer rate to
+    every host is limited by COLAB_HOST_RATE_LIMIT.
+    """
+    return await transfer_scheduler.run(
+        tuple(
+            sorted(
+                {
+                    get_host_key(credentials.host, credentials.port)
+                    for credentials in upload_info.hosts
+                }
             )
-    return ResponseSchema.parse_obj({"message": response_message})
+        ),
+        bucket,
+        upload_info.keys_prefix,
+        _upload_files_to_colab_hosts,
+        upload_info,
+        bucket,
+    )
+
+
+@app.get(
+    f"{ROUTES_PREFIX}/jobs/{{job_id}}",
+    status_code=status.HTTP_200_OK,
+    response_model=JobSchema,
+    summary="Get state of script execution started on colab",
+    tags=[TAG],
+)
+async def get_colab_job(job_id: str) -> JobSchema:
+    """Job id is returned by upload_colab resource if script_name provided.
+    Returns job state, exit status of script, start and end times and its
+    resource usage on colab after script finishes.
+    """
+    return job_supervisor.get_job(job_id).to_schema()
+
+
+@app.get(
+    f"{ROUTES_PREFIX}/jobs/{{job_id}}/logs",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+    summary="Stream output of script executed on colab as server-sent events",
+    tags=[TAG],
+)
+async def stream_colab_job_logs(
+    job_id: str,
+    from_sequence: int = Query(0, ge=0),
+    last_event_id: int = Header(None, ge=0),
+) -> StreamingResponse:
+    """Sends "stdout" and "stderr" events with script output while script is
+    running and final "end" event with job state. Events ids are sequence
+    numbers of output chunks, reconnected clients may resume stream with
+    Last-Event-ID header or from_sequence parameter. Only latest output is
+    buffered - "gap" event shows number of chunks that were skipped. Full
+    output is stored in minio at logs_prefix of job.
+    """
+    job = job_supervisor.get_job(job_id)
+    sequence = from_sequence
+    if last_event_id is not None:
+        sequence = last_event_id + 1
+    return StreamingResponse(
+        iter_job_events(
+            job, sequence, JOB_LOGS_KEEPALIVE, JOB_LOGS_POLL_INTERVAL
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sync_files_from_colab(
+    download_info: DownloadColabSchema, bucket: str, full_reconcile: bool
+) -> DownloadColabResponseSchema:
+    set_log_context(prefix=download_info.keys_prefix, host=download_info.host)
+    minio_client = get_minio_client(bucket)
+    transfer_filter = get_transfer_filter(download_info)
+    if download_info.dry_run:
+        output_prefix = f"{download_info.keys_prefix.strip('/')}/output/"
+        sync_plan = run_colab_transfer(
+            download_info,
+            1,
+            lambda lease: plan_colab_output_sync(
+                lease.ssh_client,
+                minio_client,
+                bucket,
+                output_prefix,
+                transfer_filter,
+                full_reconcile,
+            ),
+        )
+        transfer_plan = get_sync_plan_schema(sync_plan, output_prefix)
+        return DownloadColabResponseSchema(
+            message=f"Planned download of {transfer_plan.files_count} colab "
+            f"files ({transfer_plan.total_bytes} bytes) to bucket {bucket}",
+            stats=None,
+            plan=transfer_plan,
+        )
+
+    def transfer(lease: SSHLease) -> SyncStatsSchema:
+        max_workers = download_info.max_workers
+        if download_info.transfer_mode in SYNC_CHANNEL_TRANSFER_MODES:
+            max_workers = lease.channels
+        return sync_colab_output_to_minio(
+            lease.ssh_client,
+            minio_client,
+            bucket,
+            download_info.keys_prefix,
+            max_workers,
+            download_info.transfer_mode,
+            transfer_filter,
+            full_reconcile,
+        )
+
+    stats = run_colab_transfer(
+        download_info, get_transfer_channels(download_info), transfer
+    )
+    record_transfer(
+        "colab_to_minio",
+        bucket,
+        get_host_key(download_info.host, download_info.port),
+        stats.bytes_uploaded,
+    )
+    response_message = f"Successfully download colab files to bucket {bucket}"
+    main_logger.info(
+        response_message,
+        extra={"files": stats.files_uploaded, "bytes": stats.bytes_uploaded},
+    )
+    return DownloadColabResponseSchema.parse_obj(
+        {"message": response_message, "stats": stats}
+    )
 
 
 @app.post(
     f"{ROUTES_PREFIX}/download_colab",
     status_code=status.HTTP_200_OK,
-    response_model=ResponseSchema,
+    response_model=DownloadColabResponseSchema,
     summary="Load script results from colab to minio storage",
     tags=[TAG],
 )
-def sync_files_from_colab(
+async def sync_files_from_colab(
     download_info: DownloadColabSchema,
+    full_reconcile: bool = Query(False),
     bucket: str = Header(..., example="root"),
-) -> ResponseSchema:
+) -> DownloadColabResponseSchema:
     """Output files should be stored at "/content/uploaded/output/" directory.
     This resource may be used to sync files on colab and files in minio storage
     with provided keys_prefix. This means that if new file was created on colab
     directory - it will be uploaded to minio, if file was deleted in colab - it
     will be removed in minio. If file didn't change - it won't be modified in
-    minio.
+    minio. Use include, exclude, max_size and newer_than to select synchronized
+    files, dry_run returns planned files without upload. Colab files are
+    compared with sync index stored at "<keys_prefix>/output.index.json.gz",
+    use full_reconcile to compare it with all objects of output prefix.
     """
-    home_directory = Path.home()
-    get_aws_credentials(home_directory)
-    with TemporaryDirectory(dir=home_directory) as temp_directory:
-        local_mount_colab_directory(temp_directory, download_info)
-        sync_files_with_minio(temp_directory, bucket, download_info)
-    response_message = f"Successfully download colab files to bucket {bucket}"
-    main_logger.info(response_message)
-    return ResponseSchema.parse_obj({"message": response_message})
+    return await transfer_scheduler.run(
+        (get_host_key(download_info.host, download_info.port),),
+        bucket,
+        download_info.keys_prefix,
+        _sync_files_from_colab,
+        download_info,
+        bucket,
+        full_reconcile,
+    )
+
+
+def _start_watch(watch_info: WatchColabSchema, bucket: str) -> WatchSchema:
+    set_log_context(prefix=watch_info.keys_prefix, host=watch_info.host)
+    minio_client = get_minio_client(bucket)
+    watch = watch_supervisor.start_watch(watch_info, minio_client, bucket)
+    return watch.to_schema()
+
+
+@app.post(
+    f"{ROUTES_PREFIX}/watches",
+    status_code=status.HTTP_200_OK,
+    response_model=WatchSchema,
+    summary="Start continuous sync of colab results to minio storage",
+    tags=[TAG],
+)
+async def start_colab_watch(
+    watch_info: WatchColabSchema,
+    bucket: str = Header(..., example="root"),
+) -> WatchSchema:
+    """Watch session synchronizes "/content/uploaded/output/" directory like
+    download_colab resource once and then uploads files to minio as soon as
+    they are created or modified and weren't changed for debounce_seconds,
+    and deletes objects of removed files. Colab directory is scanned on colab
+    side, so only changed files are transferred. Session stops when it's
+    deleted or when job with provided job_id finishes - changes made before
+    are uploaded.
+    """
+    return await run_on_host(MINIO_HOST, _start_watch, watch_info, bucket)
+
+
+@app.get(
+    f"{ROUTES_PREFIX}/watches/{{watch_id}}",
+    status_code=status.HTTP_200_OK,
+    response_model=WatchSchema,
+    summary="Get state of watch session",
+    tags=[TAG],
+)
+async def get_colab_watch(watch_id: str) -> WatchSchema:
+    """Returns watch state, number of uploaded and deleted files and error
+    message if watch failed.
+    """
+    return watch_supervisor.get_watch(watch_id).to_schema()
+
+
+@app.delete(
+    f"{ROUTES_PREFIX}/watches/{{watch_id}}",
+    status_code=status.HTTP_200_OK,
+    response_model=WatchSchema,
+    summary="Stop watch session",
+    tags=[TAG],
+)
+async def stop_colab_watch(watch_id: str) -> WatchSchema:
+    """Watch uploads pending changes and stops, poll its state until it is
+    "finished".
+    """
+    return watch_supervisor.stop_watch(watch_id).to_schema()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    """Returns transfer metrics in prometheus text exposition format."""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,333 @@
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from threading import Lock
+from typing import Any, Callable, Dict, Iterator, List, Tuple, TypeVar, cast
+
+from .constants import METRICS_LATENCY_BUCKETS
+
+try:
+    from opentelemetry.trace import get_tracer
+
+    tracer = get_tracer(__name__)
+except ImportError:
+    tracer = None
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+MINIO_BACKEND = "minio"
+COLAB_BACKEND = "colab"
+
+Labels = Tuple[str, ...]
+TransferObserver = Callable[[str, str, int], None]
+
+
+def format_labels(names: Labels, values: Labels) -> str:
+    """Returns labels in prometheus text exposition format.
+
+    :param names: names of labels.
+    :param values: values of labels in the same order.
+    :return: string like '{name="value"}' or empty string without labels.
+    """
+    if not names:
+        return ""
+    escaped_values = [
+        value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for value in values
+    ]
+    labels = ",".join(
+        f'{name}="{value}"' for name, value in zip(names, escaped_values)
+    )
+    return f"{{{labels}}}"
+
+
+class Metric:
+    """Thread-safe metric with values for every combination of labels."""
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, description: str, label_names: Labels):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self._values: Dict[Labels, Any] = {}
+        self._lock = Lock()
+
+    def render(self) -> List[str]:
+        """Returns lines of metric in prometheus text exposition format.
+
+        :return: lines with help, type and samples of metric.
+        """
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.extend(self._render_sample(labels, value))
+        return lines
+
+    def _render_sample(self, labels: Labels, value: Any) -> List[str]:
+        return [
+            f"{self.name}{format_labels(self.label_names, labels)} {value}"
+        ]
+
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def inc(self, labels: Labels, amount: float = 1) -> None:
+        """Increases counter of labels by amount.
+
+        :param labels: values of label_names.
+        :param amount: non-negative increment.
+        :return: None.
+        """
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    metric_type = "gauge"
+
+    def inc(self, labels: Labels, amount: float = 1) -> None:
+        """Changes gauge of labels by amount.
+
+        :param labels: values of label_names.
+        :param amount: increment, negative to decrease gauge.
+        :return: None.
+        """
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels: Labels, amount: float = 1) -> None:
+        """Decreases gauge of labels by amount.
+
+        :param labels: values of label_names.
+        :param amount: decrement.
+        :return: None.
+        """
+        self.inc(labels, -amount)
+
+
+class Histogram(Metric):
+    """Histogram with cumulative buckets, sum and count of observations."""
+
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names: Labels,
+        buckets: Tuple[float, ...],
+    ):
+        super().__init__(name, description, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, labels: Labels, value: float) -> None:
+        """Adds observed value into histogram of labels.
+
+        :param labels: values of label_names.
+        :param value: observed value.
+        :return: None.
+        """
+        with self._lock:
+            counts, total = self._values.get(
+                labels, ([0] * (len(self.buckets) + 1), 0.0)
+            )
+            for index, bucket in enumerate(self.buckets):
+                if value <= bucket:
+                    counts[index] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._values[labels] = (counts, total + value)
+
+    def _render_sample(
+        self, labels: Labels, value: Tuple[List[int], float]
+    ) -> List[str]:
+        counts, total = value
+        bucket_names = self.label_names + ("le",)
+        lines = []
+        cumulative_count = 0
+        bounds = [str(bucket) for bucket in self.buckets] + ["+Inf"]
+        for bound, count in zip(bounds, counts):
+            cumulative_count += count
+            bucket_labels = format_labels(bucket_names, labels + (bound,))
+            lines.append(
+                f"{self.name}_bucket{bucket_labels} {cumulative_count}"
+            )
+        sample_labels = format_labels(self.label_names, labels)
+        lines.append(f"{self.name}_sum{sample_labels} {total}")
+        lines.append(f"{self.name}_count{sample_labels} {cumulative_count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered by /metrics endpoint."""
+
+    def __init__(self) -> None:
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Any:
+        """Adds metric to registry.
+
+        :param metric: metric to render.
+        :return: registered metric.
+        """
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Returns all metrics in prometheus text exposition format.
+
+        :return: text of metrics.
+        """
+        lines = [line for metric in self._metrics for line in metric.render()]
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+stage_seconds: Histogram = registry.register(
+    Histogram(
+        "colab_sync_stage_duration_seconds",
+        "Duration of transfer stages.",
+        ("stage", "backend"),
+        METRICS_LATENCY_BUCKETS,
+    )
+)
+stage_errors: Counter = registry.register(
+    Counter(
+        "colab_sync_stage_errors_total",
+        "Number of failed transfer stages.",
+        ("stage", "backend"),
+    )
+)
+stages_in_flight: Gauge = registry.register(
+    Gauge(
+        "colab_sync_stages_in_flight",
+        "Number of transfer stages that are running now.",
+        ("stage", "backend"),
+    )
+)
+transferred_bytes: Counter = registry.register(
+    Counter(
+        "colab_sync_transferred_bytes_total",
+        "Number of transferred bytes.",
+        ("direction", "bucket", "host"),
+    )
+)
+queued_transfers: Gauge = registry.register(
+    Gauge(
+        "colab_sync_queued_transfers",
+        "Number of transfers waiting for admission of scheduler.",
+        ("bucket",),
+    )
+)
+running_transfers: Gauge = registry.register(
+    Gauge(
+        "colab_sync_running_transfers",
+        "Number of transfers admitted by scheduler that are running now.",
+        ("bucket",),
+    )
+)
+queue_wait_seconds: Histogram = registry.register(
+    Histogram(
+        "colab_sync_queue_wait_seconds",
+        "Time that transfers waited for admission of scheduler.",
+        ("bucket",),
+        METRICS_LATENCY_BUCKETS,
+    )
+)
+rejected_transfers: Counter = registry.register(
+    Counter(
+        "colab_sync_rejected_transfers_total",
+        "Number of transfers rejected because scheduler queue was full.",
+        ("bucket",),
+    )
+)
+# Called by record_transfer with bucket, host and number of bytes.
+transfer_observers: List[TransferObserver] = []
+
+
+@contextmanager
+def measure_stage(stage: str, backend: str, name: str) -> Iterator[None]:
+    """Measures duration of transfer stage and traces it if possible.
+
+    Stage is counted in stages_in_flight while it runs, its duration is
+    observed in stage_seconds and failures are counted in stage_errors. If
+    opentelemetry is installed - stage runs inside span with name.
+    :param stage: stage name, e.g. "connect", "list", "get" or "put".
+    :param backend: MINIO_BACKEND or COLAB_BACKEND.
+    :param name: name of span.
+    :return: iterator that yields once.
+    """
+    labels = (stage, backend)
+    stages_in_flight.inc(labels)
+    start_time = time.perf_counter()
+    try:
+        with trace_span(name, {"stage": stage, "backend": backend}):
+            yield
+    except BaseException:
+        stage_errors.inc(labels)
+        raise
+    finally:
+        stages_in_flight.dec(labels)
+        stage_seconds.observe(labels, time.perf_counter() - start_time)
+
+
+def trace_span(name: str, attributes: Dict[str, str]) -> Any:
+    """Returns context manager of opentelemetry span.
+
+    :param name: name of span.
+    :param attributes: attributes of span.
+    :return: started span or null context if opentelemetry isn't installed.
+    """
+    if tracer is None:
+        return nullcontext()
+    return tracer.start_as_current_span(name, attributes=attributes)
+
+
+def instrumented(stage: str = None, backend: str = None) -> Callable[[F], F]:
+    """Returns decorator that traces function and measures its stage.
+
+    Functions without stage are only traced with opentelemetry span.
+    :param stage: stage name of measure_stage.
+    :param backend: MINIO_BACKEND or COLAB_BACKEND.
+    :return: decorator.
+    """
+
+    def decorator(func: F) -> F:
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if stage is None:
+                with trace_span(func.__qualname__, {}):
+                    return func(*args, **kwargs)
+            with measure_stage(stage, backend, func.__qualname__):
+                return func(*args, **kwargs)
+
+        return cast(F, wrapper)
+
+    return decorator
+
+
+def record_transfer(
+    direction: str, bucket: str, host: str, bytes_count: int
+) -> None:
+    """Adds transferred bytes to transferred_bytes counter.
+
+    Bytes are also passed to transfer_observers, e.g. to charge bandwidth of
+    scheduler.
+
+    :param direction: e.g. "minio_to_colab" or "colab_to_minio".
+    :param bucket: minio bucket.
+    :param host: colab host key from get_host_key, empty for uploads from
+    clients.
+    :param bytes_count: number of transferred bytes.
+    :return: None.
+    """
+    transferred_bytes.inc((direction, bucket, host), bytes_count)
+    for observer in transfer_observers:
+        observer(bucket, host, bytes_count)
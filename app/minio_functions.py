@@ -1,45 +1,225 @@
-from typing import IO, Any, Dict, List, Tuple
+import base64
+import hashlib
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache, partial
+from itertools import chain, islice
+from threading import Lock
+from typing import (
+    IO,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import boto3
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig, create_transfer_manager
+from botocore.config import Config
 from botocore.exceptions import BotoCoreError, ClientError
 from botocore.response import StreamingBody
+from paramiko.file import BufferedFile
+from s3transfer.subscribers import BaseSubscriber
 
+from .concurrency import KeyLocks
 from .constants import (
     AWS_ACCESS_KEY_ID,
     AWS_SECRET_ACCESS_KEY,
+    MINIO_BUCKET_CACHE_SIZE,
+    MINIO_BUCKET_CACHE_TTL,
+    MINIO_CONNECT_TIMEOUT,
+    MINIO_DELETE_BATCH_SIZE,
+    MINIO_DELETE_WORKERS,
+    MINIO_MAX_ATTEMPTS,
+    MINIO_MAX_CONCURRENCY,
+    MINIO_MAX_POOL_CONNECTIONS,
+    MINIO_MULTIPART_CHUNKSIZE,
+    MINIO_MULTIPART_THRESHOLD,
+    MINIO_PRESIGNED_URL_EXPIRATION,
+    MINIO_READ_TIMEOUT,
+    MINIO_UPLOAD_MAX_AGE,
     S3_ENDPOINT_URL,
+    S3_PUBLIC_ENDPOINT_URL,
+)
+from .errors import FileIntegrityError, NoSuchBucket, ObjectsDeleteError
+from .logger import SAMPLED, get_logger
+from .metrics import (
+    MINIO_BACKEND,
+    instrumented,
+    measure_stage,
+    record_transfer,
 )
-from .errors import NoSuchBucket
-from .logger import get_logger
+from .schemas import UploadedFileStatsSchema
 
 minio_logger = get_logger(__name__)
 
 
-def get_minio_client(bucket_name: str) -> boto3.client:
-    """Connects to minio storage, checks that bucket exists and returns client.
+class BucketCache:
+    """Thread-safe LRU cache of buckets that are known to exist.
 
-    :param bucket_name: bucket to check existence.
+    Each bucket is cached for ttl seconds, the least recently used buckets
+    are evicted when cache contains more than max_size buckets.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._buckets: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = Lock()
+
+    def __contains__(self, bucket: object) -> bool:
+        if not isinstance(bucket, str):
+            return False
+        with self._lock:
+            expires_at = self._buckets.get(bucket)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._buckets[bucket]
+                return False
+            self._buckets.move_to_end(bucket)
+            return True
+
+    def add(self, bucket: str) -> None:
+        with self._lock:
+            self._buckets[bucket] = time.monotonic() + self.ttl
+            self._buckets.move_to_end(bucket)
+            while len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+
+    def invalidate(self, bucket: str) -> None:
+        with self._lock:
+            self._buckets.pop(bucket, None)
+
+
+bucket_cache = BucketCache(MINIO_BUCKET_CACHE_TTL, MINIO_BUCKET_CACHE_SIZE)
+
+
+@lru_cache(maxsize=None)
+def create_minio_client() -> boto3.client:
+    """Creates process-wide boto3 client connected to minio storage.
+
+    boto3 clients are thread-safe, so single client with tuned connection
+    pool, retries and timeouts is shared between all requests.
     :return: boto3 client.
     """
-    minio_client = boto3.client(
+    client_config = Config(
+        max_pool_connections=MINIO_MAX_POOL_CONNECTIONS,
+        connect_timeout=MINIO_CONNECT_TIMEOUT,
+        read_timeout=MINIO_READ_TIMEOUT,
+        retries={"max_attempts": MINIO_MAX_ATTEMPTS, "mode": "standard"},
+    )
+    return boto3.client(
         "s3",
         endpoint_url=S3_ENDPOINT_URL,
         aws_access_key_id=AWS_ACCESS_KEY_ID,
         aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+        config=client_config,
+    )
+
+
+@lru_cache(maxsize=None)
+def create_presign_client() -> boto3.client:
+    """Creates boto3 client that signs urls for public minio endpoint.
+
+    Presigned urls are used by colab, so they are signed for
+    S3_PUBLIC_ENDPOINT_URL that may differ from endpoint used by application.
+    :return: boto3 client.
+    """
+    return boto3.client(
+        "s3",
+        endpoint_url=S3_PUBLIC_ENDPOINT_URL,
+        aws_access_key_id=AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+        config=Config(signature_version="s3v4"),
+    )
+
+
+def get_presigned_url(client_method: str, **params: Any) -> str:
+    """Returns url that allows colab to call minio method without credentials.
+
+    :param client_method: name of boto3 client method, e.g. "get_object".
+    :param params: parameters of method.
+    :return: presigned url valid for MINIO_PRESIGNED_URL_EXPIRATION seconds.
+    """
+    presigned_url: str = create_presign_client().generate_presigned_url(
+        ClientMethod=client_method,
+        Params=params,
+        ExpiresIn=MINIO_PRESIGNED_URL_EXPIRATION,
     )
+    return presigned_url
+
+
+def get_minio_client(bucket_name: str) -> boto3.client:
+    """Returns shared minio client after check that bucket exists.
+
+    Bucket existence is checked with head_bucket request only if bucket
+    isn't in bucket_cache.
+    :param bucket_name: bucket to check existence.
+    :return: boto3 client.
+    """
+    minio_client = create_minio_client()
+    if bucket_name in bucket_cache:
+        return minio_client
     try:
-        minio_client.head_bucket(Bucket=bucket_name)
+        with measure_stage("connect", MINIO_BACKEND, "head_bucket"):
+            minio_client.head_bucket(Bucket=bucket_name)
     except ClientError as error:
         minio_logger.warning(f"Minio connection error: {error}")
         if "404" in error.args[0]:
             raise NoSuchBucket(f"Bucket {bucket_name} doesn't exist")
         raise
+    bucket_cache.add(bucket_name)
     return minio_client
 
 
+def check_missing_bucket(error: Exception, bucket: str) -> None:
+    """Invalidates cached bucket if error was caused by missing bucket.
+
+    If bucket doesn't exist - raises NoSuchBucket exception.
+    :param error: exception raised by boto3 client.
+    :param bucket: bucket used in failed request.
+    :return: None.
+    """
+    if isinstance(error, ClientError):
+        missing_bucket = error.response["Error"].get("Code") == "NoSuchBucket"
+    else:
+        missing_bucket = "NoSuchBucket" in str(error)
+    if missing_bucket:
+        bucket_cache.invalidate(bucket)
+        raise NoSuchBucket(f"Bucket {bucket} doesn't exist") from error
+
+
+def get_transfer_config(
+    multipart_threshold: Optional[int] = None,
+    multipart_chunksize: Optional[int] = None,
+    max_concurrency: Optional[int] = None,
+) -> TransferConfig:
+    """Returns boto3 transfer config with settings overridden by arguments.
+
+    :param multipart_threshold: size in bytes to start multipart upload from.
+    :param multipart_chunksize: size in bytes of multipart upload parts.
+    :param max_concurrency: maximum number of concurrent part uploads.
+    :return: boto3 TransferConfig.
+    """
+    return TransferConfig(
+        multipart_threshold=multipart_threshold or MINIO_MULTIPART_THRESHOLD,
+        multipart_chunksize=multipart_chunksize or MINIO_MULTIPART_CHUNKSIZE,
+        max_concurrency=max_concurrency or MINIO_MAX_CONCURRENCY,
+    )
+
+
+@instrumented("put", MINIO_BACKEND)
 def upload_file_to_minio(
     minio_client: boto3.client,
-    file_obj: IO[Any],
+    file_obj: Union[IO[Any], "BufferedFile[bytes]"],
     object_key: str,
     bucket: str,
 ) -> None:
@@ -53,56 +233,476 @@ def upload_file_to_minio(
     """
     try:
         minio_client.upload_fileobj(
-            Fileobj=file_obj, Bucket=bucket, Key=object_key
+            Fileobj=file_obj,
+            Bucket=bucket,
+            Key=object_key,
+            Config=get_transfer_config(),
         )
-    except (ClientError, BotoCoreError) as error:
+    except (ClientError, BotoCoreError, S3UploadFailedError) as error:
         minio_logger.warning(f"Minio file upload error: {error}")
+        check_missing_bucket(error, bucket)
         raise
-    minio_logger.info(f"Successfully uploaded files to bucket {bucket}")
+    minio_logger.info(
+        f"Successfully uploaded files to bucket {bucket}", extra=SAMPLED
+    )
+
+
+def get_content_md5(data: bytes) -> str:
+    """Returns value of Content-MD5 header that makes minio verify content.
+
+    :param data: content of object or part.
+    :return: base64 encoded md5 digest.
+    """
+    return base64.b64encode(hashlib.md5(data).digest()).decode()
+
+
+@instrumented("put", MINIO_BACKEND)
+def put_minio_object(
+    minio_client: boto3.client,
+    data: bytes,
+    object_key: str,
+    bucket: str,
+    verify: bool = False,
+) -> None:
+    """Puts bytes into minio's bucket with specified key in single request.
+
+    :param minio_client: boto3 client connected to minio storage.
+    :param data: object content.
+    :param object_key: storage key of object.
+    :param bucket: bucket to put object into.
+    :param verify: send Content-MD5 so minio rejects corrupted content.
+    :return: None.
+    """
+    put_kwargs = {"Body": data, "Bucket": bucket, "Key": object_key}
+    if verify:
+        put_kwargs["ContentMD5"] = get_content_md5(data)
+    try:
+        minio_client.put_object(**put_kwargs)
+    except (ClientError, BotoCoreError) as error:
+        minio_logger.warning(f"Minio put object error: {error}")
+        check_missing_bucket(error, bucket)
+        raise
+
+
+multipart_upload_locks = KeyLocks()
+
+
+def is_upload_stale(upload: Dict[str, Any]) -> bool:
+    """Checks if unfinished multipart upload is older than max age.
+
+    :param upload: upload properties from list_multipart_uploads.
+    :return: True if upload was initiated MINIO_UPLOAD_MAX_AGE seconds ago.
+    """
+    max_age = timedelta(seconds=MINIO_UPLOAD_MAX_AGE)
+    return bool(datetime.now(timezone.utc) - upload["Initiated"] > max_age)
+
+
+class MinioMultipartUpload:
+    """Upload of object which content is received part by part.
+
+    Multipart upload is created with first uploaded part, so objects that
+    consist of single part are put with one request on complete. Parts may
+    be uploaded concurrently from different threads. Uploads that are
+    resumed should be written only while key is held in
+    multipart_upload_locks, so concurrent writers of the same object don't
+    adopt and complete upload of each other.
+    """
+
+    def __init__(
+        self, minio_client: boto3.client, bucket: str, object_key: str
+    ):
+        self.minio_client = minio_client
+        self.bucket = bucket
+        self.object_key = object_key
+        self.upload_id: str = None
+        self._parts: Dict[int, str] = {}
+        self._lock = Lock()
+
+    @instrumented("put", MINIO_BACKEND)
+    def upload_part(
+        self, part_number: int, data: bytes, verify: bool = False
+    ) -> None:
+        """Uploads part of object, creates multipart upload if needed.
+
+        :param part_number: number of part starting from 1.
+        :param data: part content, all parts except last should be at least
+        MINIO_MIN_PART_SIZE bytes.
+        :param verify: send Content-MD5 so minio rejects corrupted part.
+        :return: None.
+        """
+        self.create()
+        part_kwargs = {
+            "Body": data,
+            "Bucket": self.bucket,
+            "Key": self.object_key,
+            "PartNumber": part_number,
+            "UploadId": self.upload_id,
+        }
+        if verify:
+            part_kwargs["ContentMD5"] = get_content_md5(data)
+        try:
+            response = self.minio_client.upload_part(**part_kwargs)
+        except (ClientError, BotoCoreError) as error:
+            minio_logger.warning(f"Minio upload part error: {error}")
+            check_missing_bucket(error, self.bucket)
+            raise
+        self.add_part(part_number, response["ETag"])
+
+    def create(self) -> str:
+        """Creates multipart upload if it wasn't created yet.
+
+        :return: id of multipart upload.
+        """
+        with self._lock:
+            if self.upload_id is not None:
+                return self.upload_id
+            try:
+                response = self.minio_client.create_multipart_upload(
+                    Bucket=self.bucket, Key=self.object_key
+                )
+            except (ClientError, BotoCoreError) as error:
+                minio_logger.warning(f"Minio create upload error: {error}")
+                check_missing_bucket(error, self.bucket)
+                raise
+            self.upload_id = response["UploadId"]
+            return self.upload_id
+
+    @instrumented()
+    def resume(self) -> Dict[int, str]:
+        """Continues latest unfinished multipart upload of the same object.
+
+        Returned parts aren't registered - caller should add parts that
+        match content with add_part and upload other ones again. Uploads
+        older than MINIO_UPLOAD_MAX_AGE aren't resumed, they are aborted by
+        abort_stale_multipart_uploads.
+        :return: dict with numbers and ETags of parts uploaded before, empty
+        if there is no unfinished upload.
+        """
+        try:
+            response = self.minio_client.list_multipart_uploads(
+                Bucket=self.bucket, Prefix=self.object_key
+            )
+            uploads = [
+                upload
+                for upload in response.get("Uploads", [])
+                if upload["Key"] == self.object_key
+                and not is_upload_stale(upload)
+            ]
+            if not uploads:
+                return {}
+            upload_id = max(uploads, key=lambda upload: upload["Initiated"])[
+                "UploadId"
+            ]
+            pages = self.minio_client.get_paginator("list_parts").paginate(
+                Bucket=self.bucket, Key=self.object_key, UploadId=upload_id
+            )
+            parts = {
+                part["PartNumber"]: part["ETag"]
+                for page in pages
+                for part in page.get("Parts", [])
+            }
+        except (ClientError, BotoCoreError) as error:
+            minio_logger.warning(f"Minio list parts error: {error}")
+            check_missing_bucket(error, self.bucket)
+            raise
+        with self._lock:
+            self.upload_id = upload_id
+        minio_logger.info(
+            f"Resuming upload of {self.object_key} with {len(parts)} parts",
+            extra=SAMPLED,
+        )
+        return parts
+
+    def add_part(self, part_number: int, etag: str) -> None:
+        """Registers part that was uploaded outside of this object.
+
+        :param part_number: number of part starting from 1.
+        :param etag: ETag returned by minio for uploaded part.
+        :return: None.
+        """
+        with self._lock:
+            self._parts[part_number] = etag
 
+    @instrumented()
+    def complete(self, last_part: bytes) -> None:
+        """Uploads last part of object and completes upload.
 
+        Should be called after all other parts were uploaded.
+        :param last_part: content of last part, may be empty.
+        :return: None.
+        """
+        if self.upload_id is None:
+            put_minio_object(
+                self.minio_client, last_part, self.object_key, self.bucket
+            )
+            return
+        if last_part:
+            self.upload_part(len(self._parts) + 1, last_part)
+        parts = [
+            {"PartNumber": part_number, "ETag": etag}
+            for part_number, etag in sorted(self._parts.items())
+        ]
+        try:
+            self.minio_client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.object_key,
+                UploadId=self.upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except (ClientError, BotoCoreError) as error:
+            minio_logger.warning(f"Minio complete upload error: {error}")
+            check_missing_bucket(error, self.bucket)
+            raise
+
+    def abort(self) -> None:
+        """Aborts multipart upload so its parts don't consume storage.
+
+        :return: None.
+        """
+        if self.upload_id is None:
+            return
+        try:
+            self.minio_client.abort_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.object_key,
+                UploadId=self.upload_id,
+            )
+        except (ClientError, BotoCoreError) as error:
+            minio_logger.warning(f"Minio abort upload error: {error}")
+
+
+@instrumented()
+def abort_stale_multipart_uploads(
+    minio_client: boto3.client, bucket: str, prefix: str
+) -> int:
+    """Aborts unfinished multipart uploads older than MINIO_UPLOAD_MAX_AGE.
+
+    Failed syncs leave multipart uploads to be resumed, uploads of files that
+    are never synchronized again would consume storage forever.
+    :param minio_client: boto3 client connected to minio storage.
+    :param bucket: bucket with multipart uploads.
+    :param prefix: prefix of uploaded objects keys.
+    :return: number of aborted uploads.
+    """
+    pages = minio_client.get_paginator("list_multipart_uploads").paginate(
+        Bucket=bucket, Prefix=prefix
+    )
+    aborted_uploads = 0
+    try:
+        for page in pages:
+            for upload in page.get("Uploads", []):
+                if not is_upload_stale(upload):
+                    continue
+                minio_client.abort_multipart_upload(
+                    Bucket=bucket,
+                    Key=upload["Key"],
+                    UploadId=upload["UploadId"],
+                )
+                aborted_uploads += 1
+    except (ClientError, BotoCoreError) as error:
+        minio_logger.warning(f"Minio abort stale uploads error: {error}")
+        check_missing_bucket(error, bucket)
+        raise
+    if aborted_uploads:
+        minio_logger.info(f"Aborted {aborted_uploads} stale uploads")
+    return aborted_uploads
+
+
+class _UploadStatsSubscriber(BaseSubscriber):  # type: ignore
+    """Collects transferred bytes and duration of single upload."""
+
+    def __init__(self) -> None:
+        self.bytes_transferred = 0
+        self.start_time = self.end_time = time.monotonic()
+
+    def on_queued(self, future: Any, **kwargs: Any) -> None:
+        self.start_time = time.monotonic()
+
+    def on_progress(
+        self, future: Any, bytes_transferred: int, **kwargs: Any
+    ) -> None:
+        self.bytes_transferred += bytes_transferred
+
+    def on_done(self, future: Any, **kwargs: Any) -> None:
+        self.end_time = time.monotonic()
+
+
+@instrumented("put", MINIO_BACKEND)
+def upload_files_to_minio(
+    minio_client: boto3.client,
+    files: List[Tuple[IO[Any], str]],
+    bucket: str,
+    transfer_config: TransferConfig,
+) -> List[UploadedFileStatsSchema]:
+    """Concurrently uploads file-like objects to minio's bucket.
+
+    All files are uploaded through single transfer manager, so parts of all
+    files share the pool of max_concurrency threads from transfer_config.
+    :param minio_client: boto3 client connected to minio storage.
+    :param files: list of tuples with file-like object and its storage key.
+    :param bucket: bucket to upload files into.
+    :param transfer_config: multipart upload settings.
+    :return: per-file upload statistics.
+    """
+    uploads = []
+    with create_transfer_manager(minio_client, transfer_config) as manager:
+        for file_obj, object_key in files:
+            subscriber = _UploadStatsSubscriber()
+            future = manager.upload(
+                file_obj, bucket, object_key, subscribers=[subscriber]
+            )
+            uploads.append((object_key, future, subscriber))
+        try:
+            for _, future, _ in uploads:
+                future.result()
+        except (ClientError, BotoCoreError) as error:
+            minio_logger.warning(f"Minio file upload error: {error}")
+            check_missing_bucket(error, bucket)
+            raise
+    minio_logger.info(f"Successfully uploaded {len(files)} files to {bucket}")
+    record_transfer(
+        "client_to_minio",
+        bucket,
+        "",
+        sum(subscriber.bytes_transferred for _, _, subscriber in uploads),
+    )
+    return [
+        UploadedFileStatsSchema(
+            key=object_key,
+            size=subscriber.bytes_transferred,
+            elapsed_seconds=round(
+                subscriber.end_time - subscriber.start_time, 3
+            ),
+        )
+        for object_key, _, subscriber in uploads
+    ]
+
+
+@instrumented()
 def clear_minio_prefix(
     minio_client: boto3.client, bucket: str, prefix: str
 ) -> None:
     """Clears all objects in storage with specified prefix in keys.
 
+    Keys are streamed from paginated listing directly into batched deletes.
     :param minio_client: boto3 client connected to minio storage.
     :param bucket: bucket to delete files from.
     :param prefix: objects key prefix.
     :return: None.
     """
-    files = list_minio_prefix_files(minio_client, bucket, prefix)
-    for file_obj in files:
-        try:
-            minio_client.delete_object(Bucket=bucket, Key=file_obj["Key"])
-        except (ClientError, BotoCoreError) as error:
+    files = iter_minio_prefix_files(minio_client, bucket, prefix)
+    delete_minio_objects(
+        minio_client, bucket, (file_obj["Key"] for file_obj in files)
+    )
+
+
+def _delete_minio_objects_batch(
+    minio_client: boto3.client, bucket: str, object_keys: List[str]
+) -> List[str]:
+    """Deletes up to 1000 objects with single delete_objects request.
+
+    :param minio_client: boto3 client connected to minio storage.
+    :param bucket: bucket to delete files from.
+    :param object_keys: keys of objects to delete.
+    :return: list of "<key>: <error message>" for objects failed to delete.
+    """
+    try:
+        response = minio_client.delete_objects(
+            Bucket=bucket,
+            Delete={
+                "Objects": [{"Key": object_key} for object_key in object_keys],
+                "Quiet": True,
+            },
+        )
+    except (ClientError, BotoCoreError) as error:
+        minio_logger.warning(f"Minio file delete error: {error}")
+        check_missing_bucket(error, bucket)
+        raise
+    return [
+        f"{error['Key']}: {error.get('Message', error.get('Code'))}"
+        for error in response.get("Errors", [])
+    ]
+
+
+@instrumented()
+def delete_minio_objects(
+    minio_client: boto3.client, bucket: str, object_keys: Iterable[str]
+) -> None:
+    """Deletes objects with specified keys from storage.
+
+    Keys are grouped into batches of MINIO_DELETE_BATCH_SIZE keys that are
+    deleted in parallel. If some objects weren't deleted - raises
+    ObjectsDeleteError exception with errors for each failed key.
+    :param minio_client: boto3 client connected to minio storage.
+    :param bucket: bucket to delete files from.
+    :param object_keys: keys of objects to delete.
+    :return: None.
+    """
+    keys_iterator = iter(object_keys)
+    batches = iter(
+        lambda: list(islice(keys_iterator, MINIO_DELETE_BATCH_SIZE)), []
+    )
+    with ThreadPoolExecutor(max_workers=MINIO_DELETE_WORKERS) as executor:
+        errors = list(
+            chain.from_iterable(
+                executor.map(
+                    partial(_delete_minio_objects_batch, minio_client, bucket),
+                    batches,
+                )
+            )
+        )
+    if errors:
+        for error in errors:
             minio_logger.warning(f"Minio file delete error: {error}")
-            raise
+        raise ObjectsDeleteError(
+            f"Failed to delete {len(errors)} objects: {'; '.join(errors)}"
+        )
 
 
 FileInfo = List[Dict[str, Any]]
 
 
-def list_minio_prefix_files(
+def iter_minio_prefix_files(
     minio_client: boto3.client, bucket: str, prefix: str
-) -> FileInfo:
-    """Returns "Contents" field from result of boto3 list_objects_v2 if exists.
+) -> Iterator[Dict[str, Any]]:
+    """Lazily yields objects properties from paginated list_objects_v2.
 
+    Every page request is measured as "list" stage.
     :param minio_client: boto3 client connected to minio storage.
-    :param bucket: bucket to delete files from.
+    :param bucket: bucket to list files from.
     :param prefix: objects key prefix.
-    :return: list of dicts with files properties if exists.
+    :return: iterator of dicts with files properties.
     """
+    paginator = minio_client.get_paginator("list_objects_v2")
     try:
-        files: Dict[str, FileInfo] = minio_client.list_objects_v2(
-            Bucket=bucket, Prefix=prefix
-        )
-        return files.get("Contents", [])
+        pages = iter(paginator.paginate(Bucket=bucket, Prefix=prefix))
+        while True:
+            with measure_stage("list", MINIO_BACKEND, "list_objects_v2"):
+                page = next(pages, None)
+            if page is None:
+                return
+            yield from page.get("Contents", [])
     except (ClientError, BotoCoreError) as error:
         minio_logger.warning(f"Minio list objects error: {error}")
+        check_missing_bucket(error, bucket)
         raise
 
 
+@instrumented()
+def list_minio_prefix_files(
+    minio_client: boto3.client, bucket: str, prefix: str
+) -> FileInfo:
+    """Returns "Contents" fields from all pages of boto3 list_objects_v2.
+
+    :param minio_client: boto3 client connected to minio storage.
+    :param bucket: bucket to list files from.
+    :param prefix: objects key prefix.
+    :return: list of dicts with files properties if exists.
+    """
+    return list(iter_minio_prefix_files(minio_client, bucket, prefix))
+
+
+@instrumented("get", MINIO_BACKEND)
 def get_minio_object(
     minio_client: boto3.client, bucket: str, file_key: str
 ) -> Tuple[StreamingBody, int]:
@@ -119,4 +719,48 @@ def get_minio_object(
         return file_data["Body"], file_data["ContentLength"]
     except (ClientError, BotoCoreError) as error:
         minio_logger.warning(f"Minio list objects error: {error}")
+        check_missing_bucket(error, bucket)
+        raise
+
+
+@instrumented("get", MINIO_BACKEND)
+def get_minio_object_range(
+    minio_client: boto3.client,
+    bucket: str,
+    file_key: str,
+    start: int,
+    end: int,
+    etag: Optional[str] = None,
+) -> StreamingBody:
+    """Gets StreamingBody of byte range of file with file_key from minio.
+
+    If etag is provided and object was replaced - raises FileIntegrityError
+    exception, so ranges of different object versions are never mixed.
+    :param minio_client: boto3 client connected to minio storage.
+    :param bucket: bucket to stream files from.
+    :param file_key: key of file to stream.
+    :param start: offset of the first byte of range.
+    :param end: offset of the last byte of range, inclusive.
+    :param etag: ETag of object version from listing.
+    :return: file-like StreamingBody object with content of range.
+    """
+    conditions = {} if etag is None else {"IfMatch": etag}
+    try:
+        file_data = minio_client.get_object(
+            Bucket=bucket,
+            Key=file_key,
+            Range=f"bytes={start}-{end}",
+            **conditions,
+        )
+        return file_data["Body"]
+    except (ClientError, BotoCoreError) as error:
+        minio_logger.warning(f"Minio get object range error: {error}")
+        check_missing_bucket(error, bucket)
+        if (
+            isinstance(error, ClientError)
+            and error.response["Error"].get("Code") == "PreconditionFailed"
+        ):
+            raise FileIntegrityError(
+                f"File {file_key} was changed during upload"
+            ) from error
         raise
@@ -0,0 +1,192 @@
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import closing
+from threading import BoundedSemaphore
+from typing import Dict, List
+
+import boto3
+
+from .constants import (
+    COLAB_PREFETCH_BLOCK_SIZE,
+    COLAB_PREFETCH_MAX_BUFFERS,
+    COLAB_PREFETCH_WINDOW,
+)
+from .errors import FileIntegrityError
+from .logger import SAMPLED, get_logger
+from .minio_functions import get_minio_object_range
+
+prefetch_logger = get_logger(__name__)
+
+# Size of reads from response of ranged GET copied into block buffer.
+READ_SIZE = 1024 * 1024
+
+# Block buffers shared by all prefetched objects.
+prefetch_buffers = BoundedSemaphore(COLAB_PREFETCH_MAX_BUFFERS)
+# Every running fetch holds buffer, so buffers bound number of busy workers.
+prefetch_executor = ThreadPoolExecutor(
+    max_workers=COLAB_PREFETCH_MAX_BUFFERS, thread_name_prefix="prefetch"
+)
+
+
+class PrefetchedObject:
+    """Read-only file-like minio object prefetched by parallel ranged GETs.
+
+    Object is split into blocks of block_size bytes. Up to window blocks
+    ahead of reader are fetched concurrently into ring of window reusable
+    buffers: block is fetched into buffer of block that was read window
+    blocks before. Buffers are taken from shared buffers semaphore: object
+    waits only for its first buffer and gets up to window buffers that are
+    free, so memory of all objects is bounded by COLAB_PREFETCH_MAX_BUFFERS *
+    block_size bytes. Reader waits only if block isn't fetched yet, so writes
+    of read chunks overlap with fetching of next blocks. Blocks are fetched
+    with etag condition, so object replaced during read isn't mixed. Blocks
+    are fetched by workers of shared prefetch_executor. Objects of at most
+    one block aren't prefetched: their block is fetched by reader on first
+    read into own buffer.
+    """
+
+    def __init__(
+        self,
+        minio_client: boto3.client,
+        bucket: str,
+        file_key: str,
+        file_size: int,
+        etag: str = None,
+        block_size: int = COLAB_PREFETCH_BLOCK_SIZE,
+        window: int = COLAB_PREFETCH_WINDOW,
+        buffers: BoundedSemaphore = prefetch_buffers,
+    ):
+        self.minio_client = minio_client
+        self.bucket = bucket
+        self.file_key = file_key
+        self.file_size = file_size
+        self.etag = etag
+        self.block_size = block_size
+        self.blocks_count = -(-file_size // block_size)
+        self.buffers = buffers
+        self._acquired = 0
+        if self.blocks_count > 1:
+            self._acquired = self._acquire_buffers(
+                min(window, self.blocks_count)
+            )
+        self.window = max(self._acquired, 1)
+        self._buffers = [
+            bytearray(min(block_size, file_size))
+            for _ in range(min(self.window, self.blocks_count))
+        ]
+        self._futures: Dict[int, "Future[int]"] = {}
+        self._offset = 0
+        if self.blocks_count > 1:
+            for block_index in range(self.window):
+                self._submit(block_index)
+
+    def _acquire_buffers(self, window: int) -> int:
+        """Takes from one up to window free buffers of shared semaphore.
+
+        Only the first buffer is waited for, so objects that already hold
+        buffers are always read to their end and release them.
+        :param window: maximum number of buffers.
+        :return: number of taken buffers.
+        """
+        if window < 1:
+            return 0
+        if not self.buffers.acquire(blocking=False):
+            prefetch_logger.info(
+                f"Waiting for free prefetch buffer of {self.file_key}",
+                extra=SAMPLED,
+            )
+            self.buffers.acquire()
+        acquired = 1
+        while acquired < window and self.buffers.acquire(blocking=False):
+            acquired += 1
+        return acquired
+
+    def _submit(self, block_index: int) -> None:
+        if block_index < self.blocks_count:
+            self._futures[block_index] = prefetch_executor.submit(
+                self._fetch, block_index
+            )
+
+    def _get_block(self, block_index: int) -> int:
+        """Waits until block is fetched, fetches block of small object.
+
+        :param block_index: index of block.
+        :return: size of block in bytes.
+        """
+        if block_index not in self._futures:
+            block: "Future[int]" = Future()
+            block.set_result(self._fetch(block_index))
+            self._futures[block_index] = block
+        return self._futures[block_index].result()
+
+    def _fetch(self, block_index: int) -> int:
+        """Copies block of object into its buffer by ranged GET.
+
+        If minio returns less bytes than requested - raises
+        FileIntegrityError exception.
+        :param block_index: index of block.
+        :return: size of block in bytes.
+        """
+        start = block_index * self.block_size
+        block_size = min(self.block_size, self.file_size - start)
+        buffer = memoryview(self._buffers[block_index % self.window])
+        body = get_minio_object_range(
+            self.minio_client,
+            self.bucket,
+            self.file_key,
+            start,
+            start + block_size - 1,
+            self.etag,
+        )
+        position = 0
+        with closing(body):
+            while position < block_size:
+                data = body.read(min(READ_SIZE, block_size - position))
+                if not data:
+                    prefetch_logger.warning(
+                        f"File {self.file_key} was truncated"
+                    )
+                    raise FileIntegrityError(
+                        f"File {self.file_key} was corrupted during upload"
+                    )
+                end = position + len(data)
+                buffer[position:end] = data
+                position = end
+        return block_size
+
+    def read(self, size: int = -1) -> bytes:
+        """Reads up to size bytes of object from prefetched blocks.
+
+        Buffer of block is reused for next block as soon as block is read to
+        its end. Errors of fetching are reraised.
+        :param size: number of bytes to read, the rest of object if negative.
+        :return: bytes of object, empty at the end of object.
+        """
+        if size < 0:
+            size = self.file_size - self._offset
+        size = min(size, self.file_size - self._offset)
+        parts: List[bytes] = []
+        while size > 0:
+            block_index, block_offset = divmod(self._offset, self.block_size)
+            block_size = self._get_block(block_index)
+            part_end = min(block_offset + size, block_size)
+            buffer = memoryview(self._buffers[block_index % self.window])
+            parts.append(bytes(buffer[block_offset:part_end]))
+            self._offset += part_end - block_offset
+            size -= part_end - block_offset
+            if part_end == block_size:
+                del self._futures[block_index]
+                self._submit(block_index + self.window)
+        return b"".join(parts)
+
+    def close(self) -> None:
+        """Cancels pending fetches, waits for running ones and frees buffers.
+
+        :return: None.
+        """
+        for future in self._futures.values():
+            future.cancel()
+        wait(list(self._futures.values()))
+        self._futures.clear()
+        for _ in range(self._acquired):
+            self.buffers.release()
+        self._acquired = 0
@@ -0,0 +1,278 @@
+# Python scripts executed on colab side with "python3 -c". Helper scripts read
+# their arguments from stdin as json and print json result to stdout, so every
+# remote operation costs single exec round-trip over ssh tunnel.
+
+# Lists regular files in directory from argv[1] as {name: [size, mtime, md5]}.
+# md5 is calculated only for files with size equal to expected one from stdin
+# {name: size} mapping (other files are changed anyway), otherwise it's null.
+MANIFEST_SCRIPT = """
+import hashlib, json, os, sys
+directory, expected_sizes = sys.argv[1], json.load(sys.stdin)
+manifest = {}
+if os.path.isdir(directory):
+    for entry in os.scandir(directory):
+        if not entry.is_file(follow_symlinks=False):
+            continue
+        stat, md5 = entry.stat(), None
+        if expected_sizes.get(entry.name) == stat.st_size:
+            md5 = hashlib.md5()
+            with open(entry.path, "rb") as file_obj:
+                for chunk in iter(lambda: file_obj.read(1 << 20), b""):
+                    md5.update(chunk)
+            md5 = md5.hexdigest()
+        manifest[entry.name] = [stat.st_size, stat.st_mtime, md5]
+print(json.dumps(manifest))
+"""
+
+# Calculates md5 of every argv[1] bytes chunk of files from stdin list of
+# paths. Prints {path: [size, [md5, ...]]} for existing regular files.
+CHUNKS_SCRIPT = """
+import hashlib, json, os, sys
+chunk_size, chunks = int(sys.argv[1]), {}
+for path in json.load(sys.stdin):
+    if not os.path.isfile(path):
+        continue
+    with open(path, "rb") as file_obj:
+        hashes = [
+            hashlib.md5(chunk).hexdigest()
+            for chunk in iter(lambda: file_obj.read(chunk_size), b"")
+        ]
+        chunks[path] = [file_obj.tell(), hashes]
+print(json.dumps(chunks))
+"""
+
+# Content-addressed store of uploaded files in argv[2] directory. Stdin is
+# {"evict": [key], "link": {name: key}, "store": {name: key}}: evicted entries
+# are removed, stored entries are linked into argv[1] directory as name and
+# argv[1] files are stored as key. Entries are hardlinks (copies on other
+# filesystems) validated by size and mtime saved in index.json, so entries
+# modified through uploaded files are dropped. Prints {"linked": [name]}.
+CAS_SCRIPT = """
+import fcntl, json, os, shutil, sys
+directory, cas_directory = sys.argv[1], sys.argv[2]
+request = json.load(sys.stdin)
+os.makedirs(directory, exist_ok=True)
+os.makedirs(cas_directory, exist_ok=True)
+index_path = os.path.join(cas_directory, "index.json")
+lock_file = open(os.path.join(cas_directory, ".lock"), "w")
+fcntl.flock(lock_file, fcntl.LOCK_EX)
+index = {}
+if os.path.exists(index_path):
+    with open(index_path) as index_file:
+        index = json.load(index_file)
+def remove(key):
+    index.pop(key, None)
+    if os.path.lexists(os.path.join(cas_directory, key)):
+        os.remove(os.path.join(cas_directory, key))
+def place(source, target):
+    temporary = target + ".cas"
+    if os.path.lexists(temporary):
+        os.remove(temporary)
+    try:
+        os.link(source, temporary)
+    except OSError:
+        shutil.copy2(source, temporary)
+    os.replace(temporary, target)
+def get_entry(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+linked = []
+for key in request["evict"]:
+    remove(key)
+for name, key in request["link"].items():
+    path = os.path.join(cas_directory, key)
+    if key in index and os.path.isfile(path) and get_entry(path) == index[key]:
+        place(path, os.path.join(directory, name))
+        linked.append(name)
+    else:
+        remove(key)
+for name, key in request["store"].items():
+    path = os.path.join(directory, name)
+    if os.path.isfile(path):
+        place(path, os.path.join(cas_directory, key))
+        index[key] = get_entry(os.path.join(cas_directory, key))
+with open(index_path + ".tmp", "w") as index_file:
+    json.dump(index, index_file)
+os.replace(index_path + ".tmp", index_path)
+print(json.dumps({"linked": linked}))
+"""
+
+# Runs shell command from argv[1] keeping its stdout/stderr and exit status.
+# After command exits - saves its resource usage as json into argv[2] file.
+JOB_SCRIPT = """
+import json, os, resource, subprocess, sys, time
+command, usage_path = sys.argv[1], sys.argv[2]
+start_time = time.time()
+environment = dict(os.environ, PYTHONUNBUFFERED="1")
+exit_status = subprocess.call(command, shell=True, env=environment)
+usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+os.makedirs(os.path.dirname(usage_path), exist_ok=True)
+with open(usage_path, "w") as usage_file:
+    json.dump(
+        {
+            "user_time": usage.ru_utime,
+            "system_time": usage.ru_stime,
+            "max_rss_kb": usage.ru_maxrss,
+            "wall_time": time.time() - start_time,
+        },
+        usage_file,
+    )
+sys.exit(exit_status if exit_status >= 0 else 128 - exit_status)
+"""
+
+# Downloads [{name, url}] files from stdin into directory from argv[1] using
+# argv[2] threads. Prints {name: size} of downloaded files.
+FETCH_SCRIPT = """
+import json, os, shutil, sys, urllib.request
+from concurrent.futures import ThreadPoolExecutor
+directory, workers = sys.argv[1], int(sys.argv[2])
+def fetch(file_info):
+    path = os.path.join(directory, file_info["name"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with urllib.request.urlopen(file_info["url"], timeout=60) as response:
+        with open(path + ".part", "wb") as file_obj:
+            shutil.copyfileobj(response, file_obj, 1024 * 1024)
+    os.replace(path + ".part", path)
+    return file_info["name"], os.path.getsize(path)
+with ThreadPoolExecutor(workers) as executor:
+    json.dump(dict(executor.map(fetch, json.load(sys.stdin))), sys.stdout)
+"""
+
+# Uploads [{name, offset, size, url}] file ranges from stdin from directory
+# from argv[1] using argv[2] threads. Prints ETags of uploaded ranges.
+PUSH_SCRIPT = """
+import json, os, sys, urllib.request
+from concurrent.futures import ThreadPoolExecutor
+directory, workers = sys.argv[1], int(sys.argv[2])
+def push(part):
+    with open(os.path.join(directory, part["name"]), "rb") as file_obj:
+        file_obj.seek(part["offset"])
+        data = file_obj.read(part["size"])
+    request = urllib.request.Request(
+        part["url"],
+        data=data,
+        method="PUT",
+        headers={"Content-Type": "application/octet-stream"},
+    )
+    with urllib.request.urlopen(request, timeout=300) as response:
+        return response.headers.get("ETag")
+with ThreadPoolExecutor(workers) as executor:
+    json.dump(list(executor.map(push, json.load(sys.stdin))), sys.stdout)
+"""
+
+# Writes compressed transfer stream from stdin into file argv[1]. The first
+# byte of stream is codec: "z" - the rest is zlib stream, "r" - raw content.
+DECOMPRESS_SCRIPT = """
+import sys, zlib
+stream = sys.stdin.buffer
+codec = stream.read(1)
+decompressor = zlib.decompressobj() if codec == b"z" else None
+with open(sys.argv[1], "wb") as file_obj:
+    for chunk in iter(lambda: stream.read(1 << 20), b""):
+        if decompressor:
+            chunk = decompressor.decompress(chunk)
+        file_obj.write(chunk)
+    if decompressor:
+        file_obj.write(decompressor.flush())
+if decompressor and not decompressor.eof:
+    sys.exit("Compressed stream was truncated")
+"""
+
+# Prints file argv[1] as compressed transfer stream. Files with extensions
+# from argv[5] json list or which first argv[4] bytes have entropy higher than
+# argv[3] are sent raw, others are compressed with zlib level argv[2].
+COMPRESS_SCRIPT = """
+import collections, json, math, sys, zlib
+path, level, max_entropy = sys.argv[1], int(sys.argv[2]), float(sys.argv[3])
+sample_size, extensions = int(sys.argv[4]), tuple(json.loads(sys.argv[5]))
+stream = sys.stdout.buffer
+with open(path, "rb") as file_obj:
+    sample = file_obj.read(sample_size)
+    entropy = -sum(
+        count / len(sample) * math.log2(count / len(sample))
+        for count in collections.Counter(sample).values()
+    )
+    compressor = None
+    if not path.lower().endswith(extensions) and entropy <= max_entropy:
+        compressor = zlib.compressobj(level)
+    stream.write(b"z" if compressor else b"r")
+    chunk = sample
+    while chunk:
+        stream.write(compressor.compress(chunk) if compressor else chunk)
+        chunk = file_obj.read(1 << 20)
+    if compressor:
+        stream.write(compressor.flush())
+stream.flush()
+"""
+
+# Watches directory from argv[1] by scanning it every argv[2] seconds. Prints
+# "ready" line after initial scan, then json line for every file that was
+# created, modified ({"path", "size", "mtime" in seconds, "md5": [md5 of
+# argv[4] bytes chunks]}) or deleted ({"path", "size": null}) and didn't
+# change for argv[3] seconds. Every json path line read from stdin makes
+# file reported again with its current state. When stdin is closed - reports
+# all pending changes and exits.
+WATCH_SCRIPT = """
+import hashlib, json, os, select, stat, sys, time
+directory, interval = sys.argv[1], float(sys.argv[2])
+debounce, chunk_size = float(sys.argv[3]), int(sys.argv[4])
+def scan():
+    files = {}
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                file_stat = os.lstat(path)
+            except OSError:
+                continue
+            if stat.S_ISREG(file_stat.st_mode):
+                files[os.path.relpath(path, directory)] = [
+                    file_stat.st_size,
+                    file_stat.st_mtime_ns,
+                ]
+    return files
+def get_chunks(path):
+    with open(os.path.join(directory, path), "rb") as file_obj:
+        return [
+            hashlib.md5(chunk).hexdigest()
+            for chunk in iter(lambda: file_obj.read(chunk_size), b"")
+        ]
+os.makedirs(directory, exist_ok=True)
+reported, changes, closed, requests = scan(), {}, False, b""
+print("ready", flush=True)
+while True:
+    if not closed and select.select([sys.stdin], [], [], interval)[0]:
+        data = os.read(sys.stdin.fileno(), 1024)
+        closed = not data
+        *paths, requests = (requests + data).split(b"\\n")
+        for path in paths:
+            reported[json.loads(path)] = []
+    files, now = scan(), time.monotonic()
+    for path in set(files) | set(reported):
+        state = files.get(path)
+        if state == reported.get(path):
+            changes.pop(path, None)
+            continue
+        if path not in changes or changes[path][0] != state:
+            changes[path] = (state, now)
+        if now - changes[path][1] < debounce and not closed:
+            continue
+        event = {"path": path, "size": None}
+        if state is not None:
+            try:
+                event = dict(
+                    path=path,
+                    size=state[0],
+                    mtime=state[1] // 10**9,
+                    md5=get_chunks(path),
+                )
+            except OSError:
+                continue
+        print(json.dumps(event), flush=True)
+        reported.pop(path, None)
+        if state is not None:
+            reported[path] = state
+        changes.pop(path)
+    if closed:
+        break
+"""
@@ -0,0 +1,258 @@
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Tuple, TypeVar
+
+from anyio import Event, move_on_after
+
+from .concurrency import MINIO_HOST, RateLimiters, run_on_host
+from .constants import (
+    SCHEDULER_BANDWIDTH_BURST,
+    SCHEDULER_BUCKET_BANDWIDTH,
+    SCHEDULER_BUCKET_TRANSFERS,
+    SCHEDULER_HOST_BANDWIDTH,
+    SCHEDULER_HOST_TRANSFERS,
+    SCHEDULER_MAX_QUEUED,
+    SCHEDULER_RETRY_AFTER,
+)
+from .errors import SchedulerQueueFull
+from .logger import get_logger
+from .metrics import (
+    queue_wait_seconds,
+    queued_transfers,
+    rejected_transfers,
+    running_transfers,
+    transfer_observers,
+)
+
+scheduler_logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+class ScheduledTransfer:
+    """Transfer that waits for admission or runs in scheduler."""
+
+    def __init__(self, hosts: Tuple[str, ...], bucket: str, tenant: str):
+        self.hosts = hosts
+        self.bucket = bucket
+        self.tenant = tenant
+        self.queued_at = time.monotonic()
+        self.admitted = Event()
+        self.is_admitted = False
+
+
+class TransferScheduler:
+    """Admission control of transfers to colab hosts and minio buckets.
+
+    Transfer is admitted when every its colab runtime runs less than
+    host_transfers transfers, its bucket runs less than bucket_transfers
+    transfers and bandwidth of hosts and bucket isn't in debt. Bytes are
+    charged to bandwidth by record_transfer, so admission is delayed until
+    debt of previous transfers is refilled. Waiting transfers are queued per
+    tenant and tenants are served in round-robin order, so tenant with many
+    transfers doesn't block others. Scheduler runs inside event loop.
+    """
+
+    def __init__(
+        self,
+        host_transfers: int,
+        bucket_transfers: int,
+        max_queued: int,
+        host_bandwidth: RateLimiters,
+        bucket_bandwidth: RateLimiters,
+    ):
+        self.host_transfers = host_transfers
+        self.bucket_transfers = bucket_transfers
+        self.max_queued = max_queued
+        self.host_bandwidth = host_bandwidth
+        self.bucket_bandwidth = bucket_bandwidth
+        self._running_hosts: Dict[str, int] = {}
+        self._running_buckets: Dict[str, int] = {}
+        self._queues: "OrderedDict[str, Deque[ScheduledTransfer]]" = (
+            OrderedDict()
+        )
+        self._queued = 0
+
+    def charge(self, bucket: str, host: str, bytes_count: int) -> None:
+        """Charges transferred bytes to bandwidth of bucket and host.
+
+        :param bucket: minio bucket.
+        :param host: colab host key, empty for uploads from clients.
+        :param bytes_count: number of transferred bytes.
+        :return: None.
+        """
+        self.bucket_bandwidth.get(bucket).charge(bytes_count)
+        if host:
+            self.host_bandwidth.get(host).charge(bytes_count)
+
+    def get_queue_depth(self, tenant: str = None) -> int:
+        """Returns number of queued transfers.
+
+        :param tenant: tenant of transfers, all tenants if not provided.
+        :return: number of transfers waiting for admission.
+        """
+        if tenant is None:
+            return self._queued
+        return len(self._queues.get(tenant, ()))
+
+    def _get_delay(self, transfer: ScheduledTransfer) -> float:
+        delays = [self.bucket_bandwidth.get(transfer.bucket).get_delay()]
+        delays.extend(
+            self.host_bandwidth.get(host).get_delay()
+            for host in transfer.hosts
+        )
+        return max(delays)
+
+    def _has_capacity(self, transfer: ScheduledTransfer) -> bool:
+        if (
+            self._running_buckets.get(transfer.bucket, 0)
+            >= self.bucket_transfers
+        ):
+            return False
+        return all(
+            self._running_hosts.get(host, 0) < self.host_transfers
+            for host in transfer.hosts
+        )
+
+    def _start(self, transfer: ScheduledTransfer) -> None:
+        self._running_buckets[transfer.bucket] = (
+            self._running_buckets.get(transfer.bucket, 0) + 1
+        )
+        for host in transfer.hosts:
+            self._running_hosts[host] = self._running_hosts.get(host, 0) + 1
+        running_transfers.inc((transfer.bucket,))
+        transfer.is_admitted = True
+        transfer.admitted.set()
+
+    def _finish(self, transfer: ScheduledTransfer) -> None:
+        self._running_buckets[transfer.bucket] -= 1
+        if not self._running_buckets[transfer.bucket]:
+            del self._running_buckets[transfer.bucket]
+        for host in transfer.hosts:
+            self._running_hosts[host] -= 1
+            if not self._running_hosts[host]:
+                del self._running_hosts[host]
+        running_transfers.dec((transfer.bucket,))
+        self._dispatch()
+
+    def _remove(self, transfer: ScheduledTransfer) -> None:
+        queue = self._queues[transfer.tenant]
+        queue.remove(transfer)
+        if not queue:
+            del self._queues[transfer.tenant]
+        self._queued -= 1
+        queued_transfers.dec((transfer.bucket,))
+
+    def _dispatch(self) -> float:
+        """Admits queued transfers, one transfer of every tenant per round.
+
+        Tenant which transfer was admitted is moved to the end of tenants
+        order. Transfers of tenant are admitted in order of their queuing,
+        transfers to busy hosts or buckets are skipped.
+        :return: seconds until bandwidth of queued transfer is refilled or
+        None if no transfer waits for bandwidth.
+        """
+        min_delay = None
+        is_admitted = True
+        while is_admitted:
+            is_admitted = False
+            for tenant in list(self._queues):
+                for transfer in self._queues[tenant]:
+                    if not self._has_capacity(transfer):
+                        continue
+                    delay = self._get_delay(transfer)
+                    if delay > 0:
+                        min_delay = min(min_delay or delay, delay)
+                        continue
+                    self._remove(transfer)
+                    if tenant in self._queues:
+                        self._queues.move_to_end(tenant)
+                    self._start(transfer)
+                    is_admitted = True
+                    break
+        return min_delay
+
+    @asynccontextmanager
+    async def slot(
+        self, hosts: Tuple[str, ...], bucket: str, tenant: str
+    ) -> AsyncIterator[None]:
+        """Waits for admission of transfer and holds its slot.
+
+        If max_queued transfers are already waiting and transfer can't be
+        started immediately - raises SchedulerQueueFull exception.
+        :param hosts: keys of colab hosts from get_host_key, may be empty.
+        :param bucket: minio bucket of transfer.
+        :param tenant: keys_prefix of transferred files.
+        :return: async iterator that yields once transfer is admitted.
+        """
+        transfer = ScheduledTransfer(hosts, bucket, tenant)
+        if self._queued >= self.max_queued and not (
+            self._has_capacity(transfer) and not self._get_delay(transfer)
+        ):
+            rejected_transfers.inc((bucket,))
+            raise SchedulerQueueFull(
+                f"Transfer queue is full, {self._queued} transfers are "
+                f"waiting",
+                SCHEDULER_RETRY_AFTER,
+            )
+        self._queues.setdefault(tenant, deque()).append(transfer)
+        self._queued += 1
+        queued_transfers.inc((bucket,))
+        try:
+            delay = self._dispatch()
+            if not transfer.is_admitted:
+                scheduler_logger.info(
+                    f"Transfer of {tenant} is queued",
+                    extra={"queued": self.get_queue_depth(tenant)},
+                )
+            while not transfer.is_admitted:
+                with move_on_after(delay):
+                    await transfer.admitted.wait()
+                delay = self._dispatch()
+        except BaseException:
+            if transfer.is_admitted:
+                self._finish(transfer)
+            else:
+                self._remove(transfer)
+            raise
+        queue_wait_seconds.observe(
+            (bucket,), time.monotonic() - transfer.queued_at
+        )
+        try:
+            yield
+        finally:
+            self._finish(transfer)
+
+    async def run(
+        self,
+        hosts: Tuple[str, ...],
+        bucket: str,
+        tenant: str,
+        func: Callable[..., T],
+        *args: Any,
+    ) -> T:
+        """Runs blocking transfer function after its admission.
+
+        Admission is the only per-runtime limit of transfers, every admitted
+        transfer moves data of minio, so its worker thread is limited by
+        capacity of MINIO_HOST.
+        :param hosts: keys of colab hosts from get_host_key, may be empty.
+        :param bucket: minio bucket of transfer.
+        :param tenant: keys_prefix of transferred files.
+        :param func: blocking function.
+        :param args: positional arguments of function.
+        :return: result of function.
+        """
+        async with self.slot(hosts, bucket, tenant.strip("/")):
+            return await run_on_host(MINIO_HOST, func, *args)
+
+
+transfer_scheduler = TransferScheduler(
+    SCHEDULER_HOST_TRANSFERS,
+    SCHEDULER_BUCKET_TRANSFERS,
+    SCHEDULER_MAX_QUEUED,
+    RateLimiters(SCHEDULER_HOST_BANDWIDTH, SCHEDULER_BANDWIDTH_BURST),
+    RateLimiters(SCHEDULER_BUCKET_BANDWIDTH, SCHEDULER_BANDWIDTH_BURST),
+)
+transfer_observers.append(transfer_scheduler.charge)
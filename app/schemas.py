@@ -1,5 +1,16 @@
+from datetime import datetime
+from enum import Enum
+from typing import List
+
 from pydantic import BaseModel, Field
 
+from .constants import (
+    COLAB_BATCH_MAX_HOSTS,
+    COLAB_MAX_UPLOAD_WORKERS,
+    COLAB_UPLOAD_WORKERS,
+    COLAB_WATCH_DEBOUNCE,
+)
+
 
 class ConnectionErrorSchema(BaseModel):
     detail: str
@@ -28,10 +39,117 @@ class BadRequestErrorSchema(BaseModel):
         }
 
 
+class TooManyRequestsErrorSchema(BaseModel):
+    detail: str
+
+    class Config:
+        schema_extra = {
+            "example": {"detail": "Error: Transfer queue is full."},
+        }
+
+
 class ResponseSchema(BaseModel):
     message: str = Field(..., example="Success")
 
 
+class UploadedFileStatsSchema(BaseModel):
+    key: str = Field(..., example="project_1/script_files/script.py")
+    size: int = Field(..., example=1048576)
+    elapsed_seconds: float = Field(..., example=0.5)
+
+
+class UploadMinioResponseSchema(ResponseSchema):
+    files: List[UploadedFileStatsSchema]
+
+
+class TransferStatsSchema(BaseModel):
+    files_count: int = Field(..., example=10)
+    bytes_sent: int = Field(..., example=1048576)
+    elapsed_seconds: float = Field(..., example=0.5)
+    throughput: float = Field(..., example=2097152.0)
+    files_skipped: int = Field(0, example=0)
+    files_deleted: int = Field(0, example=0)
+    files_linked: int = Field(0, example=0)
+    content_bytes: int = Field(0, example=4194304)
+    effective_throughput: float = Field(0.0, example=8388608.0)
+
+
+class SyncActions(str, Enum):
+    uploaded = "uploaded"
+    deleted = "deleted"
+
+
+class PlannedFileSchema(BaseModel):
+    key: str = Field(..., example="script_files/script.py")
+    action: SyncActions = Field(..., example=SyncActions.uploaded)
+    size: int = Field(..., example=1048576)
+
+
+class TransferPlanSchema(BaseModel):
+    files_count: int = Field(..., example=1)
+    total_bytes: int = Field(..., example=1048576)
+    files: List[PlannedFileSchema]
+
+
+class UploadColabResponseSchema(ResponseSchema):
+    stats: TransferStatsSchema = Field(None)
+    plan: TransferPlanSchema = Field(None)
+    job_id: str = Field(None, example="5f1d7e8c9a0b4c2d8e6f3a1b2c4d6e8f")
+
+
+class SyncFileStatsSchema(BaseModel):
+    key: str = Field(..., example="script_files/output/result")
+    action: SyncActions = Field(..., example=SyncActions.uploaded)
+    size: int = Field(..., example=1048576)
+    bytes_received: int = Field(0, example=262144)
+    elapsed_seconds: float = Field(..., example=0.5)
+
+
+class SyncStatsSchema(BaseModel):
+    files_uploaded: int = Field(..., example=1)
+    files_deleted: int = Field(..., example=0)
+    files_unchanged: int = Field(..., example=0)
+    bytes_uploaded: int = Field(..., example=1048576)
+    bytes_received: int = Field(0, example=262144)
+    elapsed_seconds: float = Field(..., example=0.5)
+    effective_throughput: float = Field(0.0, example=2097152.0)
+    files: List[SyncFileStatsSchema]
+
+
+class DownloadColabResponseSchema(ResponseSchema):
+    stats: SyncStatsSchema = Field(None)
+    plan: TransferPlanSchema = Field(None)
+
+
+class JobStates(str, Enum):
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+    lost = "lost"
+
+
+class JobSchema(BaseModel):
+    job_id: str = Field(..., example="5f1d7e8c9a0b4c2d8e6f3a1b2c4d6e8f")
+    script_name: str = Field(..., example="script.py")
+    host: str = Field(..., example="x.tcp.ngrok.io")
+    state: JobStates = Field(..., example=JobStates.succeeded)
+    exit_status: int = Field(None, example=0)
+    started_at: datetime
+    finished_at: datetime = Field(None)
+    elapsed_seconds: float = Field(..., example=12.5)
+    user_time: float = Field(None, example=10.2)
+    system_time: float = Field(None, example=0.4)
+    max_rss_kb: int = Field(None, example=204800)
+    logs_prefix: str = Field(..., example="script_files/logs/5f1d7e8c/")
+
+
+class TransferMode(str, Enum):
+    sftp = "sftp"
+    bundle = "bundle"
+    presigned = "presigned"
+    compressed = "compressed"
+
+
 class ColabCredentials(BaseModel):
     user: str = Field(..., example="root")
     password: str = Field(..., example="PASSWORD")
@@ -41,7 +159,74 @@ class ColabCredentials(BaseModel):
 
 class DownloadColabSchema(ColabCredentials):
     keys_prefix: str = Field(..., example="script_files")
+    max_workers: int = Field(
+        COLAB_UPLOAD_WORKERS,
+        ge=1,
+        le=COLAB_MAX_UPLOAD_WORKERS,
+        example=COLAB_UPLOAD_WORKERS,
+    )
+    transfer_mode: TransferMode = Field(
+        TransferMode.sftp, example=TransferMode.sftp
+    )
+    include: List[str] = Field(None, example=["*.py", "data/*"])
+    exclude: List[str] = Field(None, example=["checkpoints", "*.tmp"])
+    max_size: int = Field(None, ge=0, example=104857600)
+    newer_than: datetime = Field(None, example="2022-05-01T00:00:00Z")
+    dry_run: bool = Field(False, example=False)
 
 
 class UploadColabSchema(DownloadColabSchema):
     script_name: str = Field(None, example="script.py")
+    incremental: bool = Field(False, example=False)
+    delete_stale: bool = Field(False, example=False)
+
+
+class BatchUploadColabSchema(BaseModel):
+    hosts: List[ColabCredentials] = Field(
+        ..., min_items=1, max_items=COLAB_BATCH_MAX_HOSTS
+    )
+    keys_prefix: str = Field(..., example="script_files")
+    script_name: str = Field(None, example="script.py")
+
+
+class HostUploadResultSchema(BaseModel):
+    host: str = Field(..., example="x.tcp.ngrok.io")
+    port: int = Field(..., example=12345)
+    stats: TransferStatsSchema = Field(None)
+    job_id: str = Field(None, example="5f1d7e8c9a0b4c2d8e6f3a1b2c4d6e8f")
+    error: str = Field(None, example=None)
+
+
+class BatchUploadColabResponseSchema(ResponseSchema):
+    bytes_read: int = Field(..., example=1048576)
+    hosts: List[HostUploadResultSchema]
+
+
+class WatchColabSchema(ColabCredentials):
+    keys_prefix: str = Field(..., example="script_files")
+    job_id: str = Field(None, example="5f1d7e8c9a0b4c2d8e6f3a1b2c4d6e8f")
+    debounce_seconds: float = Field(
+        COLAB_WATCH_DEBOUNCE, ge=0, example=COLAB_WATCH_DEBOUNCE
+    )
+
+
+class WatchStates(str, Enum):
+    running = "running"
+    stopping = "stopping"
+    finished = "finished"
+    failed = "failed"
+
+
+class WatchSchema(BaseModel):
+    watch_id: str = Field(..., example="9a0b4c2d8e6f3a1b2c4d6e8f5f1d7e8c")
+    host: str = Field(..., example="x.tcp.ngrok.io")
+    output_prefix: str = Field(..., example="script_files/output/")
+    job_id: str = Field(None, example="5f1d7e8c9a0b4c2d8e6f3a1b2c4d6e8f")
+    state: WatchStates = Field(..., example=WatchStates.running)
+    started_at: datetime
+    finished_at: datetime = Field(None)
+    files_uploaded: int = Field(..., example=3)
+    files_deleted: int = Field(..., example=0)
+    files_failed: int = Field(..., example=0)
+    bytes_uploaded: int = Field(..., example=1048576)
+    error: str = Field(None, example=None)
@@ -0,0 +1,262 @@
+import hashlib
+import hmac
+import time
+from threading import Condition, Lock
+from typing import Dict, List, NamedTuple, Tuple
+
+from paramiko import AutoAddPolicy, SSHClient, SSHException
+
+from .constants import (
+    COLAB_SSH_ACQUIRE_TIMEOUT,
+    COLAB_SSH_IDLE_TIMEOUT,
+    COLAB_SSH_KEEPALIVE,
+    COLAB_SSH_MAX_CHANNELS,
+)
+from .logger import get_logger
+from .metrics import COLAB_BACKEND, instrumented
+from .schemas import ColabCredentials
+
+pool_logger = get_logger(__name__)
+
+ConnectionKey = Tuple[str, int, str]
+
+
+@instrumented("connect", COLAB_BACKEND)
+def open_ssh_colab(credentials: ColabCredentials) -> SSHClient:
+    """Connects to colab via ssh with provided credentials and returns client.
+
+    Caller is responsible for closing returned client.
+    :param credentials: credentials generated colab_ssh_config_script on colab.
+    :return: paramiko SSHClient.
+    """
+    ssh_client = SSHClient()
+    ssh_client.set_missing_host_key_policy(AutoAddPolicy())
+    try:
+        ssh_client.connect(
+            hostname=credentials.host,
+            port=credentials.port,
+            username=credentials.user,
+            password=credentials.password,
+        )
+    except SSHException as error:
+        pool_logger.warning(f"Colab SSH connection error: {error}")
+        ssh_client.close()
+        raise
+    return ssh_client
+
+
+def get_password_digest(password: str) -> bytes:
+    """Returns digest of password used to compare pooled connections.
+
+    :param password: ssh password.
+    :return: sha256 digest.
+    """
+    return hashlib.sha256(password.encode()).digest()
+
+
+def is_ssh_client_active(ssh_client: SSHClient) -> bool:
+    """Checks that ssh client has authenticated and alive transport.
+
+    :param ssh_client: paramiko ssh client.
+    :return: True if client may be used to open channels.
+    """
+    transport = ssh_client.get_transport()
+    if transport is None or not transport.is_authenticated():
+        return False
+    try:
+        transport.send_ignore()
+    except (SSHException, OSError, EOFError):
+        return False
+    return transport.is_active()
+
+
+class PooledSSHConnection:
+    """Authenticated ssh connection shared by requests to the same colab."""
+
+    def __init__(
+        self, key: ConnectionKey, ssh_client: SSHClient, password_digest: bytes
+    ):
+        self.key = key
+        self.ssh_client = ssh_client
+        self.password_digest = password_digest
+        self.leases = 0
+        self.channels = 0
+        self.last_used = time.monotonic()
+        self.retired = False
+
+
+class SSHLease(NamedTuple):
+    """Connection borrowed from pool with number of reserved channels."""
+
+    connection: PooledSSHConnection
+    channels: int
+
+    @property
+    def ssh_client(self) -> SSHClient:
+        return self.connection.ssh_client
+
+
+class SSHConnectionPool:
+    """Keeps authenticated ssh connections to colab keyed by host, port, user.
+
+    Connections are reused by all requests with the same key and password.
+    Every lease reserves part of max_channels channels of connection, so
+    concurrent requests never exceed sessions limit of colab sshd. Broken
+    connections are replaced on next lease, connections without leases are
+    closed after idle_timeout seconds.
+    """
+
+    def __init__(
+        self,
+        max_channels: int,
+        idle_timeout: float,
+        keepalive: int,
+        acquire_timeout: float,
+    ):
+        self.max_channels = max_channels
+        self.idle_timeout = idle_timeout
+        self.keepalive = keepalive
+        self.acquire_timeout = acquire_timeout
+        self._connections: Dict[ConnectionKey, PooledSSHConnection] = {}
+        self._connect_locks: Dict[ConnectionKey, Lock] = {}
+        self._condition = Condition()
+
+    def acquire(
+        self, credentials: ColabCredentials, channels: int = 1
+    ) -> SSHLease:
+        """Leases connection to colab reserving up to channels channels.
+
+        Waits acquire_timeout seconds for at least one free channel, if there
+        is no free channels - raises SSHException.
+        :param credentials: credentials for ssh connection.
+        :param channels: maximum number of channels that will be used.
+        :return: lease with connection and number of reserved channels.
+        """
+        self.evict_idle()
+        key = (credentials.host, credentials.port, credentials.user)
+        with self._condition:
+            connect_lock = self._connect_locks.setdefault(key, Lock())
+        with connect_lock:
+            connection = self._get_connection(key, credentials.password)
+            if connection is None:
+                connection = self._connect(key, credentials)
+        with self._condition:
+            if not self._condition.wait_for(
+                lambda: connection.channels < self.max_channels,
+                self.acquire_timeout,
+            ):
+                raise SSHException(
+                    f"No free ssh channels on {credentials.host}"
+                )
+            reserved = min(channels, self.max_channels - connection.channels)
+            connection.channels += reserved
+            connection.leases += 1
+        return SSHLease(connection, reserved)
+
+    def release(self, lease: SSHLease) -> None:
+        """Returns leased connection to pool, closes it if it is broken.
+
+        :param lease: lease returned by acquire.
+        :return: None.
+        """
+        connection = lease.connection
+        is_active = is_ssh_client_active(connection.ssh_client)
+        with self._condition:
+            connection.channels -= lease.channels
+            connection.leases -= 1
+            connection.last_used = time.monotonic()
+            if not is_active:
+                self._retire(connection)
+            should_close = connection.retired and connection.leases == 0
+            self._condition.notify_all()
+        if should_close:
+            connection.ssh_client.close()
+
+    def evict_idle(self) -> None:
+        """Closes connections that weren't leased for idle_timeout seconds.
+
+        :return: None.
+        """
+        expired_time = time.monotonic() - self.idle_timeout
+        with self._condition:
+            idle_connections = [
+                connection
+                for connection in self._connections.values()
+                if connection.leases == 0
+                and connection.last_used < expired_time
+            ]
+            for connection in idle_connections:
+                self._retire(connection)
+        for connection in idle_connections:
+            pool_logger.info(
+                f"Closing idle ssh connection to {connection.key}"
+            )
+            connection.ssh_client.close()
+
+    def close_all(self) -> None:
+        """Closes all pooled connections including leased ones.
+
+        :return: None.
+        """
+        with self._condition:
+            connections: List[PooledSSHConnection] = list(
+                self._connections.values()
+            )
+            for connection in connections:
+                self._retire(connection)
+        for connection in connections:
+            connection.ssh_client.close()
+
+    def _get_connection(
+        self, key: ConnectionKey, password: str
+    ) -> PooledSSHConnection:
+        with self._condition:
+            connection = self._connections.get(key)
+        if connection is None or not hmac.compare_digest(
+            connection.password_digest, get_password_digest(password)
+        ):
+            return None
+        if is_ssh_client_active(connection.ssh_client):
+            with self._condition:
+                connection.last_used = time.monotonic()
+            return connection
+        pool_logger.warning(f"Pooled ssh connection to {key} is broken")
+        with self._condition:
+            self._retire(connection)
+            should_close = connection.leases == 0
+        if should_close:
+            connection.ssh_client.close()
+        return None
+
+    def _connect(
+        self, key: ConnectionKey, credentials: ColabCredentials
+    ) -> PooledSSHConnection:
+        ssh_client = open_ssh_colab(credentials)
+        ssh_client.get_transport().set_keepalive(self.keepalive)
+        connection = PooledSSHConnection(
+            key, ssh_client, get_password_digest(credentials.password)
+        )
+        with self._condition:
+            previous_connection = self._connections.get(key)
+            should_close = False
+            if previous_connection is not None:
+                self._retire(previous_connection)
+                should_close = previous_connection.leases == 0
+            self._connections[key] = connection
+        if should_close:
+            previous_connection.ssh_client.close()
+        pool_logger.info(f"Opened pooled ssh connection to {key}")
+        return connection
+
+    def _retire(self, connection: PooledSSHConnection) -> None:
+        connection.retired = True
+        if self._connections.get(connection.key) is connection:
+            del self._connections[connection.key]
+
+
+ssh_pool = SSHConnectionPool(
+    COLAB_SSH_MAX_CHANNELS,
+    COLAB_SSH_IDLE_TIMEOUT,
+    COLAB_SSH_KEEPALIVE,
+    COLAB_SSH_ACQUIRE_TIMEOUT,
+)
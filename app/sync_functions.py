@@ -0,0 +1,668 @@
+import hashlib
+import json
+import stat
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from functools import partial
+from pathlib import PurePosixPath
+from queue import Queue
+from typing import (
+    Any,
+    ContextManager,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+import boto3
+from paramiko import SFTPAttributes, SFTPClient, SSHClient, SSHException
+
+from .colab_functions import (
+    RemoteChunks,
+    get_colab_chunks,
+    get_python_command,
+    open_sftp_sessions,
+    run_colab_script,
+)
+from .compression import COMPRESSED_EXTENSIONS, decompress_chunks, iter_parts
+from .constants import (
+    COLAB_CHUNK_SIZE,
+    COLAB_COMPRESSION_LEVEL,
+    COLAB_COMPRESSION_MAX_ENTROPY,
+    COLAB_COMPRESSION_SAMPLE_SIZE,
+    COLAB_OUTPUT_DIRECTORY,
+    MINIO_MULTIPART_CHUNKSIZE,
+)
+from .errors import FileIntegrityError
+from .logger import get_logger
+from .metrics import COLAB_BACKEND, instrumented, measure_stage
+from .minio_functions import (
+    MinioMultipartUpload,
+    abort_stale_multipart_uploads,
+    delete_minio_objects,
+    get_presigned_url,
+    multipart_upload_locks,
+    put_minio_object,
+)
+from .remote_scripts import COMPRESS_SCRIPT, PUSH_SCRIPT
+from .schemas import (
+    PlannedFileSchema,
+    SyncActions,
+    SyncFileStatsSchema,
+    SyncStatsSchema,
+    TransferMode,
+    TransferPlanSchema,
+)
+from .sync_index import (
+    SyncIndex,
+    SyncIndexEntry,
+    get_chunks_etag,
+    get_sync_index,
+    update_sync_index,
+)
+from .transfer_filters import (
+    EMPTY_FILTER,
+    TransferFilter,
+    is_directory_excluded,
+    is_file_selected,
+    is_path_selected,
+)
+
+sync_logger = get_logger(__name__)
+
+RemoteFiles = Dict[str, SFTPAttributes]
+
+
+@instrumented("list", COLAB_BACKEND)
+def list_colab_output_files(
+    sftp_session: SFTPClient, transfer_filter: TransferFilter = EMPTY_FILTER
+) -> RemoteFiles:
+    """Recursively lists regular files in colab /content/uploaded/output.
+
+    Directories excluded by patterns of transfer_filter aren't listed and
+    only files which paths pass its patterns are returned. If output
+    directory doesn't exist - raises SSHException.
+    :param sftp_session: paramiko sftp session opened on colab.
+    :param transfer_filter: filter of listed files.
+    :return: dict with file paths relative to output directory and their
+    sftp attributes.
+    """
+    remote_files: RemoteFiles = {}
+    directories = [PurePosixPath()]
+    while directories:
+        directory = directories.pop()
+        try:
+            entries = sftp_session.listdir_attr(
+                f"{COLAB_OUTPUT_DIRECTORY}/{directory}"
+            )
+        except FileNotFoundError:
+            sync_logger.warning(f"Colab directory {directory} doesn't exist")
+            raise SSHException(
+                f"Colab directory {COLAB_OUTPUT_DIRECTORY} doesn't exist"
+            )
+        for entry in entries:
+            entry_path = directory / entry.filename
+            if stat.S_ISDIR(entry.st_mode or 0):
+                if not is_directory_excluded(
+                    transfer_filter, entry_path.as_posix()
+                ):
+                    directories.append(entry_path)
+            elif stat.S_ISREG(entry.st_mode or 0) and is_path_selected(
+                transfer_filter, entry_path.as_posix()
+            ):
+                remote_files[entry_path.as_posix()] = entry
+    return remote_files
+
+
+def is_synced_file_outdated(
+    remote_file: SFTPAttributes, synced_file: SyncIndexEntry
+) -> bool:
+    """Checks if synchronized object should be updated with remote file.
+
+    Uses the same rules as "aws s3 sync": object is updated if sizes differ
+    or remote file was modified after modification time of synced file (or
+    object upload, if index entry was built from listing).
+    :param remote_file: sftp attributes of remote file.
+    :param synced_file: entry of sync index.
+    :return: True if remote file should be uploaded.
+    """
+    if remote_file.st_size != synced_file.size:
+        return True
+    return (remote_file.st_mtime or 0) > synced_file.mtime
+
+
+@instrumented()
+def upload_colab_file_to_minio(
+    minio_client: boto3.client,
+    bucket: str,
+    file_path: str,
+    file_chunks: RemoteChunks,
+    object_key: str,
+    sessions: "Queue[SFTPClient]",
+) -> SyncFileStatsSchema:
+    """Streams single colab output file into minio using free sftp session.
+
+    File is read by MINIO_MULTIPART_CHUNKSIZE parts, md5 of every part is
+    compared with md5 calculated on colab and sent as Content-MD5, so content
+    corrupted on any side is rejected. Multipart upload isn't aborted on
+    failure: next sync resumes it and doesn't read parts with the same md5
+    from colab again. Writers of the same object are serialized, so they
+    don't resume upload of each other.
+    :param minio_client: boto3 client connected to minio storage.
+    :param bucket: bucket to upload file into.
+    :param file_path: path of file relative to colab output directory.
+    :param file_chunks: size and md5 of file parts calculated on colab.
+    :param object_key: storage key of uploaded file.
+    :param sessions: queue with opened sftp sessions.
+    :return: uploaded file statistics.
+    """
+    start_time = time.monotonic()
+    with multipart_upload_locks.hold(f"{bucket}/{object_key}"):
+        upload = MinioMultipartUpload(minio_client, bucket, object_key)
+        uploaded_parts: Dict[int, str] = {}
+        if len(file_chunks.md5) > 1:
+            uploaded_parts = upload.resume()
+        bytes_received = 0
+        sftp_session = sessions.get()
+        try:
+            remote_path = f"{COLAB_OUTPUT_DIRECTORY}/{file_path}"
+            with sftp_session.open(remote_path, "rb") as remote_file:
+                for part_number, part_md5 in enumerate(file_chunks.md5, 1):
+                    if uploaded_parts.get(part_number) == f'"{part_md5}"':
+                        upload.add_part(part_number, f'"{part_md5}"')
+                        continue
+                    offset = (part_number - 1) * MINIO_MULTIPART_CHUNKSIZE
+                    part_size = min(
+                        MINIO_MULTIPART_CHUNKSIZE, file_chunks.size - offset
+                    )
+                    with measure_stage("get", COLAB_BACKEND, "readv"):
+                        data = b"".join(
+                            remote_file.readv([(offset, part_size)])
+                        )
+                    bytes_received += len(data)
+                    if hashlib.md5(data).hexdigest() != part_md5:
+                        sync_logger.warning(f"File {file_path} was changed")
+                        raise FileIntegrityError(
+                            f"File {file_path} was corrupted during download"
+                        )
+                    if len(file_chunks.md5) == 1:
+                        put_minio_object(
+                            minio_client, data, object_key, bucket, verify=True
+                        )
+                    else:
+                        upload.upload_part(part_number, data, verify=True)
+        finally:
+            sessions.put(sftp_session)
+        if not file_chunks.md5:
+            put_minio_object(minio_client, b"", object_key, bucket)
+        elif len(file_chunks.md5) > 1:
+            upload.complete(b"")
+        return SyncFileStatsSchema(
+            key=object_key,
+            action=SyncActions.uploaded,
+            size=file_chunks.size,
+            bytes_received=bytes_received,
+            elapsed_seconds=round(time.monotonic() - start_time, 3),
+        )
+
+
+@instrumented()
+def upload_colab_file_to_minio_compressed(
+    minio_client: boto3.client,
+    bucket: str,
+    file_path: str,
+    file_chunks: RemoteChunks,
+    object_key: str,
+    ssh_client: SSHClient,
+) -> SyncFileStatsSchema:
+    """Streams single colab output file into minio over exec channel.
+
+    File is sent by COMPRESS_SCRIPT which compresses it with zlib unless its
+    content is already compressed. Decompressed content is split into
+    MINIO_MULTIPART_CHUNKSIZE parts which md5 is compared with md5 calculated
+    on colab and sent as Content-MD5. Parts uploaded by previous syncs are
+    read from colab, but aren't uploaded again. Writers of the same object
+    are serialized.
+    :param minio_client: boto3 client connected to minio storage.
+    :param bucket: bucket to upload file into.
+    :param file_path: path of file relative to colab output directory.
+    :param file_chunks: size and md5 of file parts calculated on colab.
+    :param object_key: storage key of uploaded file.
+    :param ssh_client: paramiko ssh client connected to colab session.
+    :return: uploaded file statistics with compressed bytes received.
+    """
+    start_time = time.monotonic()
+    with multipart_upload_locks.hold(f"{bucket}/{object_key}"):
+        upload = MinioMultipartUpload(minio_client, bucket, object_key)
+        uploaded_parts: Dict[int, str] = {}
+        if len(file_chunks.md5) > 1:
+            uploaded_parts = upload.resume()
+        stdin, stdout, stderr = ssh_client.exec_command(
+            get_python_command(
+                COMPRESS_SCRIPT,
+                [
+                    f"{COLAB_OUTPUT_DIRECTORY}/{file_path}",
+                    str(COLAB_COMPRESSION_LEVEL),
+                    str(COLAB_COMPRESSION_MAX_ENTROPY),
+                    str(COLAB_COMPRESSION_SAMPLE_SIZE),
+                    json.dumps(COMPRESSED_EXTENSIONS),
+                ],
+            )
+        )
+        bytes_received = 0
+
+        def read_stream() -> Iterator[bytes]:
+            nonlocal bytes_received
+            for chunk in iter(lambda: stdout.read(COLAB_CHUNK_SIZE), b""):
+                bytes_received += len(chunk)
+                yield chunk
+
+        parts = iter_parts(
+            decompress_chunks(read_stream()), MINIO_MULTIPART_CHUNKSIZE
+        )
+        parts_count = 0
+        try:
+            stdin.channel.shutdown_write()
+            for part_number, data in enumerate(parts, 1):
+                parts_count = part_number
+                if (
+                    part_number > len(file_chunks.md5)
+                    or hashlib.md5(data).hexdigest()
+                    != file_chunks.md5[part_number - 1]
+                ):
+                    sync_logger.warning(f"File {file_path} was changed")
+                    raise FileIntegrityError(
+                        f"File {file_path} was corrupted during download"
+                    )
+                part_etag = f'"{file_chunks.md5[part_number - 1]}"'
+                if uploaded_parts.get(part_number) == part_etag:
+                    upload.add_part(part_number, part_etag)
+                elif len(file_chunks.md5) == 1:
+                    put_minio_object(
+                        minio_client, data, object_key, bucket, verify=True
+                    )
+                else:
+                    upload.upload_part(part_number, data, verify=True)
+            if stdout.channel.recv_exit_status() != 0:
+                error_message = stderr.read().decode().strip()
+                sync_logger.warning(
+                    f"Colab compression error: {error_message}"
+                )
+                raise SSHException(
+                    f"Colab compression failed: {error_message}"
+                )
+            if parts_count != len(file_chunks.md5):
+                sync_logger.warning(f"File {file_path} was truncated")
+                raise FileIntegrityError(
+                    f"File {file_path} was corrupted during download"
+                )
+        finally:
+            stdout.channel.close()
+        if not file_chunks.md5:
+            put_minio_object(minio_client, b"", object_key, bucket)
+        elif len(file_chunks.md5) > 1:
+            upload.complete(b"")
+        return SyncFileStatsSchema(
+            key=object_key,
+            action=SyncActions.uploaded,
+            size=file_chunks.size,
+            bytes_received=bytes_received,
+            elapsed_seconds=round(time.monotonic() - start_time, 3),
+        )
+
+
+@instrumented()
+def push_colab_files_to_minio(
+    ssh_client: SSHClient,
+    minio_client: boto3.client,
+    bucket: str,
+    files: List[Tuple[str, int, str]],
+    max_workers: int,
+) -> List[SyncFileStatsSchema]:
+    """Makes colab upload output files to minio by presigned urls.
+
+    Files bigger than MINIO_MULTIPART_CHUNKSIZE are uploaded as multipart
+    uploads with presigned url for every MINIO_MULTIPART_CHUNKSIZE part,
+    other files are put with single presigned request, so ETags of objects
+    match ETags that sync index calculates from md5 of file chunks. All parts
+    are uploaded by max_workers threads of single remote command, so file
+    content doesn't pass through application. If push fails - multipart
+    uploads are aborted.
+    :param ssh_client: paramiko ssh client connected to colab session.
+    :param minio_client: boto3 client connected to minio storage.
+    :param bucket: bucket to upload files into.
+    :param files: list of tuples with file path relative to colab output
+    directory, file size and storage key.
+    :param max_workers: number of parallel uploads on colab.
+    :return: per-file upload statistics.
+    """
+    start_time = time.monotonic()
+    parts: List[Dict[str, Any]] = []
+    uploads: List[Tuple[MinioMultipartUpload, int, int]] = []
+    try:
+        for file_path, file_size, object_key in files:
+            if file_size <= MINIO_MULTIPART_CHUNKSIZE:
+                url = get_presigned_url(
+                    "put_object", Bucket=bucket, Key=object_key
+                )
+                parts.append(
+                    {
+                        "name": file_path,
+                        "offset": 0,
+                        "size": file_size,
+                        "url": url,
+                    }
+                )
+                continue
+            upload = MinioMultipartUpload(minio_client, bucket, object_key)
+            upload_id = upload.create()
+            first_part = len(parts)
+            for offset in range(0, file_size, MINIO_MULTIPART_CHUNKSIZE):
+                url = get_presigned_url(
+                    "upload_part",
+                    Bucket=bucket,
+                    Key=object_key,
+                    UploadId=upload_id,
+                    PartNumber=len(parts) - first_part + 1,
+                )
+                parts.append(
+                    {
+                        "name": file_path,
+                        "offset": offset,
+                        "size": min(
+                            MINIO_MULTIPART_CHUNKSIZE, file_size - offset
+                        ),
+                        "url": url,
+                    }
+                )
+            uploads.append((upload, first_part, len(parts)))
+        etags: List[str] = run_colab_script(
+            ssh_client,
+            PUSH_SCRIPT,
+            [COLAB_OUTPUT_DIRECTORY, str(max_workers)],
+            parts,
+        )
+        for upload, first_part, last_part in uploads:
+            for part_index in range(first_part, last_part):
+                upload.add_part(part_index - first_part + 1, etags[part_index])
+            upload.complete(b"")
+    except BaseException:
+        for upload, _, _ in uploads:
+            upload.abort()
+        raise
+    elapsed_seconds = round(time.monotonic() - start_time, 3)
+    sync_logger.info(f"{len(files)} colab files were pushed to minio")
+    return [
+        SyncFileStatsSchema(
+            key=object_key,
+            action=SyncActions.uploaded,
+            size=file_size,
+            bytes_received=0,
+            elapsed_seconds=elapsed_seconds,
+        )
+        for _, file_size, object_key in files
+    ]
+
+
+class SyncPlan(NamedTuple):
+    remote_files: RemoteFiles
+    sync_index: SyncIndex
+    changed_files: List[str]
+    deleted_keys: List[str]
+
+
+@instrumented()
+def plan_colab_output_sync(
+    ssh_client: SSHClient,
+    minio_client: boto3.client,
+    bucket: str,
+    output_prefix: str,
+    transfer_filter: TransferFilter,
+    full_reconcile: bool = False,
+) -> SyncPlan:
+    """Selects colab output files to upload and minio objects to delete.
+
+    Colab files are compared with sync index of output prefix, so output
+    prefix is listed only when index is reconciled. Files and objects which
+    paths don't pass patterns of transfer_filter are neither uploaded nor
+    deleted. Files larger than max_size or modified before newer_than aren't
+    uploaded.
+    :param ssh_client: paramiko ssh client connected to colab session.
+    :param minio_client: boto3 client connected to minio storage.
+    :param bucket: bucket to upload files into.
+    :param output_prefix: prefix of synchronized objects keys.
+    :param transfer_filter: filter of synchronized files.
+    :param full_reconcile: reconcile sync index with listing of output
+    prefix.
+    :return: listed files, sync index, changed files and deleted keys.
+    """
+    with ssh_client.open_sftp() as sftp_session:
+        remote_files = list_colab_output_files(sftp_session, transfer_filter)
+    sync_index = get_sync_index(
+        minio_client, bucket, output_prefix, full_reconcile
+    )
+    synced_files = {
+        file_path: synced_file
+        for file_path, synced_file in sync_index.files.items()
+        if is_path_selected(transfer_filter, file_path)
+    }
+    changed_files = [
+        file_path
+        for file_path, remote_file in remote_files.items()
+        if is_file_selected(
+            transfer_filter,
+            file_path,
+            remote_file.st_size or 0,
+            remote_file.st_mtime or 0,
+        )
+        and (
+            file_path not in synced_files
+            or is_synced_file_outdated(remote_file, synced_files[file_path])
+        )
+    ]
+    deleted_keys = [
+        f"{output_prefix}{file_path}"
+        for file_path in synced_files
+        if file_path not in remote_files
+    ]
+    return SyncPlan(remote_files, sync_index, changed_files, deleted_keys)
+
+
+def get_sync_plan_schema(
+    sync_plan: SyncPlan, output_prefix: str
+) -> TransferPlanSchema:
+    """Builds description of planned synchronization of colab output.
+
+    :param sync_plan: plan returned by plan_colab_output_sync.
+    :param output_prefix: prefix of synchronized objects keys.
+    :return: planned files with total size of uploaded files.
+    """
+    prefix_length = len(output_prefix)
+    planned_files = [
+        PlannedFileSchema(
+            key=f"{output_prefix}{file_path}",
+            action=SyncActions.uploaded,
+            size=sync_plan.remote_files[file_path].st_size or 0,
+        )
+        for file_path in sync_plan.changed_files
+    ]
+    total_bytes = sum(planned_file.size for planned_file in planned_files)
+    planned_files.extend(
+        PlannedFileSchema(
+            key=object_key,
+            action=SyncActions.deleted,
+            size=sync_plan.sync_index.files[object_key[prefix_length:]].size,
+        )
+        for object_key in sync_plan.deleted_keys
+    )
+    return TransferPlanSchema(
+        files_count=len(sync_plan.changed_files),
+        total_bytes=total_bytes,
+        files=planned_files,
+    )
+
+
+@instrumented("sync", COLAB_BACKEND)
+def sync_colab_output_to_minio(
+    ssh_client: SSHClient,
+    minio_client: boto3.client,
+    bucket: str,
+    keys_prefix: str,
+    max_workers: int,
+    transfer_mode: TransferMode,
+    transfer_filter: TransferFilter = EMPTY_FILTER,
+    full_reconcile: bool = False,
+) -> SyncStatsSchema:
+    """Synchronizes colab output directory with minio storage.
+
+    Minio files will be located at <keys_prefix>/output/ directory. New and
+    modified files are streamed from sftp (or exec channels with compression
+    in compressed transfer_mode) directly into (multipart) uploads with md5
+    verified parts by bounded pool of workers or, in presigned transfer_mode,
+    pushed by colab directly to minio. Objects absent on colab
+    are deleted. Files are selected by plan_colab_output_sync. Unfinished
+    multipart uploads of output prefix older than MINIO_UPLOAD_MAX_AGE are
+    aborted. After synchronization sync index is updated with size,
+    modification time and ETag of uploaded files if any object was changed
+    or index was reconciled.
+    :param ssh_client: paramiko ssh client connected to colab session.
+    :param minio_client: boto3 client connected to minio storage.
+    :param bucket: bucket to upload files into.
+    :param keys_prefix: prefix of synchronized objects keys.
+    :param max_workers: maximum number of concurrent uploads.
+    :param transfer_mode: presigned, compressed or sftp (used for other
+    modes).
+    :param transfer_filter: filter of synchronized files.
+    :param full_reconcile: reconcile sync index with listing of output
+    prefix.
+    :return: synchronization statistics with per-file results.
+    """
+    start_time = time.monotonic()
+    started_at = time.time()
+    output_prefix = f"{keys_prefix.strip('/')}/output/"
+    prefix_length = len(output_prefix)
+    (
+        remote_files,
+        sync_index,
+        changed_files,
+        deleted_keys,
+    ) = plan_colab_output_sync(
+        ssh_client,
+        minio_client,
+        bucket,
+        output_prefix,
+        transfer_filter,
+        full_reconcile,
+    )
+    changed_paths = [
+        f"{COLAB_OUTPUT_DIRECTORY}/{file_path}" for file_path in changed_files
+    ]
+    files_chunks = get_colab_chunks(
+        ssh_client, changed_paths, MINIO_MULTIPART_CHUNKSIZE
+    )
+    for remote_path in set(changed_paths) - set(files_chunks):
+        sync_logger.warning(f"File {remote_path} was removed")
+        raise FileIntegrityError(
+            f"File {remote_path} was removed during download"
+        )
+    abort_stale_multipart_uploads(minio_client, bucket, output_prefix)
+    files_stats: List[SyncFileStatsSchema] = []
+    if changed_files and transfer_mode == TransferMode.presigned:
+        pushed_files = [
+            (
+                file_path,
+                remote_files[file_path].st_size or 0,
+                f"{output_prefix}{file_path}",
+            )
+            for file_path in changed_files
+        ]
+        files_stats.extend(
+            push_colab_files_to_minio(
+                ssh_client, minio_client, bucket, pushed_files, max_workers
+            )
+        )
+    elif changed_files:
+        workers_number = min(max_workers, len(changed_files))
+        channels: ContextManager[Any]
+        if transfer_mode == TransferMode.compressed:
+            upload_file = partial(
+                upload_colab_file_to_minio_compressed, minio_client, bucket
+            )
+            channels = nullcontext(ssh_client)
+        else:
+            upload_file = partial(
+                upload_colab_file_to_minio, minio_client, bucket
+            )
+            channels = open_sftp_sessions(ssh_client, workers_number)
+        with channels as channel_source:
+            with ThreadPoolExecutor(max_workers=workers_number) as executor:
+                futures = [
+                    executor.submit(
+                        upload_file,
+                        file_path,
+                        files_chunks[f"{COLAB_OUTPUT_DIRECTORY}/{file_path}"],
+                        f"{output_prefix}{file_path}",
+                        channel_source,
+                    )
+                    for file_path in changed_files
+                ]
+                done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+                for future in not_done:
+                    future.cancel()
+                files_stats.extend(future.result() for future in done)
+    delete_minio_objects(minio_client, bucket, deleted_keys)
+    files_stats.extend(
+        SyncFileStatsSchema(
+            key=object_key,
+            action=SyncActions.deleted,
+            size=sync_index.files[object_key[prefix_length:]].size,
+            bytes_received=0,
+            elapsed_seconds=0.0,
+        )
+        for object_key in deleted_keys
+    )
+    synced_files: Dict[str, Optional[SyncIndexEntry]] = {
+        object_key[prefix_length:]: None for object_key in deleted_keys
+    }
+    for file_path, remote_path in zip(changed_files, changed_paths):
+        synced_files[file_path] = SyncIndexEntry(
+            files_chunks[remote_path].size,
+            remote_files[file_path].st_mtime or 0,
+            get_chunks_etag(files_chunks[remote_path].md5),
+        )
+    is_reconciled = sync_index.reconciled_at >= started_at
+    if synced_files or is_reconciled:
+        update_sync_index(
+            minio_client,
+            bucket,
+            output_prefix,
+            synced_files,
+            sync_index if is_reconciled else None,
+        )
+    sync_logger.info(
+        f"Synchronized {len(changed_files)} colab files to {output_prefix}"
+    )
+    bytes_uploaded = sum(
+        file_stats.size
+        for file_stats in files_stats
+        if file_stats.action == SyncActions.uploaded
+    )
+    elapsed_seconds = time.monotonic() - start_time
+    return SyncStatsSchema(
+        files_uploaded=len(changed_files),
+        files_deleted=len(deleted_keys),
+        files_unchanged=len(remote_files) - len(changed_files),
+        bytes_uploaded=bytes_uploaded,
+        bytes_received=sum(
+            file_stats.bytes_received for file_stats in files_stats
+        ),
+        elapsed_seconds=round(elapsed_seconds, 3),
+        effective_throughput=round(
+            bytes_uploaded / elapsed_seconds if elapsed_seconds else 0.0, 2
+        ),
+        files=files_stats,
+    )
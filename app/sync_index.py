@@ -0,0 +1,237 @@
+import gzip
+import hashlib
+import json
+import time
+from contextlib import closing
+from typing import Dict, List, NamedTuple, Optional
+
+import boto3
+from botocore.exceptions import ClientError
+
+from .concurrency import KeyLocks
+from .constants import SYNC_INDEX_RECONCILE_INTERVAL
+from .logger import get_logger
+from .metrics import instrumented
+from .minio_functions import (
+    FileInfo,
+    get_minio_object,
+    list_minio_prefix_files,
+    put_minio_object,
+)
+
+sync_index_logger = get_logger(__name__)
+
+SYNC_INDEX_VERSION = 1
+
+sync_index_locks = KeyLocks()
+
+
+class SyncIndexEntry(NamedTuple):
+    size: int
+    mtime: float
+    etag: str
+
+
+class SyncIndex(NamedTuple):
+    files: Dict[str, SyncIndexEntry]
+    reconciled_at: float
+
+
+def get_sync_index_key(output_prefix: str) -> str:
+    """Returns key of sync index object stored next to output prefix.
+
+    :param output_prefix: prefix of synchronized objects, e.g. "a/output/".
+    :return: key of index object, e.g. "a/output.index.json.gz".
+    """
+    return f"{output_prefix.rstrip('/')}.index.json.gz"
+
+
+def get_chunks_etag(chunks_md5: List[str]) -> str:
+    """Calculates minio ETag of object uploaded by chunks with chunks_md5.
+
+    Object of single chunk is put with single request, so its ETag is md5
+    of content, ETag of multipart upload is md5 of parts md5 with number of
+    parts.
+    :param chunks_md5: md5 of MINIO_MULTIPART_CHUNKSIZE chunks of object.
+    :return: ETag without quotes.
+    """
+    if len(chunks_md5) <= 1:
+        return chunks_md5[0] if chunks_md5 else hashlib.md5().hexdigest()
+    parts_md5 = b"".join(bytes.fromhex(md5) for md5 in chunks_md5)
+    return f"{hashlib.md5(parts_md5).hexdigest()}-{len(chunks_md5)}"
+
+
+@instrumented()
+def load_sync_index(
+    minio_client: boto3.client, bucket: str, index_key: str
+) -> SyncIndex:
+    """Reads sync index object from minio.
+
+    :param minio_client: boto3 client connected to minio storage.
+    :param bucket: bucket of synchronized objects.
+    :param index_key: key of index object.
+    :return: sync index or None if it doesn't exist or can't be parsed.
+    """
+    try:
+        file_object, _ = get_minio_object(minio_client, bucket, index_key)
+        with closing(file_object):
+            index_data = json.loads(gzip.decompress(file_object.read()))
+    except ClientError as error:
+        if error.response["Error"].get("Code") not in ("NoSuchKey", "404"):
+            raise
+        return None
+    except (OSError, ValueError) as error:
+        sync_index_logger.warning(f"Sync index {index_key} is broken: {error}")
+        return None
+    if index_data.get("version") != SYNC_INDEX_VERSION:
+        return None
+    return SyncIndex(
+        {
+            file_path: SyncIndexEntry(*entry)
+            for file_path, entry in index_data["files"].items()
+        },
+        index_data["reconciled_at"],
+    )
+
+
+@instrumented()
+def save_sync_index(
+    minio_client: boto3.client,
+    bucket: str,
+    index_key: str,
+    sync_index: SyncIndex,
+) -> None:
+    """Replaces sync index object in minio with single put request.
+
+    Readers get either previous or new index, never partially written one.
+    :param minio_client: boto3 client connected to minio storage.
+    :param bucket: bucket of synchronized objects.
+    :param index_key: key of index object.
+    :param sync_index: new sync index.
+    :return: None.
+    """
+    index_data = {
+        "version": SYNC_INDEX_VERSION,
+        "reconciled_at": sync_index.reconciled_at,
+        "files": {
+            file_path: list(entry)
+            for file_path, entry in sorted(sync_index.files.items())
+        },
+    }
+    data = gzip.compress(
+        json.dumps(index_data, separators=(",", ":")).encode()
+    )
+    put_minio_object(minio_client, data, index_key, bucket, verify=True)
+
+
+def update_sync_index(
+    minio_client: boto3.client,
+    bucket: str,
+    output_prefix: str,
+    entries: Dict[str, Optional[SyncIndexEntry]],
+    reconciled_index: SyncIndex = None,
+) -> None:
+    """Applies entries of synchronized files to stored sync index.
+
+    Writers of the same index are serialized and each of them applies only
+    its own entries to the latest stored index, so concurrent syncs and
+    watches don't lose entries of each other. Reconciled index replaces
+    stored one. If index doesn't exist and reconciled_index isn't passed -
+    it isn't created, so it will be reconciled by the next sync.
+    :param minio_client: boto3 client connected to minio storage.
+    :param bucket: bucket of synchronized objects.
+    :param output_prefix: prefix of synchronized objects keys.
+    :param entries: new entries of files paths relative to output prefix,
+    None for deleted objects.
+    :param reconciled_index: index reconciled with listing of output prefix.
+    :return: None.
+    """
+    index_key = get_sync_index_key(output_prefix)
+    with sync_index_locks.hold(f"{bucket}/{index_key}"):
+        sync_index = reconciled_index
+        if sync_index is None:
+            sync_index = load_sync_index(minio_client, bucket, index_key)
+        if sync_index is None:
+            return
+        files = dict(sync_index.files)
+        for file_path, entry in entries.items():
+            if entry is None:
+                files.pop(file_path, None)
+            else:
+                files[file_path] = entry
+        save_sync_index(
+            minio_client,
+            bucket,
+            index_key,
+            SyncIndex(files, sync_index.reconciled_at),
+        )
+
+
+def reconcile_sync_index(
+    sync_index: SyncIndex, minio_objects: FileInfo, output_prefix: str
+) -> SyncIndex:
+    """Builds sync index from full listing of output prefix.
+
+    Entries of previous index are kept for objects with the same size and
+    ETag. Other objects get entries with their size and upload time, entries
+    of missing objects are dropped.
+    :param sync_index: previous sync index or None.
+    :param minio_objects: objects from list_minio_prefix_files.
+    :param output_prefix: prefix of synchronized objects keys.
+    :return: reconciled sync index.
+    """
+    prefix_length = len(output_prefix)
+    previous_files = sync_index.files if sync_index is not None else {}
+    files = {}
+    for file_obj in minio_objects:
+        file_path = file_obj["Key"][prefix_length:]
+        entry = SyncIndexEntry(
+            file_obj["Size"],
+            file_obj["LastModified"].timestamp(),
+            file_obj.get("ETag", "").strip('"'),
+        )
+        previous_entry = previous_files.get(file_path)
+        if (
+            previous_entry is not None
+            and previous_entry.size == entry.size
+            and previous_entry.etag == entry.etag
+        ):
+            entry = previous_entry
+        files[file_path] = entry
+    return SyncIndex(files, time.time())
+
+
+def get_sync_index(
+    minio_client: boto3.client,
+    bucket: str,
+    output_prefix: str,
+    full_reconcile: bool = False,
+) -> SyncIndex:
+    """Returns index of objects synchronized into output prefix.
+
+    Index is read from minio, so colab files are compared with it instead of
+    listing of all objects. If index doesn't exist, was reconciled more than
+    SYNC_INDEX_RECONCILE_INTERVAL seconds ago or full_reconcile requested -
+    output prefix is listed and index is reconciled with it to catch objects
+    changed outside of sync.
+    :param minio_client: boto3 client connected to minio storage.
+    :param bucket: bucket of synchronized objects.
+    :param output_prefix: prefix of synchronized objects keys.
+    :param full_reconcile: reconcile index with listing of output prefix.
+    :return: sync index.
+    """
+    sync_index = load_sync_index(
+        minio_client, bucket, get_sync_index_key(output_prefix)
+    )
+    if (
+        sync_index is not None
+        and not full_reconcile
+        and time.time() - sync_index.reconciled_at
+        < SYNC_INDEX_RECONCILE_INTERVAL
+    ):
+        return sync_index
+    sync_index_logger.info(f"Reconciling sync index of {output_prefix}")
+    minio_objects = list_minio_prefix_files(
+        minio_client, bucket, output_prefix
+    )
+    return reconcile_sync_index(sync_index, minio_objects, output_prefix)
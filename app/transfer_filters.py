@@ -0,0 +1,154 @@
+from datetime import timezone
+from fnmatch import fnmatchcase
+from pathlib import PurePosixPath
+from typing import Any, Dict, List, NamedTuple
+
+from .minio_functions import FileInfo
+from .schemas import DownloadColabSchema
+
+
+class TransferFilter(NamedTuple):
+    include: List[str]
+    exclude: List[str]
+    max_size: int
+    newer_than: float
+
+
+EMPTY_FILTER = TransferFilter([], [], None, None)
+
+
+def get_transfer_filter(transfer_info: DownloadColabSchema) -> TransferFilter:
+    """Builds filter of transferred files from transfer options.
+
+    Timezone naive newer_than is considered to be in UTC.
+    :param transfer_info: transfer options with filter fields.
+    :return: transfer filter.
+    """
+    newer_than = None
+    if transfer_info.newer_than is not None:
+        modified = transfer_info.newer_than
+        if modified.tzinfo is None:
+            modified = modified.replace(tzinfo=timezone.utc)
+        newer_than = modified.timestamp()
+    return TransferFilter(
+        transfer_info.include or [],
+        transfer_info.exclude or [],
+        transfer_info.max_size,
+        newer_than,
+    )
+
+
+def match_patterns(path: str, patterns: List[str]) -> bool:
+    """Checks if path or any of its parent directories matches glob patterns.
+
+    Patterns without "/" are also matched against names, so "*.ckpt" matches
+    files in all directories and "checkpoints" matches all files of
+    "checkpoints" directories.
+    :param path: path relative to transferred directory or prefix.
+    :param patterns: glob patterns.
+    :return: True if path matches.
+    """
+    paths = [PurePosixPath(path), *list(PurePosixPath(path).parents)[:-1]]
+    return any(
+        fnmatchcase(matched_path.as_posix(), pattern)
+        or ("/" not in pattern and fnmatchcase(matched_path.name, pattern))
+        for matched_path in paths
+        for pattern in patterns
+    )
+
+
+def is_directory_excluded(
+    transfer_filter: TransferFilter, directory: str
+) -> bool:
+    """Checks if all files of directory are excluded by transfer filter.
+
+    Excluded directories aren't listed, e.g. by "checkpoints" or
+    "checkpoints/*" patterns.
+    :param transfer_filter: transfer filter.
+    :param directory: path of directory relative to transferred directory.
+    :return: True if directory shouldn't be listed.
+    """
+    return match_patterns(directory, transfer_filter.exclude) or any(
+        fnmatchcase(f"{directory}/", pattern)
+        for pattern in transfer_filter.exclude
+    )
+
+
+def is_path_selected(transfer_filter: TransferFilter, path: str) -> bool:
+    """Checks if path passes include and exclude patterns of filter.
+
+    Path is selected if it matches any include pattern (or include patterns
+    are empty) and doesn't match exclude patterns.
+    :param transfer_filter: transfer filter.
+    :param path: path relative to transferred directory or prefix.
+    :return: True if path is selected.
+    """
+    if transfer_filter.include and not match_patterns(
+        path, transfer_filter.include
+    ):
+        return False
+    return not match_patterns(path, transfer_filter.exclude)
+
+
+def is_file_selected(
+    transfer_filter: TransferFilter, path: str, size: int, modified: float
+) -> bool:
+    """Checks if file passes transfer filter.
+
+    File is selected if its path is selected, it isn't larger than max_size
+    and was modified after newer_than.
+    :param transfer_filter: transfer filter.
+    :param path: path relative to transferred directory or prefix.
+    :param size: size of file in bytes.
+    :param modified: timestamp of file modification.
+    :return: True if file should be transferred.
+    """
+    if not is_path_selected(transfer_filter, path):
+        return False
+    if (
+        transfer_filter.max_size is not None
+        and size > transfer_filter.max_size
+    ):
+        return False
+    return transfer_filter.newer_than is None or modified > (
+        transfer_filter.newer_than
+    )
+
+
+def is_minio_file_selected(
+    transfer_filter: TransferFilter, file_obj: Dict[str, Any], keys_prefix: str
+) -> bool:
+    """Checks if minio object passes transfer filter.
+
+    :param transfer_filter: transfer filter.
+    :param file_obj: object properties from list_minio_prefix_files.
+    :param keys_prefix: prefix of listed objects keys.
+    :return: True if object should be transferred.
+    """
+    prefix_length = len(keys_prefix)
+    return is_file_selected(
+        transfer_filter,
+        file_obj["Key"][prefix_length:],
+        file_obj["Size"],
+        file_obj["LastModified"].timestamp(),
+    )
+
+
+def filter_minio_paths(
+    files: FileInfo, keys_prefix: str, transfer_filter: TransferFilter
+) -> FileInfo:
+    """Selects minio objects which keys pass patterns of transfer filter.
+
+    Patterns are matched against keys relative to keys_prefix. Objects that
+    don't pass patterns are neither transferred nor deleted by sync.
+    :param files: minio objects properties from list_minio_prefix_files.
+    :param keys_prefix: prefix of listed objects keys.
+    :param transfer_filter: transfer filter.
+    :return: selected objects properties.
+    """
+    prefix_length = len(keys_prefix)
+    return [
+        file_obj
+        for file_obj in files
+        if is_path_selected(transfer_filter, file_obj["Key"][prefix_length:])
+    ]
@@ -0,0 +1,400 @@
+import json
+import select
+from collections import OrderedDict
+from datetime import datetime, timezone
+from queue import Queue
+from threading import Event, Lock, Thread
+from typing import Any, Dict, Iterator, Optional
+from uuid import uuid4
+
+import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+from paramiko import Channel, SFTPClient, SSHException
+
+from .colab_functions import (
+    RemoteChunks,
+    open_sftp_sessions,
+    start_colab_script,
+)
+from .concurrency import get_host_key
+from .constants import (
+    COLAB_OUTPUT_DIRECTORY,
+    COLAB_TRANSFER_ATTEMPTS,
+    COLAB_WATCH_INTERVAL,
+    MINIO_MULTIPART_CHUNKSIZE,
+    WATCH_RETENTION,
+)
+from .errors import (
+    FileIntegrityError,
+    JobNotFound,
+    NoSuchBucket,
+    ObjectsDeleteError,
+    WatchNotFound,
+)
+from .jobs import CHANNEL_READ_SIZE, job_supervisor
+from .logger import SAMPLED, get_logger
+from .metrics import record_transfer
+from .minio_functions import delete_minio_objects
+from .remote_scripts import WATCH_SCRIPT
+from .schemas import (
+    JobStates,
+    TransferMode,
+    WatchColabSchema,
+    WatchSchema,
+    WatchStates,
+)
+from .ssh_pool import SSHLease, ssh_pool
+from .sync_functions import (
+    sync_colab_output_to_minio,
+    upload_colab_file_to_minio,
+)
+from .sync_index import SyncIndexEntry, get_chunks_etag, update_sync_index
+
+watches_logger = get_logger(__name__)
+
+
+class WatchSession:
+    """Long-running synchronization of colab output directory with minio."""
+
+    def __init__(
+        self,
+        watch_id: str,
+        watch_info: WatchColabSchema,
+        minio_client: boto3.client,
+        bucket: str,
+    ):
+        self.watch_id = watch_id
+        self.watch_info = watch_info
+        self.minio_client = minio_client
+        self.bucket = bucket
+        self.output_prefix = f"{watch_info.keys_prefix.strip('/')}/output/"
+        self.state = WatchStates.running
+        self.started_at = datetime.now(timezone.utc)
+        self.finished_at: datetime = None
+        self.files_uploaded = 0
+        self.files_deleted = 0
+        self.files_failed = 0
+        self.bytes_uploaded = 0
+        self.failed_attempts: Dict[str, int] = {}
+        self.index_entries: Dict[str, Optional[SyncIndexEntry]] = {}
+        self.error: str = None
+        self.stop_requested = Event()
+
+    def to_schema(self) -> WatchSchema:
+        return WatchSchema(
+            watch_id=self.watch_id,
+            host=self.watch_info.host,
+            output_prefix=self.output_prefix,
+            job_id=self.watch_info.job_id,
+            state=self.state,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            files_uploaded=self.files_uploaded,
+            files_deleted=self.files_deleted,
+            files_failed=self.files_failed,
+            bytes_uploaded=self.bytes_uploaded,
+            error=self.error,
+        )
+
+
+class WatchSupervisor:
+    """Runs watch sessions in background threads.
+
+    Every session runs remote WATCH_SCRIPT that scans colab output directory
+    on colab side and reports only files that were changed and weren't
+    modified for debounce seconds. Session synchronizes directory once after
+    remote script is started and then uploads or deletes objects of reported
+    files. Their sync index entries are buffered and saved once per batch of
+    reported files, when remote script is idle for poll_interval seconds,
+    and when session finishes. File that failed to
+    upload (e.g. because it was still written) is reported by remote script
+    again, after COLAB_TRANSFER_ATTEMPTS failures or if remote script is
+    already stopping - whole directory is synchronized once more before
+    session finishes. When session is stopped or watched job finishes -
+    remote script reports pending changes and exits. Watches don't pass
+    transfer scheduler: they are long-running and hold only one sftp session
+    of their own ssh lease. Only retention latest finished sessions are kept.
+    """
+
+    def __init__(self, poll_interval: float, retention: int):
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._watches: "OrderedDict[str, WatchSession]" = OrderedDict()
+        self._lock = Lock()
+
+    def start_watch(
+        self,
+        watch_info: WatchColabSchema,
+        minio_client: boto3.client,
+        bucket: str,
+    ) -> WatchSession:
+        """Starts watch session of colab output directory.
+
+        If watch_info contains job_id of unknown job - raises JobNotFound.
+        :param watch_info: credentials and watch options.
+        :param minio_client: boto3 client connected to minio storage.
+        :param bucket: bucket to upload files into.
+        :return: started watch session.
+        """
+        if watch_info.job_id is not None:
+            job_supervisor.get_job(watch_info.job_id)
+        watch = WatchSession(uuid4().hex, watch_info, minio_client, bucket)
+        with self._lock:
+            self._watches[watch.watch_id] = watch
+        Thread(target=self._run, args=(watch,), daemon=True).start()
+        watches_logger.info(
+            f"Watch {watch.watch_id} started for {watch.output_prefix}"
+        )
+        return watch
+
+    def get_watch(self, watch_id: str) -> WatchSession:
+        """Returns watch with watch_id or raises WatchNotFound exception.
+
+        :param watch_id: id of watch session.
+        :return: watch session.
+        """
+        with self._lock:
+            watch = self._watches.get(watch_id)
+        if watch is None:
+            raise WatchNotFound(f"Watch {watch_id} doesn't exist")
+        return watch
+
+    def stop_watch(self, watch_id: str) -> WatchSession:
+        """Requests watch session to upload pending changes and stop.
+
+        :param watch_id: id of watch session.
+        :return: watch session.
+        """
+        watch = self.get_watch(watch_id)
+        watch.stop_requested.set()
+        if watch.state == WatchStates.running:
+            watch.state = WatchStates.stopping
+        return watch
+
+    def stop(self) -> None:
+        """Requests all watch sessions to stop.
+
+        :return: None.
+        """
+        with self._lock:
+            for watch in self._watches.values():
+                watch.stop_requested.set()
+
+    def _run(self, watch: WatchSession) -> None:
+        state, error = WatchStates.failed, None
+        try:
+            ssh_lease = ssh_pool.acquire(watch.watch_info, 2)
+            try:
+                self._watch(watch, ssh_lease)
+            finally:
+                ssh_pool.release(ssh_lease)
+            state = WatchStates.finished
+        except (
+            SSHException,
+            OSError,
+            EOFError,
+            ValueError,
+            FileIntegrityError,
+            ClientError,
+            BotoCoreError,
+            NoSuchBucket,
+            ObjectsDeleteError,
+        ) as watch_error:
+            watches_logger.warning(
+                f"Watch {watch.watch_id} error: {watch_error}"
+            )
+            error = str(watch_error)
+        except Exception as watch_error:
+            watches_logger.exception(
+                f"Watch {watch.watch_id} unexpected error: {watch_error}"
+            )
+            error = str(watch_error)
+        finally:
+            self._finish_watch(watch, state, error)
+
+    def _watch(self, watch: WatchSession, ssh_lease: SSHLease) -> None:
+        channel = start_colab_script(
+            ssh_lease.ssh_client,
+            WATCH_SCRIPT,
+            [
+                COLAB_OUTPUT_DIRECTORY,
+                str(self.poll_interval),
+                str(watch.watch_info.debounce_seconds),
+                str(MINIO_MULTIPART_CHUNKSIZE),
+            ],
+        )
+        try:
+            lines = self._read_lines(watch, channel)
+            if next(lines, None) != "ready":
+                raise SSHException("Colab watch script wasn't started")
+            self._sync_output(watch, ssh_lease)
+            try:
+                with open_sftp_sessions(ssh_lease.ssh_client, 1) as sessions:
+                    for line in lines:
+                        self._apply_event(
+                            watch, json.loads(line), sessions, channel
+                        )
+            finally:
+                self._flush_index(watch)
+            if channel.recv_exit_status() != 0:
+                error = channel.makefile_stderr("rb").read().decode().strip()
+                raise SSHException(f"Colab watch script failed: {error}")
+        finally:
+            channel.close()
+        if watch.failed_attempts:
+            watches_logger.info(
+                f"Synchronizing {len(watch.failed_attempts)} failed files"
+            )
+            self._sync_output(watch, ssh_lease)
+            watch.failed_attempts.clear()
+
+    @staticmethod
+    def _sync_output(watch: WatchSession, ssh_lease: SSHLease) -> None:
+        attempt = 1
+        while True:
+            try:
+                stats = sync_colab_output_to_minio(
+                    ssh_lease.ssh_client,
+                    watch.minio_client,
+                    watch.bucket,
+                    watch.watch_info.keys_prefix,
+                    1,
+                    TransferMode.sftp,
+                )
+                break
+            except FileIntegrityError as error:
+                if attempt >= COLAB_TRANSFER_ATTEMPTS:
+                    raise
+                watches_logger.info(f"Output is still written: {error}")
+                attempt += 1
+        watch.files_uploaded += stats.files_uploaded
+        watch.files_deleted += stats.files_deleted
+        watch.bytes_uploaded += stats.bytes_uploaded
+        record_transfer(
+            "colab_to_minio",
+            watch.bucket,
+            get_host_key(watch.watch_info.host, watch.watch_info.port),
+            stats.bytes_uploaded,
+        )
+
+    def _read_lines(
+        self, watch: WatchSession, channel: Channel
+    ) -> Iterator[str]:
+        buffer = b""
+        is_stopping = False
+        while True:
+            if not is_stopping and self._should_stop(watch):
+                channel.shutdown_write()
+                is_stopping = True
+            if not select.select([channel], [], [], self.poll_interval)[0]:
+                self._flush_index(watch)
+                continue
+            data = channel.recv(CHANNEL_READ_SIZE)
+            if not data:
+                return
+            *lines, buffer = (buffer + data).split(b"\n")
+            for line in lines:
+                yield line.decode()
+
+    @staticmethod
+    def _flush_index(watch: WatchSession) -> None:
+        if not watch.index_entries:
+            return
+        update_sync_index(
+            watch.minio_client,
+            watch.bucket,
+            watch.output_prefix,
+            watch.index_entries,
+        )
+        watch.index_entries = {}
+
+    @staticmethod
+    def _should_stop(watch: WatchSession) -> bool:
+        if watch.stop_requested.is_set():
+            return True
+        if watch.watch_info.job_id is None:
+            return False
+        try:
+            job = job_supervisor.get_job(watch.watch_info.job_id)
+        except JobNotFound:
+            return True
+        return job.state != JobStates.running
+
+    @staticmethod
+    def _requeue_event(
+        watch: WatchSession, file_path: str, channel: Channel
+    ) -> None:
+        attempts = watch.failed_attempts.get(file_path, 0) + 1
+        watch.failed_attempts[file_path] = attempts
+        watch.files_failed += 1
+        if attempts >= COLAB_TRANSFER_ATTEMPTS or channel.eof_sent:
+            watches_logger.warning(
+                f"File {file_path} will be synchronized on watch finish"
+            )
+            return
+        channel.sendall(json.dumps(file_path).encode() + b"\n")
+
+    @classmethod
+    def _apply_event(
+        cls,
+        watch: WatchSession,
+        event: Dict[str, Any],
+        sessions: "Queue[SFTPClient]",
+        channel: Channel,
+    ) -> None:
+        object_key = f"{watch.output_prefix}{event['path']}"
+        if event["size"] is None:
+            delete_minio_objects(
+                watch.minio_client, watch.bucket, [object_key]
+            )
+            watch.index_entries[event["path"]] = None
+            watch.files_deleted += 1
+            watch.failed_attempts.pop(event["path"], None)
+            return
+        try:
+            file_stats = upload_colab_file_to_minio(
+                watch.minio_client,
+                watch.bucket,
+                event["path"],
+                RemoteChunks(event["size"], event["md5"]),
+                object_key,
+                sessions,
+            )
+        except (FileIntegrityError, FileNotFoundError) as error:
+            watches_logger.info(
+                f"Watched file is still written: {error}", extra=SAMPLED
+            )
+            cls._requeue_event(watch, event["path"], channel)
+            return
+        watch.index_entries[event["path"]] = SyncIndexEntry(
+            event["size"], event["mtime"], get_chunks_etag(event["md5"])
+        )
+        watch.files_uploaded += 1
+        watch.bytes_uploaded += file_stats.size
+        watch.failed_attempts.pop(event["path"], None)
+        record_transfer(
+            "colab_to_minio",
+            watch.bucket,
+            get_host_key(watch.watch_info.host, watch.watch_info.port),
+            file_stats.size,
+        )
+
+    def _finish_watch(
+        self, watch: WatchSession, state: WatchStates, error: str
+    ) -> None:
+        watch.state = state
+        watch.error = error
+        watch.finished_at = datetime.now(timezone.utc)
+        watches_logger.info(f"Watch {watch.watch_id} {state.value}")
+        with self._lock:
+            finished_watches = [
+                watch_id
+                for watch_id, tracked_watch in self._watches.items()
+                if tracked_watch.state
+                in (WatchStates.finished, WatchStates.failed)
+            ]
+            for watch_id in finished_watches[: -self.retention or None]:
+                del self._watches[watch_id]
+
+
+watch_supervisor = WatchSupervisor(COLAB_WATCH_INTERVAL, WATCH_RETENTION)
@@ -0,0 +1,139 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+BENCHMARK_USER = "root"
+BENCHMARK_PASSWORD = "benchmark"
+
+
+def parse_arguments(arguments: List[str]) -> argparse.Namespace:
+    """Parses command line arguments of benchmark suite.
+
+    :param arguments: command line arguments.
+    :return: parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Benchmarks transfer and sync paths against local "
+        "stand-ins of minio and colab.",
+    )
+    parser.add_argument("-n", "--iterations", type=int, default=5)
+    parser.add_argument(
+        "-s",
+        "--scenario",
+        action="append",
+        help="scenario to run, may be repeated (default: all scenarios)",
+    )
+    parser.add_argument("-o", "--output", help="path of json results file")
+    parser.add_argument("--bucket", default="benchmarks")
+    parser.add_argument(
+        "--moto",
+        action="store_true",
+        help="run in-process moto server instead of S3_ENDPOINT_URL",
+    )
+    parser.add_argument("--list", action="store_true", help="list scenarios")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    return parser.parse_args(arguments)
+
+
+def start_moto_server() -> None:
+    """Starts in-process moto s3 server and points application to it.
+
+    Must be called before application modules are imported, because minio
+    settings are read from environment on import.
+    :return: None.
+    """
+    from moto.server import ThreadedMotoServer
+
+    with socket.socket() as port_socket:
+        port_socket.bind(("127.0.0.1", 0))
+        port = port_socket.getsockname()[1]
+    ThreadedMotoServer(port=port, verbose=False).start()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    os.environ.update(
+        S3_ENDPOINT_URL=f"http://127.0.0.1:{port}",
+        AWS_ACCESS_KEY_ID="benchmark",
+        AWS_SECRET_ACCESS_KEY="benchmark",
+        AWS_DEFAULT_REGION="us-east-1",
+    )
+
+
+def get_git_commit() -> str:
+    """Returns commit of working tree or None outside of git repository.
+
+    :return: commit hash.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(arguments: List[str]) -> None:
+    options = parse_arguments(arguments)
+    if options.moto:
+        start_moto_server()
+    from app.ssh_pool import ssh_pool
+
+    from .local_colab import LocalColab
+    from .scenarios import SCENARIOS, create_benchmark_context
+
+    if options.list:
+        print("\n".join(SCENARIOS))
+        return
+    unknown_scenarios = set(options.scenario or []) - set(SCENARIOS)
+    if unknown_scenarios:
+        sys.exit(f"Unknown scenarios: {', '.join(sorted(unknown_scenarios))}")
+    if not options.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    results: Dict[str, Any] = {
+        "commit": get_git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "iterations": options.iterations,
+        "scenarios": {},
+    }
+    with tempfile.TemporaryDirectory() as colab_root:
+        colab = LocalColab(colab_root, BENCHMARK_USER, BENCHMARK_PASSWORD)
+        context = create_benchmark_context(options.bucket, colab)
+        try:
+            for name in options.scenario or SCENARIOS:
+                metrics = SCENARIOS[name](context, options.iterations)
+                results["scenarios"][name] = metrics
+                print(
+                    f"{name:<36} "
+                    f"p50 {metrics['latency_p50_seconds']:>8.3f}s "
+                    f"p99 {metrics['latency_p99_seconds']:>8.3f}s "
+                    f"{metrics['throughput_bytes_per_second'] / 2**20:>8.2f}"
+                    f" MiB/s "
+                    f"rss {metrics['peak_rss_bytes'] / 2**20:>7.1f} MiB",
+                    file=sys.stderr,
+                )
+        finally:
+            ssh_pool.close_all()
+            colab.close()
+    results_json = json.dumps(results, indent=2)
+    if options.output:
+        os.makedirs(os.path.dirname(options.output) or ".", exist_ok=True)
+        with open(options.output, "w") as output_file:
+            output_file.write(results_json + "\n")
+    else:
+        print(results_json)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
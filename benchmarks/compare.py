@@ -0,0 +1,71 @@
+import argparse
+import json
+import sys
+from typing import Any, Dict, List
+
+# Metrics where larger value is a regression.
+LOWER_IS_BETTER = (
+    "latency_p50_seconds",
+    "latency_p99_seconds",
+    "peak_rss_bytes",
+)
+HIGHER_IS_BETTER = ("throughput_bytes_per_second",)
+
+
+def compare_results(
+    baseline: Dict[str, Any], candidate: Dict[str, Any], threshold: float
+) -> List[str]:
+    """Prints relative change of candidate metrics and returns regressions.
+
+    Only scenarios present in both results are compared.
+    :param baseline: results of benchmarks run on base commit.
+    :param candidate: results of benchmarks run on compared commit.
+    :param threshold: relative change that is considered a regression.
+    :return: descriptions of regressed metrics.
+    """
+    regressions = []
+    print(
+        f"{baseline.get('commit')} -> {candidate.get('commit')}",
+        file=sys.stderr,
+    )
+    for name, base_metrics in baseline["scenarios"].items():
+        metrics = candidate["scenarios"].get(name)
+        if metrics is None:
+            continue
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            if not base_metrics[metric]:
+                continue
+            change = metrics[metric] / base_metrics[metric] - 1
+            if metric in HIGHER_IS_BETTER:
+                change = -change
+            is_regression = change > threshold
+            print(
+                f"{name:<36} {metric:<30} {change:>+8.1%}"
+                f"{'  REGRESSION' if is_regression else ''}",
+                file=sys.stderr,
+            )
+            if is_regression:
+                regressions.append(f"{name} {metric} {change:+.1%}")
+    return regressions
+
+
+def main(arguments: List[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.compare",
+        description="Compares results of two benchmark runs, exits with "
+        "status 1 if any metric regressed more than threshold.",
+    )
+    parser.add_argument("baseline", help="json results of base commit")
+    parser.add_argument("candidate", help="json results of compared commit")
+    parser.add_argument("-t", "--threshold", type=float, default=0.1)
+    options = parser.parse_args(arguments)
+    with open(options.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    with open(options.candidate) as candidate_file:
+        candidate = json.load(candidate_file)
+    if compare_results(baseline, candidate, options.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,280 @@
+import os
+import socket
+import subprocess
+import threading
+from typing import IO, Any, List, Union
+
+import paramiko
+from paramiko import (
+    Channel,
+    SFTPAttributes,
+    SFTPHandle,
+    SFTPServer,
+    SFTPServerInterface,
+)
+from paramiko.common import AUTH_FAILED, AUTH_SUCCESSFUL, OPEN_SUCCEEDED
+from paramiko.sftp import SFTP_OK
+
+REMOTE_ROOT = "/content"
+READ_SIZE = 65536
+
+SFTPResult = Union[SFTPAttributes, int]
+
+
+def convert_os_error(error: OSError) -> int:
+    """Returns sftp status code of os error.
+
+    :param error: raised os error.
+    :return: sftp status code.
+    """
+    status: int = SFTPServer.convert_errno(error.errno)
+    return status
+
+
+class LocalFileHandle(SFTPHandle):
+    """Sftp handle of opened local file."""
+
+    def __init__(self, file_obj: IO[bytes], flags: int):
+        super().__init__(flags)
+        self.filename = file_obj.name
+        self.readfile = file_obj
+        self.writefile = file_obj
+
+    def stat(self) -> SFTPResult:
+        try:
+            return SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+        except OSError as error:
+            return convert_os_error(error)
+
+    def chattr(self, attr: SFTPAttributes) -> int:
+        if attr.st_size is not None:
+            self.writefile.truncate(attr.st_size)
+        return SFTP_OK
+
+
+class LocalColab:
+    """In-process ssh and sftp server that stands in for colab session.
+
+    Remote "/content" directory is mapped into local root directory: sftp
+    paths are translated and "/content" in executed commands (and json
+    passed through their stdin and stdout) is replaced with local path, so
+    remote scripts of application run as on colab.
+    """
+
+    def __init__(self, root: str, user: str, password: str):
+        self.root = root
+        self.user = user
+        self.password = password
+        self.connections = 0
+        self._host_key = paramiko.RSAKey.generate(2048)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(("127.0.0.1", 0))
+        self._socket.listen(100)
+        self.port: int = self._socket.getsockname()[1]
+        os.makedirs(self.local_path(REMOTE_ROOT), exist_ok=True)
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def local_path(self, path: str) -> str:
+        """Returns local path of remote path.
+
+        :param path: absolute path on colab.
+        :return: local path.
+        """
+        if path.startswith(REMOTE_ROOT):
+            return self.root + path
+        return path
+
+    def close(self) -> None:
+        """Stops accepting new connections.
+
+        :return: None.
+        """
+        self._socket.close()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                client, _ = self._socket.accept()
+            except OSError:
+                return
+            threading.Thread(
+                target=self._serve, args=(client,), daemon=True
+            ).start()
+
+    def _serve(self, client: socket.socket) -> None:
+        self.connections += 1
+        transport = paramiko.Transport(client)
+        transport.add_server_key(self._host_key)
+        transport.set_subsystem_handler(
+            "sftp", SFTPServer, _LocalSFTPServer, self
+        )
+        transport.start_server(server=_LocalSSHServer(self))
+
+    def execute(self, channel: Channel, command: str) -> None:
+        """Runs command locally passing its streams through channel.
+
+        :param channel: paramiko channel of exec request.
+        :param command: shell command from exec request.
+        :return: None.
+        """
+        remote_root = REMOTE_ROOT.encode()
+        local_root = self.local_path(REMOTE_ROOT).encode()
+        process = subprocess.Popen(
+            command.replace(REMOTE_ROOT, self.local_path(REMOTE_ROOT)),
+            shell=True,
+            executable="/bin/bash",
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        is_json = "json.load(sys.stdin)" in command
+
+        def pass_stdin() -> None:
+            for data in iter(lambda: channel.recv(READ_SIZE), b""):
+                if is_json:
+                    data = data.replace(b'"' + remote_root, b'"' + local_root)
+                try:
+                    process.stdin.write(data)
+                except BrokenPipeError:
+                    break
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+        def pass_stderr() -> None:
+            for data in iter(
+                lambda: process.stderr.read1(READ_SIZE), b""  # type: ignore
+            ):
+                channel.sendall_stderr(data)
+
+        threads: List[threading.Thread] = [
+            threading.Thread(target=pass_stdin, daemon=True),
+            threading.Thread(target=pass_stderr, daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        for data in iter(
+            lambda: process.stdout.read1(READ_SIZE), b""  # type: ignore
+        ):
+            if is_json:
+                data = data.replace(local_root, remote_root)
+            channel.sendall(data)
+        threads[1].join()
+        channel.send_exit_status(process.wait())
+        channel.shutdown_write()
+        channel.close()
+
+
+class _LocalSSHServer(paramiko.ServerInterface):
+    def __init__(self, colab: LocalColab):
+        self.colab = colab
+
+    def check_auth_password(self, username: str, password: str) -> int:
+        if (username, password) == (self.colab.user, self.colab.password):
+            return AUTH_SUCCESSFUL
+        return AUTH_FAILED
+
+    def get_allowed_auths(self, username: str) -> str:
+        return "password"
+
+    def check_channel_request(self, kind: str, chanid: int) -> int:
+        return OPEN_SUCCEEDED
+
+    def check_channel_exec_request(
+        self, channel: Channel, command: bytes
+    ) -> bool:
+        threading.Thread(
+            target=self.colab.execute,
+            args=(channel, command.decode()),
+            daemon=True,
+        ).start()
+        return True
+
+
+class _LocalSFTPServer(SFTPServerInterface):
+    def __init__(self, server: Any, colab: LocalColab):
+        super().__init__(server)
+        self.colab = colab
+
+    def _path(self, path: str) -> str:
+        return self.colab.local_path(self.canonicalize(path))
+
+    def list_folder(self, path: str) -> Union[List[SFTPAttributes], int]:
+        local_path = self._path(path)
+        try:
+            entries = []
+            for name in os.listdir(local_path):
+                entry = SFTPAttributes.from_stat(
+                    os.lstat(os.path.join(local_path, name)), name
+                )
+                entries.append(entry)
+            return entries
+        except OSError as error:
+            return convert_os_error(error)
+
+    def stat(self, path: str) -> SFTPResult:
+        try:
+            return SFTPAttributes.from_stat(os.stat(self._path(path)))
+        except OSError as error:
+            return convert_os_error(error)
+
+    def lstat(self, path: str) -> SFTPResult:
+        try:
+            return SFTPAttributes.from_stat(os.lstat(self._path(path)))
+        except OSError as error:
+            return convert_os_error(error)
+
+    def open(
+        self, path: str, flags: int, attr: SFTPAttributes
+    ) -> Union[SFTPHandle, int]:
+        try:
+            descriptor = os.open(self._path(path), flags, 0o666)
+        except OSError as error:
+            return convert_os_error(error)
+        mode = "rb"
+        if flags & os.O_WRONLY:
+            mode = "ab" if flags & os.O_APPEND else "wb"
+        elif flags & os.O_RDWR:
+            mode = "a+b" if flags & os.O_APPEND else "r+b"
+        return LocalFileHandle(os.fdopen(descriptor, mode), flags)
+
+    def remove(self, path: str) -> int:
+        try:
+            os.remove(self._path(path))
+        except OSError as error:
+            return convert_os_error(error)
+        return SFTP_OK
+
+    def rename(self, oldpath: str, newpath: str) -> int:
+        try:
+            os.replace(self._path(oldpath), self._path(newpath))
+        except OSError as error:
+            return convert_os_error(error)
+        return SFTP_OK
+
+    def posix_rename(self, oldpath: str, newpath: str) -> int:
+        return self.rename(oldpath, newpath)
+
+    def mkdir(self, path: str, attr: SFTPAttributes) -> int:
+        try:
+            os.mkdir(self._path(path))
+        except OSError as error:
+            return convert_os_error(error)
+        return SFTP_OK
+
+    def rmdir(self, path: str) -> int:
+        try:
+            os.rmdir(self._path(path))
+        except OSError as error:
+            return convert_os_error(error)
+        return SFTP_OK
+
+    def chattr(self, path: str, attr: SFTPAttributes) -> int:
+        if attr.st_size is not None:
+            try:
+                os.truncate(self._path(path), attr.st_size)
+            except OSError as error:
+                return convert_os_error(error)
+        return SFTP_OK
@@ -0,0 +1,93 @@
+import math
+import os
+import resource
+import sys
+from threading import Event, Thread
+from typing import Any, Dict, List
+
+RSS_SAMPLE_INTERVAL = 0.01
+
+
+def get_current_rss() -> int:
+    """Returns resident set size of current process in bytes.
+
+    Reads /proc/self/statm where it exists, on other platforms returns peak
+    resident set size of process from getrusage.
+    :return: resident set size in bytes.
+    """
+    try:
+        with open("/proc/self/statm") as statm_file:
+            resident_pages = int(statm_file.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class PeakRSSSampler:
+    """Samples resident set size in background thread and keeps its peak."""
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak_rss = 0
+        self._stopped = Event()
+        self._thread = Thread(target=self._sample, daemon=True)
+
+    def __enter__(self) -> "PeakRSSSampler":
+        self.peak_rss = get_current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self._stopped.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, get_current_rss())
+
+    def _sample(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, get_current_rss())
+
+
+def get_percentile(values: List[float], percentile: float) -> float:
+    """Returns nearest-rank percentile of values.
+
+    :param values: measured values.
+    :param percentile: percentile in range (0, 100].
+    :return: percentile value.
+    """
+    ordered_values = sorted(values)
+    rank = math.ceil(percentile / 100 * len(ordered_values))
+    return ordered_values[max(rank, 1) - 1]
+
+
+def summarize_scenario(
+    latencies: List[float],
+    bytes_per_iteration: int,
+    files_per_iteration: int,
+    peak_rss: int,
+) -> Dict[str, Any]:
+    """Returns machine-readable metrics of measured scenario.
+
+    :param latencies: duration of every iteration in seconds.
+    :param bytes_per_iteration: number of bytes moved by one iteration.
+    :param files_per_iteration: number of files moved by one iteration.
+    :param peak_rss: peak resident set size during scenario in bytes.
+    :return: dict with scenario metrics.
+    """
+    total_seconds = sum(latencies)
+    iterations = len(latencies)
+    return {
+        "iterations": iterations,
+        "bytes_per_iteration": bytes_per_iteration,
+        "files_per_iteration": files_per_iteration,
+        "latency_p50_seconds": round(get_percentile(latencies, 50), 6),
+        "latency_p99_seconds": round(get_percentile(latencies, 99), 6),
+        "latency_mean_seconds": round(total_seconds / iterations, 6),
+        "throughput_bytes_per_second": round(
+            bytes_per_iteration * iterations / total_seconds, 1
+        ),
+        "throughput_files_per_second": round(
+            files_per_iteration * iterations / total_seconds, 3
+        ),
+        "peak_rss_bytes": peak_rss,
+    }
@@ -0,0 +1,352 @@
+import io
+import os
+import shutil
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+import boto3
+from botocore.exceptions import ClientError
+
+from app.colab_functions import (
+    get_transfer_channels,
+    run_colab_transfer,
+    transfer_files_to_colab,
+)
+from app.constants import (
+    COLAB_CAS_DIRECTORY,
+    COLAB_OUTPUT_DIRECTORY,
+    COLAB_UPLOAD_DIRECTORY,
+)
+from app.minio_functions import (
+    clear_minio_prefix,
+    create_minio_client,
+    get_minio_client,
+    get_transfer_config,
+    list_minio_prefix_files,
+    upload_files_to_minio,
+)
+from app.schemas import (
+    DownloadColabSchema,
+    SyncStatsSchema,
+    TransferMode,
+    TransferStatsSchema,
+    UploadColabSchema,
+)
+from app.ssh_pool import SSHLease, ssh_pool
+from app.sync_functions import sync_colab_output_to_minio
+
+from .local_colab import LocalColab
+from .metrics import PeakRSSSampler, summarize_scenario
+
+KEYS_PREFIX = "benchmarks"
+SMALL_FILES = [16 * 1024] * 200
+LARGE_FILES = [24 * 1024 * 1024] * 3
+SYNC_FILES = [64 * 1024] * 100 + [24 * 1024 * 1024] * 2
+SYNC_SMALL_DELTA = 2
+OLD_MTIME = 1
+
+Results = Dict[str, Any]
+
+
+class BenchmarkContext(NamedTuple):
+    minio_client: boto3.client
+    bucket: str
+    colab: LocalColab
+    credentials: Dict[str, Any]
+
+
+ScenarioRun = Callable[[BenchmarkContext, int], Results]
+
+
+def create_benchmark_context(
+    bucket: str, colab: LocalColab
+) -> BenchmarkContext:
+    """Creates bucket if it doesn't exist and returns benchmark context.
+
+    :param bucket: bucket that is used by benchmarks.
+    :param colab: local stand-in of colab session.
+    :return: benchmark context.
+    """
+    try:
+        create_minio_client().head_bucket(Bucket=bucket)
+    except ClientError:
+        create_minio_client().create_bucket(Bucket=bucket)
+    return BenchmarkContext(
+        get_minio_client(bucket),
+        bucket,
+        colab,
+        {
+            "user": colab.user,
+            "password": colab.password,
+            "host": "127.0.0.1",
+            "port": colab.port,
+        },
+    )
+
+
+def measure_iterations(
+    iterations: int,
+    run: Callable[[], Any],
+    prepare: Callable[[int], Any] = lambda iteration: None,
+) -> Tuple[List[float], int]:
+    """Measures duration of every run and peak resident set size.
+
+    Preparation before every run isn't included into its duration.
+    :param iterations: number of measured runs.
+    :param run: measured function.
+    :param prepare: function that receives iteration number.
+    :return: tuple with runs durations and peak resident set size.
+    """
+    latencies = []
+    with PeakRSSSampler() as sampler:
+        for iteration in range(iterations):
+            prepare(iteration)
+            start_time = time.perf_counter()
+            run()
+            latencies.append(time.perf_counter() - start_time)
+    return latencies, sampler.peak_rss
+
+
+def put_minio_objects(
+    context: BenchmarkContext, keys_prefix: str, sizes: List[int]
+) -> None:
+    """Replaces objects with prefix by objects with random content.
+
+    :param context: benchmark context.
+    :param keys_prefix: prefix of objects keys.
+    :param sizes: sizes of objects in bytes.
+    :return: None.
+    """
+    clear_minio_prefix(context.minio_client, context.bucket, keys_prefix)
+    for number, size in enumerate(sizes):
+        context.minio_client.put_object(
+            Bucket=context.bucket,
+            Key=f"{keys_prefix}/file_{number}.bin",
+            Body=os.urandom(size),
+        )
+
+
+def write_colab_output(
+    context: BenchmarkContext, file_sizes: Dict[str, int]
+) -> None:
+    """Writes files with random content into colab output directory.
+
+    Modification time of files is set into the past, so files are considered
+    changed by synchronization only if their size differs from minio objects.
+    :param context: benchmark context.
+    :param file_sizes: dict with paths relative to output directory and sizes.
+    :return: None.
+    """
+    output_directory = context.colab.local_path(COLAB_OUTPUT_DIRECTORY)
+    for file_path, size in file_sizes.items():
+        local_path = os.path.join(output_directory, file_path)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        with open(local_path, "wb") as output_file:
+            output_file.write(os.urandom(size))
+        os.utime(local_path, (OLD_MTIME, OLD_MTIME))
+
+
+def minio_upload(sizes: List[int]) -> ScenarioRun:
+    """Returns scenario that uploads files with upload_files_to_minio.
+
+    :param sizes: sizes of uploaded files in bytes.
+    :return: scenario function.
+    """
+
+    def run_scenario(context: BenchmarkContext, iterations: int) -> Results:
+        keys_prefix = f"{KEYS_PREFIX}/minio_upload"
+        contents = [os.urandom(size) for size in sizes]
+        files: List[Tuple[io.BytesIO, str]] = []
+
+        def prepare(iteration: int) -> None:
+            files[:] = [
+                (io.BytesIO(content), f"{keys_prefix}/file_{number}.bin")
+                for number, content in enumerate(contents)
+            ]
+
+        latencies, peak_rss = measure_iterations(
+            iterations,
+            lambda: upload_files_to_minio(
+                context.minio_client,
+                files,  # type: ignore
+                context.bucket,
+                get_transfer_config(),
+            ),
+            prepare,
+        )
+        clear_minio_prefix(context.minio_client, context.bucket, keys_prefix)
+        return summarize_scenario(latencies, sum(sizes), len(sizes), peak_rss)
+
+    return run_scenario
+
+
+def minio_clear(sizes: List[int]) -> ScenarioRun:
+    """Returns scenario that deletes objects with clear_minio_prefix.
+
+    :param sizes: sizes of deleted objects in bytes.
+    :return: scenario function.
+    """
+
+    def run_scenario(context: BenchmarkContext, iterations: int) -> Results:
+        keys_prefix = f"{KEYS_PREFIX}/minio_clear"
+        latencies, peak_rss = measure_iterations(
+            iterations,
+            lambda: clear_minio_prefix(
+                context.minio_client, context.bucket, keys_prefix
+            ),
+            lambda iteration: put_minio_objects(context, keys_prefix, sizes),
+        )
+        return summarize_scenario(latencies, sum(sizes), len(sizes), peak_rss)
+
+    return run_scenario
+
+
+def colab_upload(
+    sizes: List[int], is_warm: bool, transfer_mode: TransferMode
+) -> ScenarioRun:
+    """Returns scenario that uploads minio objects to colab.
+
+    Uploaded files and colab content-addressed store are removed before
+    every run, so all files are transferred. Cold runs close pooled ssh
+    connections before transfer, warm runs reuse connection opened by
+    unmeasured first run.
+    :param sizes: sizes of uploaded files in bytes.
+    :param is_warm: whether pooled ssh connection is reused.
+    :param transfer_mode: transfer mode of upload.
+    :return: scenario function.
+    """
+
+    def run_scenario(context: BenchmarkContext, iterations: int) -> Results:
+        keys_prefix = f"{KEYS_PREFIX}/colab_upload"
+        put_minio_objects(context, keys_prefix, sizes)
+        upload_info = UploadColabSchema(
+            **context.credentials,
+            keys_prefix=keys_prefix,
+            transfer_mode=transfer_mode,
+        )
+
+        def transfer(lease: SSHLease) -> TransferStatsSchema:
+            files = list_minio_prefix_files(
+                context.minio_client, context.bucket, f"{keys_prefix}/"
+            )
+            transfer_info = upload_info
+            if transfer_mode == TransferMode.sftp:
+                transfer_info = upload_info.copy(
+                    update={"max_workers": lease.channels}
+                )
+            return transfer_files_to_colab(
+                lease.ssh_client,
+                context.minio_client,
+                context.bucket,
+                files,
+                transfer_info,
+            )
+
+        def upload() -> None:
+            run_colab_transfer(
+                upload_info, get_transfer_channels(upload_info), transfer
+            )
+
+        def prepare(iteration: int) -> None:
+            for directory in (COLAB_UPLOAD_DIRECTORY, COLAB_CAS_DIRECTORY):
+                shutil.rmtree(
+                    context.colab.local_path(directory), ignore_errors=True
+                )
+            if not is_warm:
+                ssh_pool.close_all()
+
+        if is_warm:
+            upload()
+        latencies, peak_rss = measure_iterations(iterations, upload, prepare)
+        clear_minio_prefix(context.minio_client, context.bucket, keys_prefix)
+        return summarize_scenario(latencies, sum(sizes), len(sizes), peak_rss)
+
+    return run_scenario
+
+
+def colab_sync(sizes: List[int], changed_files: int) -> ScenarioRun:
+    """Returns scenario that synchronizes colab output directory with minio.
+
+    Output directory is synchronized once before measurement, then every run
+    synchronizes changed_files rewritten files.
+    :param sizes: sizes of output files in bytes.
+    :param changed_files: number of files rewritten before every run.
+    :return: scenario function.
+    """
+
+    def run_scenario(context: BenchmarkContext, iterations: int) -> Results:
+        keys_prefix = f"{KEYS_PREFIX}/colab_sync"
+        download_info = DownloadColabSchema(
+            **context.credentials, keys_prefix=keys_prefix
+        )
+        file_sizes = {
+            f"dir_{number % 4}/file_{number}.bin": size
+            for number, size in enumerate(sizes)
+        }
+        changed_sizes = dict(list(file_sizes.items())[:changed_files])
+
+        def transfer(lease: SSHLease) -> SyncStatsSchema:
+            return sync_colab_output_to_minio(
+                lease.ssh_client,
+                context.minio_client,
+                context.bucket,
+                keys_prefix,
+                lease.channels,
+                TransferMode.sftp,
+            )
+
+        def sync() -> None:
+            run_colab_transfer(
+                download_info, get_transfer_channels(download_info), transfer
+            )
+
+        def prepare(iteration: int) -> None:
+            write_colab_output(
+                context,
+                {
+                    file_path: size + iteration % 2 + 1
+                    for file_path, size in changed_sizes.items()
+                },
+            )
+
+        shutil.rmtree(
+            context.colab.local_path(COLAB_UPLOAD_DIRECTORY),
+            ignore_errors=True,
+        )
+        clear_minio_prefix(context.minio_client, context.bucket, keys_prefix)
+        write_colab_output(context, file_sizes)
+        sync()
+        latencies, peak_rss = measure_iterations(iterations, sync, prepare)
+        clear_minio_prefix(context.minio_client, context.bucket, keys_prefix)
+        return summarize_scenario(
+            latencies,
+            sum(changed_sizes.values()),
+            len(changed_sizes),
+            peak_rss,
+        )
+
+    return run_scenario
+
+
+SCENARIOS: Dict[str, ScenarioRun] = {
+    "minio_upload_small_files": minio_upload(SMALL_FILES),
+    "minio_upload_large_files": minio_upload(LARGE_FILES),
+    "minio_clear_prefix": minio_clear(SMALL_FILES),
+    "colab_upload_small_files_cold": colab_upload(
+        SMALL_FILES, False, TransferMode.sftp
+    ),
+    "colab_upload_small_files_warm": colab_upload(
+        SMALL_FILES, True, TransferMode.sftp
+    ),
+    "colab_upload_small_files_bundle": colab_upload(
+        SMALL_FILES, True, TransferMode.bundle
+    ),
+    "colab_upload_large_files_cold": colab_upload(
+        LARGE_FILES, False, TransferMode.sftp
+    ),
+    "colab_upload_large_files_warm": colab_upload(
+        LARGE_FILES, True, TransferMode.sftp
+    ),
+    "colab_sync_small_delta": colab_sync(SYNC_FILES, SYNC_SMALL_DELTA),
+    "colab_sync_large_delta": colab_sync(SYNC_FILES, len(SYNC_FILES)),
+}
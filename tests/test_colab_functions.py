@@ -0,0 +1,115 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+import pytest
+
+import app.colab_functions as colab_functions_module
+from app.colab_functions import (
+    PutFileResult,
+    RemoteChunks,
+    RemoteFileInfo,
+    plan_colab_upload,
+    verify_colab_files,
+)
+from app.errors import FileIntegrityError
+from app.schemas import UploadColabSchema
+
+CREDENTIALS = {
+    "user": "root",
+    "password": "pass",
+    "host": "0.tcp.ngrok.io",
+    "port": 1,
+    "keys_prefix": "project",
+}
+
+
+def get_file_obj(key: str, size: int) -> Dict[str, Any]:
+    return {
+        "Key": key,
+        "Size": size,
+        "ETag": '"etag"',
+        "LastModified": datetime(2022, 5, 1, tzinfo=timezone.utc),
+    }
+
+
+def test_plan_colab_upload_keeps_last_object_with_the_same_name() -> None:
+    files = [
+        get_file_obj("project/a/script.py", 1),
+        get_file_obj("project/data.csv", 2),
+        get_file_obj("project/b/script.py", 3),
+    ]
+    upload_plan = plan_colab_upload(
+        None, files, UploadColabSchema(**CREDENTIALS)
+    )
+    assert [file_obj["Key"] for file_obj in upload_plan.changed_files] == [
+        "project/b/script.py",
+        "project/data.csv",
+    ]
+    assert upload_plan.stale_files == {}
+
+
+def test_plan_colab_upload_lists_stale_files_passing_filters(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    manifest_requests: List[List[Dict[str, Any]]] = []
+
+    def get_colab_manifest(
+        ssh_client: None, files: List[Dict[str, Any]]
+    ) -> Dict[str, RemoteFileInfo]:
+        manifest_requests.append(files)
+        return {
+            "script.py": RemoteFileInfo(1, 0.0, None),
+            "old.py": RemoteFileInfo(5, 0.0, None),
+            "notes.txt": RemoteFileInfo(7, 0.0, None),
+        }
+
+    monkeypatch.setattr(
+        colab_functions_module, "get_colab_manifest", get_colab_manifest
+    )
+    files = [get_file_obj("project/script.py", 1)]
+    upload_plan = plan_colab_upload(
+        None,
+        files,
+        UploadColabSchema(**CREDENTIALS, include=["*.py"], delete_stale=True),
+    )
+    assert manifest_requests == [[]]
+    assert upload_plan.changed_files == files
+    assert upload_plan.stale_files == {"old.py": 5}
+
+
+def test_verify_colab_files_renames_only_verified_files(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    written_chunks = {
+        "/content/uploaded/a.txt.part": RemoteChunks(3, ["md5"]),
+        "/content/uploaded/b.txt.part": RemoteChunks(3, ["other"]),
+    }
+    commands: List[str] = []
+    monkeypatch.setattr(
+        colab_functions_module,
+        "get_colab_chunks",
+        lambda ssh_client, paths, chunk_size: {
+            path: written_chunks[path] for path in paths
+        },
+    )
+    monkeypatch.setattr(
+        colab_functions_module,
+        "run_colab_command",
+        lambda ssh_client, command: commands.append(command),
+    )
+    put_results = [
+        PutFileResult(
+            f"/content/uploaded/{name}",
+            f"/content/uploaded/{name}.part",
+            3,
+            RemoteChunks(3, ["md5"]),
+        )
+        for name in ("a.txt", "b.txt")
+    ]
+    verify_colab_files(None, put_results[:1])
+    assert commands == [
+        "mv -f -- /content/uploaded/a.txt.part /content/uploaded/a.txt"
+    ]
+    with pytest.raises(FileIntegrityError):
+        verify_colab_files(None, put_results)
+    assert len(commands) == 1
@@ -0,0 +1,26 @@
+import os
+
+from app.compression import (
+    RAW_CODEC,
+    ZLIB_CODEC,
+    compress_chunks,
+    decompress_chunks,
+    iter_parts,
+    select_codec,
+)
+
+
+def test_codec_is_selected_by_extension_and_entropy() -> None:
+    text = b"id,value\n" + b"".join(b"%d,%d\n" % (i, i) for i in range(1000))
+    assert select_codec("data.csv", text) == ZLIB_CODEC
+    assert select_codec("data.NPZ", text) == RAW_CODEC
+    assert select_codec("weights.bin", os.urandom(65536)) == RAW_CODEC
+
+
+def test_compressed_stream_is_decompressed_into_parts() -> None:
+    chunks = [b"line\n" * 1000, b"", b"end\n" * 10]
+    for codec in (ZLIB_CODEC, RAW_CODEC):
+        stream = list(compress_chunks(chunks, codec))
+        parts = list(iter_parts(decompress_chunks(stream), 1024))
+        assert b"".join(parts) == b"".join(chunks)
+        assert [len(part) for part in parts[:-1]] == [1024] * 4
@@ -0,0 +1,88 @@
+import time
+from threading import Thread
+from typing import List
+
+import anyio
+
+from app.concurrency import (
+    HostLimiters,
+    KeyLocks,
+    RateLimiters,
+    TokenBucket,
+    get_host_key,
+)
+
+
+def test_token_bucket_waits_for_refill_of_debt() -> None:
+    token_bucket = TokenBucket(rate=1000, capacity=100)
+    start_time = time.monotonic()
+    token_bucket.consume(100)
+    token_bucket.consume(100)
+    assert time.monotonic() - start_time >= 0.09
+
+
+def test_token_bucket_without_rate_does_not_wait() -> None:
+    token_bucket = TokenBucket(rate=0, capacity=0)
+    start_time = time.monotonic()
+    token_bucket.consume(10**9)
+    assert time.monotonic() - start_time < 0.05
+
+
+def test_host_limiters_separate_runtimes_on_the_same_host() -> None:
+    host_limiters = HostLimiters(capacity=1)
+
+    async def main() -> None:
+        first_runtime = host_limiters.get(get_host_key("0.tcp.ngrok.io", 1))
+        second_runtime = host_limiters.get(get_host_key("0.tcp.ngrok.io", 2))
+        assert first_runtime is not second_runtime
+        assert first_runtime is host_limiters.get(
+            get_host_key("0.tcp.ngrok.io", 1)
+        )
+
+    anyio.run(main)
+
+
+def test_host_limiters_evict_only_idle_limiters() -> None:
+    host_limiters = HostLimiters(capacity=1, ttl=0)
+
+    async def main() -> None:
+        busy_limiter = host_limiters.get("busy:1")
+        async with busy_limiter:
+            host_limiters.get("idle:1")
+            host_limiters.get("other:1")
+            assert len(host_limiters) == 2
+            assert host_limiters.get("busy:1") is busy_limiter
+        host_limiters.get("other:1")
+        assert len(host_limiters) == 1
+
+    anyio.run(main)
+
+
+def test_rate_limiters_evict_only_full_buckets() -> None:
+    rate_limiters = RateLimiters(rate=1, capacity=100, ttl=0)
+    indebted_bucket = rate_limiters.get("indebted")
+    indebted_bucket.charge(1000)
+    rate_limiters.get("idle")
+    rate_limiters.get("other")
+    assert len(rate_limiters) == 2
+    assert rate_limiters.get("indebted") is indebted_bucket
+
+
+def test_key_locks_serialize_holders_of_the_same_key() -> None:
+    key_locks = KeyLocks()
+    events: List[str] = []
+
+    def hold_key() -> None:
+        with key_locks.hold("root/key"):
+            events.append("second")
+
+    with key_locks.hold("root/key"):
+        with key_locks.hold("root/other"):
+            assert len(key_locks) == 2
+        waiting_thread = Thread(target=hold_key)
+        waiting_thread.start()
+        waiting_thread.join(0.05)
+        events.append("first")
+    waiting_thread.join(1)
+    assert events == ["first", "second"]
+    assert len(key_locks) == 0
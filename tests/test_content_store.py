@@ -0,0 +1,23 @@
+from app.content_store import ContentIndex, get_content_key
+
+
+def test_content_key_consists_of_etag_and_size() -> None:
+    file_obj = {"ETag": '"0cc175b9c0f1b6a831c399e269772661"', "Size": 1}
+    assert get_content_key(file_obj) == "0cc175b9c0f1b6a831c399e269772661-1"
+
+
+def test_content_index_evicts_entries_per_host() -> None:
+    content_index = ContentIndex(ttl=60, max_entries=2)
+    content_index.add(("colab", 22), ["first", "second", "third"])
+    content_index.add(("other", 22), ["first"])
+    assert content_index.get_cached(("colab", 22), ["first", "third"]) == {
+        "third"
+    }
+    assert content_index.pop_evicted(("colab", 22)) == ["first"]
+    assert content_index.pop_evicted(("colab", 22)) == []
+    content_index.discard(("colab", 22), ["third"])
+    assert not content_index.get_cached(("colab", 22), ["third"])
+    expired_index = ContentIndex(ttl=-1, max_entries=2)
+    expired_index.add(("colab", 22), ["first"])
+    assert not expired_index.get_cached(("colab", 22), ["first"])
+    assert expired_index.pop_evicted(("colab", 22)) == ["first"]
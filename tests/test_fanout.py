@@ -0,0 +1,125 @@
+import io
+import time
+from contextlib import contextmanager
+from threading import Thread
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Tuple
+
+import pytest
+from paramiko import SSHException
+
+import app.colab_functions as colab_functions_module
+import app.fanout as fanout_module
+from app.colab_functions import PutFileResult, RemoteChunks, read_file_chunks
+from app.fanout import FanoutTarget, fan_out_minio_files_to_colab
+from app.schemas import ColabCredentials
+
+FAILED_PORT = 2
+
+
+class RangeClient:
+    def __init__(self, objects: Dict[str, bytes]):
+        self.objects = objects
+
+    def get_object(self, Bucket: str, Key: str, **kwargs: Any) -> Any:
+        start, end = map(int, kwargs["Range"].replace("bytes=", "").split("-"))
+        stop = end + 1
+        return {"Body": io.BytesIO(self.objects[Key][start:stop])}
+
+
+class FakeSSHClient:
+    @contextmanager
+    def open_sftp(self) -> Iterator[None]:
+        yield None
+
+
+@pytest.fixture
+def received_files(
+    monkeypatch: pytest.MonkeyPatch,
+) -> Dict[int, Dict[str, bytes]]:
+    received: Dict[int, Dict[str, bytes]] = {}
+
+    @contextmanager
+    def connect_fake_colab(credentials: ColabCredentials) -> Iterator[Any]:
+        yield SimpleNamespace(ssh_client=FakeSSHClient())
+
+    def put_fake_file(
+        sftp_session: None,
+        target: FanoutTarget,
+        file_size: int,
+        file_name: str,
+        remote_chunks: Dict[str, RemoteChunks],
+    ) -> PutFileResult:
+        port = target.credentials.port
+        if port == FAILED_PORT and received.get(port):
+            while not target.chunks.full():
+                time.sleep(0.01)
+            raise SSHException("Tunnel was closed")
+        chunks = list(read_file_chunks(target, file_size, file_name))
+        received.setdefault(port, {})[file_name] = b"".join(chunks)
+        return PutFileResult(file_name, file_name, file_size, None)
+
+    monkeypatch.setattr(colab_functions_module, "COLAB_CHUNK_SIZE", 4)
+    monkeypatch.setattr(fanout_module, "COLAB_FANOUT_QUEUE_CHUNKS", 2)
+    monkeypatch.setattr(fanout_module, "connect_ssh_colab", connect_fake_colab)
+    monkeypatch.setattr(fanout_module, "put_file_to_colab", put_fake_file)
+    for function_name in ("run_colab_command", "verify_colab_files"):
+        monkeypatch.setattr(fanout_module, function_name, lambda *args: None)
+    monkeypatch.setattr(fanout_module, "get_colab_chunks", lambda *args: {})
+    return received
+
+
+def test_fan_out_continues_uploads_to_hosts_after_host_failure(
+    received_files: Dict[int, Dict[str, bytes]]
+) -> None:
+    objects = {f"p/file_{index}": bytes([index]) * 100 for index in range(3)}
+    files: List[Dict[str, Any]] = [
+        {"Key": key, "Size": len(content), "ETag": '"etag"'}
+        for key, content in objects.items()
+    ]
+    hosts = [
+        ColabCredentials(
+            host="0.tcp.ngrok.io", port=port, user="root", password="pass"
+        )
+        for port in (1, FAILED_PORT, 3)
+    ]
+    results: List[Tuple[int, List[FanoutTarget]]] = []
+    producer = Thread(
+        target=lambda: results.append(
+            fan_out_minio_files_to_colab(
+                RangeClient(objects), "root", files, hosts
+            )
+        ),
+        daemon=True,
+    )
+    producer.start()
+    producer.join(timeout=10)
+    assert not producer.is_alive()
+    bytes_read, targets = results[0]
+    assert bytes_read == 300
+    assert [target.error is None for target in targets] == [True, False, True]
+    expected_files = {key[2:]: content for key, content in objects.items()}
+    assert received_files[1] == expected_files
+    assert received_files[3] == expected_files
+    assert list(received_files[FAILED_PORT]) == ["file_0"]
+
+
+def test_fan_out_uploads_last_object_with_the_same_name(
+    received_files: Dict[int, Dict[str, bytes]]
+) -> None:
+    objects = {"p/a/x.py": b"first", "p/b/x.py": b"second", "p/y.py": b"y"}
+    files: List[Dict[str, Any]] = [
+        {"Key": key, "Size": len(content), "ETag": '"etag"'}
+        for key, content in objects.items()
+    ]
+    hosts = [
+        ColabCredentials(
+            host="0.tcp.ngrok.io", port=1, user="root", password="pass"
+        )
+    ]
+    bytes_read, targets = fan_out_minio_files_to_colab(
+        RangeClient(objects), "root", files, hosts
+    )
+    assert targets[0].error is None
+    assert bytes_read == len(b"second") + len(b"y")
+    assert received_files[1] == {"x.py": b"second", "y.py": b"y"}
@@ -0,0 +1,109 @@
+from typing import AsyncIterator, List
+
+import anyio
+import boto3
+import pytest
+from botocore.stub import ANY, Stubber
+
+from app.errors import InvalidFormData
+from app.form_streaming import stream_form_files_to_minio
+from app.schemas import UploadedFileStatsSchema
+
+CONTENT_TYPE = "multipart/form-data; boundary=boundary"
+FILE_PART = (
+    b"--boundary\r\n"
+    b'Content-Disposition: form-data; name="files"; filename="data.bin"\r\n'
+    b"Content-Type: application/octet-stream\r\n\r\n"
+    b"0123456789"
+)
+
+
+@pytest.fixture
+def minio_client() -> boto3.client:
+    return boto3.client(
+        "s3",
+        endpoint_url="http://minio:9000",
+        aws_access_key_id="key",
+        aws_secret_access_key="secret",
+        region_name="us-east-1",
+    )
+
+
+def stream_body(
+    body: bytes, minio_client: boto3.client
+) -> List[UploadedFileStatsSchema]:
+    async def iterate_body() -> AsyncIterator[bytes]:
+        for start in range(0, len(body), 7):
+            yield body[start:][:7]
+
+    async def main() -> List[UploadedFileStatsSchema]:
+        return await stream_form_files_to_minio(
+            iterate_body(), CONTENT_TYPE, minio_client, "root", "project", 8
+        )
+
+    return anyio.run(main)
+
+
+def test_stream_form_files_aborts_upload_of_truncated_body(
+    minio_client: boto3.client,
+) -> None:
+    with Stubber(minio_client) as stubber:
+        stubber.add_response(
+            "create_multipart_upload",
+            {"UploadId": "upload"},
+            {"Bucket": "root", "Key": "project/data.bin"},
+        )
+        stubber.add_response(
+            "upload_part",
+            {"ETag": '"part"'},
+            {
+                "Body": ANY,
+                "Bucket": "root",
+                "Key": "project/data.bin",
+                "PartNumber": 1,
+                "UploadId": "upload",
+            },
+        )
+        stubber.add_response(
+            "abort_multipart_upload",
+            {},
+            {
+                "Bucket": "root",
+                "Key": "project/data.bin",
+                "UploadId": "upload",
+            },
+        )
+        with pytest.raises(InvalidFormData):
+            stream_body(FILE_PART, minio_client)
+        stubber.assert_no_pending_responses()
+
+
+def test_stream_form_files_completes_upload_of_whole_body(
+    minio_client: boto3.client,
+) -> None:
+    with Stubber(minio_client) as stubber:
+        stubber.add_response("create_multipart_upload", {"UploadId": "upload"})
+        stubber.add_response("upload_part", {"ETag": '"first"'})
+        stubber.add_response("upload_part", {"ETag": '"second"'})
+        stubber.add_response(
+            "complete_multipart_upload",
+            {},
+            {
+                "Bucket": "root",
+                "Key": "project/data.bin",
+                "UploadId": "upload",
+                "MultipartUpload": {
+                    "Parts": [
+                        {"PartNumber": 1, "ETag": '"first"'},
+                        {"PartNumber": 2, "ETag": '"second"'},
+                    ]
+                },
+            },
+        )
+        files_stats = stream_body(
+            FILE_PART + b"\r\n--boundary--\r\n", minio_client
+        )
+        stubber.assert_no_pending_responses()
+    assert [(stats.key, stats.size) for stats in files_stats] == [
+        ("project/data.bin", 10)
+    ]
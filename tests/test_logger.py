@@ -0,0 +1,42 @@
+import json
+import logging
+
+from app.logger import (
+    SAMPLED,
+    ContextFilter,
+    JsonFormatter,
+    SamplingFilter,
+    log_context,
+)
+
+
+def create_record(level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord(
+        "app.main", level, "main.py", 1, "uploaded", None, None
+    )
+
+
+def test_json_formatter_adds_context_fields() -> None:
+    record = create_record()
+    record.bytes = 10
+    token = log_context.set({"request_id": "abc", "bucket": None})
+    try:
+        ContextFilter().filter(record)
+    finally:
+        log_context.reset(token)
+    log_record = json.loads(JsonFormatter().format(record))
+    assert log_record["message"] == "uploaded"
+    assert log_record["request_id"] == "abc"
+    assert log_record["bytes"] == 10
+    assert "bucket" not in log_record
+
+
+def test_sampling_filter_drops_only_sampled_info_records() -> None:
+    sampling_filter = SamplingFilter(0)
+    sampled_record = create_record()
+    sampled_record.__dict__.update(SAMPLED)
+    sampled_warning = create_record(logging.WARNING)
+    sampled_warning.__dict__.update(SAMPLED)
+    assert not sampling_filter.filter(sampled_record)
+    assert sampling_filter.filter(sampled_warning)
+    assert sampling_filter.filter(create_record())
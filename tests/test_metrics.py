@@ -0,0 +1,33 @@
+import pytest
+
+from app.metrics import Histogram, MetricsRegistry, measure_stage, registry
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    metrics_registry = MetricsRegistry()
+    histogram: Histogram = metrics_registry.register(
+        Histogram("stage_seconds", "Stage duration.", ("stage",), (0.1, 1))
+    )
+    for value in (0.05, 0.5, 5):
+        histogram.observe(('put "part"',), value)
+    assert metrics_registry.render().splitlines()[2:] == [
+        'stage_seconds_bucket{stage="put \\"part\\"",le="0.1"} 1',
+        'stage_seconds_bucket{stage="put \\"part\\"",le="1"} 2',
+        'stage_seconds_bucket{stage="put \\"part\\"",le="+Inf"} 3',
+        'stage_seconds_sum{stage="put \\"part\\""} 5.55',
+        'stage_seconds_count{stage="put \\"part\\""} 3',
+    ]
+
+
+def test_measure_stage_counts_failed_stages() -> None:
+    with pytest.raises(ValueError):
+        with measure_stage("exec", "test", "failed"):
+            raise ValueError("failed")
+    metrics = registry.render()
+    assert (
+        'colab_sync_stage_errors_total{stage="exec",backend="test"} 1'
+        in metrics
+    )
+    assert 'colab_sync_stages_in_flight{stage="exec",backend="test"} 0' in (
+        metrics
+    )
@@ -0,0 +1,223 @@
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from app.errors import ObjectsDeleteError
+from app.minio_functions import (
+    BucketCache,
+    MinioMultipartUpload,
+    abort_stale_multipart_uploads,
+    clear_minio_prefix,
+    delete_minio_objects,
+    list_minio_prefix_files,
+)
+
+
+@pytest.fixture
+def minio_client() -> boto3.client:
+    return boto3.client(
+        "s3",
+        endpoint_url="http://minio:9000",
+        aws_access_key_id="key",
+        aws_secret_access_key="secret",
+        region_name="us-east-1",
+    )
+
+
+def test_list_minio_prefix_files_reads_all_pages(
+    minio_client: boto3.client,
+) -> None:
+    with Stubber(minio_client) as stubber:
+        stubber.add_response(
+            "list_objects_v2",
+            {
+                "Contents": [{"Key": "prefix/1"}],
+                "IsTruncated": True,
+                "NextContinuationToken": "token",
+            },
+            {"Bucket": "root", "Prefix": "prefix/"},
+        )
+        stubber.add_response(
+            "list_objects_v2",
+            {"Contents": [{"Key": "prefix/2"}], "IsTruncated": False},
+            {
+                "Bucket": "root",
+                "Prefix": "prefix/",
+                "ContinuationToken": "token",
+            },
+        )
+        files = list_minio_prefix_files(minio_client, "root", "prefix/")
+    assert [file_obj["Key"] for file_obj in files] == ["prefix/1", "prefix/2"]
+
+
+def test_clear_minio_prefix_deletes_keys_in_batches(
+    minio_client: boto3.client,
+) -> None:
+    keys = [f"prefix/{number}" for number in range(1500)]
+    deleted_keys: List[str] = []
+    minio_client.meta.events.register(
+        "provide-client-params.s3.DeleteObjects",
+        lambda params, **_: deleted_keys.extend(
+            obj["Key"] for obj in params["Delete"]["Objects"]
+        ),
+    )
+    with Stubber(minio_client) as stubber:
+        stubber.add_response(
+            "list_objects_v2",
+            {"Contents": [{"Key": key} for key in keys]},
+            {"Bucket": "root", "Prefix": "prefix/"},
+        )
+        stubber.add_response("delete_objects", {})
+        stubber.add_response("delete_objects", {})
+        clear_minio_prefix(minio_client, "root", "prefix/")
+        stubber.assert_no_pending_responses()
+    assert sorted(deleted_keys) == sorted(keys)
+
+
+def test_delete_minio_objects_reports_failed_keys(
+    minio_client: boto3.client,
+) -> None:
+    with Stubber(minio_client) as stubber:
+        stubber.add_response(
+            "delete_objects",
+            {"Errors": [{"Key": "prefix/2", "Message": "Access Denied"}]},
+        )
+        with pytest.raises(ObjectsDeleteError, match="prefix/2: Access"):
+            delete_minio_objects(
+                minio_client, "root", ["prefix/1", "prefix/2"]
+            )
+
+
+def test_bucket_cache_expires_and_evicts_buckets() -> None:
+    bucket_cache = BucketCache(ttl=60, max_size=2)
+    for bucket in ("first", "second", "third"):
+        bucket_cache.add(bucket)
+    assert "first" not in bucket_cache
+    assert "second" in bucket_cache
+    bucket_cache.invalidate("second")
+    assert "second" not in bucket_cache
+    expired_cache = BucketCache(ttl=-1, max_size=2)
+    expired_cache.add("root")
+    assert "root" not in expired_cache
+
+
+def test_multipart_upload_completes_parts_in_order(
+    minio_client: boto3.client,
+) -> None:
+    upload = MinioMultipartUpload(minio_client, "root", "prefix/file")
+    with Stubber(minio_client) as stubber:
+        stubber.add_response("create_multipart_upload", {"UploadId": "id"})
+        stubber.add_response("upload_part", {"ETag": '"first"'})
+        stubber.add_response(
+            "complete_multipart_upload",
+            {},
+            {
+                "Bucket": "root",
+                "Key": "prefix/file",
+                "UploadId": "id",
+                "MultipartUpload": {
+                    "Parts": [
+                        {"PartNumber": 1, "ETag": '"first"'},
+                        {"PartNumber": 2, "ETag": '"second"'},
+                    ]
+                },
+            },
+        )
+        upload.add_part(2, '"second"')
+        upload.upload_part(1, b"data")
+        upload.complete(b"")
+        stubber.assert_no_pending_responses()
+
+
+def test_multipart_upload_puts_single_part_object(
+    minio_client: boto3.client,
+) -> None:
+    upload = MinioMultipartUpload(minio_client, "root", "prefix/file")
+    with Stubber(minio_client) as stubber:
+        stubber.add_response(
+            "put_object",
+            {},
+            {"Body": b"data", "Bucket": "root", "Key": "prefix/file"},
+        )
+        upload.complete(b"data")
+        upload.abort()
+        stubber.assert_no_pending_responses()
+
+
+def test_multipart_upload_resumes_latest_upload(
+    minio_client: boto3.client,
+) -> None:
+    upload = MinioMultipartUpload(minio_client, "root", "prefix/file")
+    now = datetime.now(timezone.utc)
+    with Stubber(minio_client) as stubber:
+        stubber.add_response(
+            "list_multipart_uploads",
+            {
+                "Uploads": [
+                    {
+                        "Key": "prefix/file",
+                        "UploadId": "stale",
+                        "Initiated": now - timedelta(days=2),
+                    },
+                    {
+                        "Key": "prefix/file",
+                        "UploadId": "old",
+                        "Initiated": now - timedelta(hours=2),
+                    },
+                    {
+                        "Key": "prefix/file",
+                        "UploadId": "new",
+                        "Initiated": now - timedelta(hours=1),
+                    },
+                    {
+                        "Key": "prefix/file2",
+                        "UploadId": "other",
+                        "Initiated": now,
+                    },
+                ]
+            },
+            {"Bucket": "root", "Prefix": "prefix/file"},
+        )
+        stubber.add_response(
+            "list_parts",
+            {"Parts": [{"PartNumber": 1, "ETag": '"first"'}]},
+            {"Bucket": "root", "Key": "prefix/file", "UploadId": "new"},
+        )
+        assert upload.resume() == {1: '"first"'}
+        stubber.assert_no_pending_responses()
+    assert upload.upload_id == "new"
+
+
+def test_abort_stale_multipart_uploads_keeps_recent_uploads(
+    minio_client: boto3.client,
+) -> None:
+    now = datetime.now(timezone.utc)
+    with Stubber(minio_client) as stubber:
+        stubber.add_response(
+            "list_multipart_uploads",
+            {
+                "Uploads": [
+                    {
+                        "Key": "prefix/old",
+                        "UploadId": "stale",
+                        "Initiated": now - timedelta(days=2),
+                    },
+                    {
+                        "Key": "prefix/new",
+                        "UploadId": "recent",
+                        "Initiated": now,
+                    },
+                ]
+            },
+            {"Bucket": "root", "Prefix": "prefix/"},
+        )
+        stubber.add_response(
+            "abort_multipart_upload",
+            {},
+            {"Bucket": "root", "Key": "prefix/old", "UploadId": "stale"},
+        )
+        assert abort_stale_multipart_uploads(minio_client, "root", "prefix/")
+        stubber.assert_no_pending_responses()
@@ -0,0 +1,98 @@
+import io
+from threading import BoundedSemaphore
+from typing import Any, Dict, List
+
+import pytest
+
+from app.errors import FileIntegrityError
+from app.prefetch import PrefetchedObject
+
+
+class RangeClient:
+    def __init__(self, content: bytes):
+        self.content = content
+        self.ranges: List[str] = []
+        self.etags: List[str] = []
+
+    def get_object(
+        self, Bucket: str, Key: str, Range: str, IfMatch: str = None
+    ) -> Dict[str, Any]:
+        self.ranges.append(Range)
+        self.etags.append(IfMatch)
+        start, end = map(int, Range.replace("bytes=", "").split("-"))
+        stop = end + 1
+        return {"Body": io.BytesIO(self.content[start:stop])}
+
+
+def test_prefetched_object_reads_blocks_through_ring_of_buffers() -> None:
+    content = bytes(range(256)) * 40
+    minio_client = RangeClient(content)
+    prefetched_object = PrefetchedObject(
+        minio_client, "root", "key", len(content), block_size=1000, window=3
+    )
+    chunks = [prefetched_object.read(700) for _ in range(16)]
+    prefetched_object.close()
+    assert b"".join(chunks) == content
+    assert chunks[-1] == b""
+    assert len(prefetched_object._buffers) == 3
+    assert len(minio_client.ranges) == 11
+    assert "bytes=10000-10239" in minio_client.ranges
+
+
+def test_prefetched_object_detects_truncated_objects() -> None:
+    minio_client = RangeClient(b"data")
+    prefetched_object = PrefetchedObject(
+        minio_client, "root", "key", 10, block_size=4, window=2
+    )
+    with pytest.raises(FileIntegrityError):
+        prefetched_object.read()
+    prefetched_object.close()
+
+
+def test_prefetched_objects_share_bounded_buffers() -> None:
+    content = bytes(range(256)) * 40
+    minio_client = RangeClient(content)
+    buffers = BoundedSemaphore(4)
+    first_object = PrefetchedObject(
+        minio_client,
+        "root",
+        "key",
+        len(content),
+        '"etag"',
+        block_size=1000,
+        window=3,
+        buffers=buffers,
+    )
+    second_object = PrefetchedObject(
+        minio_client,
+        "root",
+        "key",
+        len(content),
+        '"etag"',
+        block_size=1000,
+        window=3,
+        buffers=buffers,
+    )
+    assert (first_object.window, second_object.window) == (3, 1)
+    assert second_object.read() == content
+    first_object.close()
+    second_object.close()
+    assert set(minio_client.etags) == {'"etag"'}
+    assert all(buffers.acquire(blocking=False) for _ in range(4))
+
+
+def test_object_of_one_block_is_read_without_prefetch() -> None:
+    minio_client = RangeClient(b"data")
+    buffers = BoundedSemaphore(1)
+    buffers.acquire()
+    prefetched_object = PrefetchedObject(
+        minio_client, "root", "key", 4, block_size=4, window=2, buffers=buffers
+    )
+    assert minio_client.ranges == []
+    assert [prefetched_object.read(3), prefetched_object.read(3)] == [
+        b"dat",
+        b"a",
+    ]
+    prefetched_object.close()
+    assert minio_client.ranges == ["bytes=0-3"]
+    assert not buffers.acquire(blocking=False)
@@ -0,0 +1,55 @@
+from typing import List
+
+import anyio
+import pytest
+
+from app.concurrency import RateLimiters
+from app.errors import SchedulerQueueFull
+from app.scheduler import TransferScheduler
+
+
+def get_scheduler(max_queued: int) -> TransferScheduler:
+    return TransferScheduler(
+        host_transfers=1,
+        bucket_transfers=1,
+        max_queued=max_queued,
+        host_bandwidth=RateLimiters(0, 0),
+        bucket_bandwidth=RateLimiters(0, 0),
+    )
+
+
+def test_scheduler_shares_bucket_between_tenants() -> None:
+    scheduler = get_scheduler(max_queued=10)
+    admitted: List[str] = []
+
+    async def transfer(name: str) -> None:
+        async with scheduler.slot((), "root", name[0]):
+            admitted.append(name)
+            await anyio.sleep(0.01)
+
+    async def main() -> None:
+        async with anyio.create_task_group() as task_group:
+            for name in ("a1", "a2", "a3", "b1"):
+                task_group.start_soon(transfer, name)
+                await anyio.sleep(0)
+
+    anyio.run(main)
+    assert admitted == ["a1", "a2", "b1", "a3"]
+
+
+def test_scheduler_rejects_transfers_if_queue_is_full() -> None:
+    scheduler = get_scheduler(max_queued=1)
+
+    async def main() -> None:
+        async with scheduler.slot(("colab",), "root", "a"):
+            async with anyio.create_task_group() as task_group:
+                task_group.start_soon(scheduler.run, (), "root", "b", print)
+                await anyio.sleep(0)
+                with pytest.raises(SchedulerQueueFull):
+                    async with scheduler.slot((), "root", "c"):
+                        pass
+                assert scheduler.get_queue_depth() == 1
+                task_group.cancel_scope.cancel()
+        assert scheduler.get_queue_depth() == 0
+
+    anyio.run(main)
@@ -0,0 +1,95 @@
+from typing import List
+
+import pytest
+from paramiko import SSHException
+
+from app import ssh_pool as ssh_pool_module
+from app.schemas import ColabCredentials
+from app.ssh_pool import SSHConnectionPool
+
+
+class FakeTransport:
+    def __init__(self) -> None:
+        self.active = True
+
+    def is_authenticated(self) -> bool:
+        return self.active
+
+    def is_active(self) -> bool:
+        return self.active
+
+    def send_ignore(self) -> None:
+        pass
+
+    def set_keepalive(self, interval: int) -> None:
+        pass
+
+
+class FakeSSHClient:
+    def __init__(self) -> None:
+        self.transport = FakeTransport()
+        self.closed = False
+
+    def get_transport(self) -> FakeTransport:
+        return self.transport
+
+    def close(self) -> None:
+        self.closed = True
+        self.transport.active = False
+
+
+@pytest.fixture
+def opened_clients(monkeypatch: pytest.MonkeyPatch) -> List[FakeSSHClient]:
+    clients: List[FakeSSHClient] = []
+
+    def open_fake_client(credentials: ColabCredentials) -> FakeSSHClient:
+        clients.append(FakeSSHClient())
+        return clients[-1]
+
+    monkeypatch.setattr(ssh_pool_module, "open_ssh_colab", open_fake_client)
+    return clients
+
+
+@pytest.fixture
+def credentials() -> ColabCredentials:
+    return ColabCredentials(
+        user="root", password="password", host="colab", port=22
+    )
+
+
+def test_pool_reuses_connection_with_same_credentials(
+    opened_clients: List[FakeSSHClient], credentials: ColabCredentials
+) -> None:
+    pool = SSHConnectionPool(10, 60, 30, 0.1)
+    for _ in range(3):
+        pool.release(pool.acquire(credentials))
+    other_password = credentials.copy(update={"password": "other"})
+    pool.release(pool.acquire(other_password))
+    assert len(opened_clients) == 2
+    assert opened_clients[0].closed
+    opened_clients[1].transport.active = False
+    pool.release(pool.acquire(other_password))
+    assert len(opened_clients) == 3
+
+
+def test_pool_limits_channels_of_connection(
+    opened_clients: List[FakeSSHClient], credentials: ColabCredentials
+) -> None:
+    pool = SSHConnectionPool(4, 60, 30, 0.1)
+    first_lease = pool.acquire(credentials, 3)
+    second_lease = pool.acquire(credentials, 3)
+    assert (first_lease.channels, second_lease.channels) == (3, 1)
+    with pytest.raises(SSHException):
+        pool.acquire(credentials)
+    pool.release(second_lease)
+    assert pool.acquire(credentials, 2).channels == 1
+    assert len(opened_clients) == 1
+
+
+def test_pool_closes_idle_connections(
+    opened_clients: List[FakeSSHClient], credentials: ColabCredentials
+) -> None:
+    pool = SSHConnectionPool(10, 0, 30, 0.1)
+    pool.release(pool.acquire(credentials))
+    pool.evict_idle()
+    assert opened_clients[0].closed
@@ -0,0 +1,87 @@
+from contextlib import nullcontext
+from typing import Any, ContextManager, Dict
+
+import pytest
+from paramiko import SFTPAttributes
+
+import app.sync_functions as sync_functions_module
+from app.sync_functions import plan_colab_output_sync
+from app.sync_index import SyncIndex, SyncIndexEntry
+from app.transfer_filters import TransferFilter
+
+
+class SSHClient:
+    def open_sftp(self) -> ContextManager[None]:
+        return nullcontext()
+
+
+def get_attributes(size: int, mtime: int) -> SFTPAttributes:
+    attributes = SFTPAttributes()
+    attributes.st_size = size
+    attributes.st_mtime = mtime
+    return attributes
+
+
+def test_plan_colab_output_sync_deletes_selected_missing_files(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    remote_files = {
+        "same.py": get_attributes(1, 10),
+        "changed.py": get_attributes(2, 10),
+        "new.py": get_attributes(1, 10),
+    }
+    sync_index = SyncIndex(
+        {
+            "same.py": SyncIndexEntry(1, 10.0, "a"),
+            "changed.py": SyncIndexEntry(1, 10.0, "b"),
+            "removed.py": SyncIndexEntry(1, 10.0, "c"),
+            "removed.txt": SyncIndexEntry(1, 10.0, "d"),
+        },
+        0.0,
+    )
+    monkeypatch.setattr(
+        sync_functions_module,
+        "list_colab_output_files",
+        lambda sftp_session, transfer_filter: remote_files,
+    )
+    monkeypatch.setattr(
+        sync_functions_module,
+        "get_sync_index",
+        lambda *args: sync_index,
+    )
+    sync_plan = plan_colab_output_sync(
+        SSHClient(),
+        None,
+        "root",
+        "project/output/",
+        TransferFilter(["*.py"], [], None, None),
+    )
+    assert sorted(sync_plan.changed_files) == ["changed.py", "new.py"]
+    assert sync_plan.deleted_keys == ["project/output/removed.py"]
+    assert sync_plan.sync_index is sync_index
+
+
+def test_plan_colab_output_sync_keeps_objects_of_excluded_files(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    sync_index = SyncIndex({"logs/run.log": SyncIndexEntry(1, 1.0, "a")}, 0.0)
+    remote_files: Dict[str, Any] = {}
+    monkeypatch.setattr(
+        sync_functions_module,
+        "list_colab_output_files",
+        lambda sftp_session, transfer_filter: remote_files,
+    )
+    monkeypatch.setattr(
+        sync_functions_module,
+        "get_sync_index",
+        lambda *args: sync_index,
+    )
+    sync_plan = plan_colab_output_sync(
+        SSHClient(),
+        None,
+        "root",
+        "project/output/",
+        TransferFilter([], ["logs"], None, None),
+    )
+    assert sync_plan.changed_files == []
+    assert sync_plan.deleted_keys == []
@@ -0,0 +1,89 @@
+import hashlib
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import pytest
+
+import app.sync_index as sync_index_module
+from app.sync_index import (
+    SyncIndex,
+    SyncIndexEntry,
+    get_chunks_etag,
+    reconcile_sync_index,
+    update_sync_index,
+)
+
+
+def test_chunks_etag_matches_minio_etag() -> None:
+    first_md5 = hashlib.md5(b"first").hexdigest()
+    second_md5 = hashlib.md5(b"second").hexdigest()
+    parts_md5 = hashlib.md5(
+        hashlib.md5(b"first").digest() + hashlib.md5(b"second").digest()
+    )
+    assert get_chunks_etag([first_md5]) == first_md5
+    assert get_chunks_etag([first_md5, second_md5]) == (
+        f"{parts_md5.hexdigest()}-2"
+    )
+    assert get_chunks_etag([]) == hashlib.md5(b"").hexdigest()
+
+
+def test_reconcile_sync_index_keeps_entries_of_unchanged_objects() -> None:
+    modified = datetime(2022, 5, 1, tzinfo=timezone.utc)
+    sync_index = SyncIndex(
+        {
+            "same": SyncIndexEntry(1, 10.0, "a"),
+            "changed": SyncIndexEntry(1, 10.0, "b"),
+            "missing": SyncIndexEntry(1, 10.0, "c"),
+        },
+        0.0,
+    )
+    minio_objects = [
+        {
+            "Key": f"a/output/{name}",
+            "Size": 1,
+            "LastModified": modified,
+            "ETag": f'"{etag}"',
+        }
+        for name, etag in (("same", "a"), ("changed", "x"), ("new", "n"))
+    ]
+    reconciled_index = reconcile_sync_index(
+        sync_index, minio_objects, "a/output/"
+    )
+    assert reconciled_index.files == {
+        "same": SyncIndexEntry(1, 10.0, "a"),
+        "changed": SyncIndexEntry(1, modified.timestamp(), "x"),
+        "new": SyncIndexEntry(1, modified.timestamp(), "n"),
+    }
+    assert reconciled_index.reconciled_at > 0
+
+
+def test_update_sync_index_applies_entries_to_stored_index(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    stored_indexes: Dict[str, Optional[SyncIndex]] = {
+        "a/output.index.json.gz": None
+    }
+    monkeypatch.setattr(
+        sync_index_module,
+        "load_sync_index",
+        lambda minio_client, bucket, index_key: stored_indexes[index_key],
+    )
+    monkeypatch.setattr(
+        sync_index_module,
+        "save_sync_index",
+        lambda minio_client, bucket, index_key, sync_index: (
+            stored_indexes.__setitem__(index_key, sync_index)
+        ),
+    )
+    entry = SyncIndexEntry(1, 10.0, "a")
+    update_sync_index(None, "root", "a/output/", {"new": entry})
+    assert list(stored_indexes.values()) == [None]
+    reconciled_index = SyncIndex({"old": entry, "removed": entry}, 5.0)
+    update_sync_index(
+        None, "root", "a/output/", {"removed": None}, reconciled_index
+    )
+    update_sync_index(None, "root", "a/output/", {"new": entry})
+    assert list(stored_indexes.values()) == [
+        SyncIndex({"old": entry, "new": entry}, 5.0)
+    ]
+    assert reconciled_index.files == {"old": entry, "removed": entry}
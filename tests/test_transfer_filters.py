@@ -0,0 +1,23 @@
+from app.transfer_filters import (
+    TransferFilter,
+    is_directory_excluded,
+    is_file_selected,
+)
+
+
+def test_file_is_selected_by_patterns_and_properties() -> None:
+    transfer_filter = TransferFilter(["*.py", "data/*"], ["*.tmp"], 100, 10.0)
+    assert is_file_selected(transfer_filter, "src/main.py", 10, 20.0)
+    assert is_file_selected(transfer_filter, "data/set.csv", 10, 20.0)
+    assert not is_file_selected(transfer_filter, "notes.txt", 10, 20.0)
+    assert not is_file_selected(transfer_filter, "data/set.tmp", 10, 20.0)
+    assert not is_file_selected(transfer_filter, "main.py", 101, 20.0)
+    assert not is_file_selected(transfer_filter, "main.py", 10, 5.0)
+
+
+def test_excluded_directory_is_not_listed() -> None:
+    transfer_filter = TransferFilter([], ["checkpoints", "logs/*"], None, None)
+    assert is_directory_excluded(transfer_filter, "run/checkpoints")
+    assert is_directory_excluded(transfer_filter, "logs")
+    assert not is_directory_excluded(transfer_filter, "results")
+    assert not is_file_selected(transfer_filter, "checkpoints/a.pt", 1, 0.0)
@@ -0,0 +1,127 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+
+import app.watches as watches_module
+from app.errors import FileIntegrityError
+from app.schemas import SyncActions, SyncFileStatsSchema, WatchColabSchema
+from app.sync_index import SyncIndexEntry, get_chunks_etag
+from app.watches import WatchSession, WatchSupervisor
+
+CREDENTIALS = {
+    "user": "root",
+    "password": "pass",
+    "host": "0.tcp.ngrok.io",
+    "port": 1,
+    "keys_prefix": "project",
+}
+
+
+class Channel:
+    def __init__(self) -> None:
+        self.eof_sent = False
+        self.sent: List[bytes] = []
+
+    def sendall(self, data: bytes) -> None:
+        self.sent.append(data)
+
+
+@pytest.fixture
+def watch() -> WatchSession:
+    return WatchSession("watch", WatchColabSchema(**CREDENTIALS), None, "root")
+
+
+def test_apply_event_deletes_object_of_removed_file(
+    monkeypatch: pytest.MonkeyPatch,
+    watch: WatchSession,
+) -> None:
+    deleted_keys: List[str] = []
+    monkeypatch.setattr(
+        watches_module,
+        "delete_minio_objects",
+        lambda minio_client, bucket, object_keys: deleted_keys.extend(
+            object_keys
+        ),
+    )
+    WatchSupervisor._apply_event(
+        watch, {"path": "a/old.txt", "size": None}, None, Channel()
+    )
+    assert deleted_keys == ["project/output/a/old.txt"]
+    assert watch.index_entries == {"a/old.txt": None}
+    assert watch.files_deleted == 1
+
+
+def test_apply_event_uploads_reported_file(
+    monkeypatch: pytest.MonkeyPatch,
+    watch: WatchSession,
+) -> None:
+    uploads: List[Tuple[Any, ...]] = []
+
+    def upload_file(*args: Any) -> SyncFileStatsSchema:
+        uploads.append(args)
+        return SyncFileStatsSchema(
+            key=args[4],
+            action=SyncActions.uploaded,
+            size=3,
+            elapsed_seconds=0.1,
+        )
+
+    monkeypatch.setattr(
+        watches_module, "upload_colab_file_to_minio", upload_file
+    )
+    event: Dict[str, Any] = {
+        "path": "result.txt",
+        "size": 3,
+        "mtime": 10,
+        "md5": ["md5"],
+    }
+    WatchSupervisor._apply_event(watch, event, None, Channel())
+    assert [(args[2], args[4]) for args in uploads] == [
+        ("result.txt", "project/output/result.txt")
+    ]
+    assert watch.index_entries == {
+        "result.txt": SyncIndexEntry(3, 10, get_chunks_etag(["md5"]))
+    }
+    assert (watch.files_uploaded, watch.bytes_uploaded) == (1, 3)
+
+
+def test_apply_event_requeues_file_that_failed_to_upload(
+    monkeypatch: pytest.MonkeyPatch,
+    watch: WatchSession,
+) -> None:
+    def upload_file(*args: Any) -> SyncFileStatsSchema:
+        raise FileIntegrityError("File result.txt was changed")
+
+    monkeypatch.setattr(
+        watches_module, "upload_colab_file_to_minio", upload_file
+    )
+    monkeypatch.setattr(watches_module, "COLAB_TRANSFER_ATTEMPTS", 2)
+    channel = Channel()
+    event = {"path": "result.txt", "size": 3, "mtime": 10, "md5": ["md5"]}
+    WatchSupervisor._apply_event(watch, event, None, channel)
+    WatchSupervisor._apply_event(watch, event, None, channel)
+    assert channel.sent == [b'"result.txt"\n']
+    assert watch.failed_attempts == {"result.txt": 2}
+    assert watch.files_failed == 2
+    assert watch.index_entries == {}
+
+
+def test_flush_index_saves_buffered_entries_once(
+    monkeypatch: pytest.MonkeyPatch, watch: WatchSession
+) -> None:
+    updates: List[Tuple[str, Dict[str, Optional[SyncIndexEntry]]]] = []
+    monkeypatch.setattr(
+        watches_module,
+        "update_sync_index",
+        lambda minio_client, bucket, output_prefix, entries: updates.append(
+            (output_prefix, entries)
+        ),
+    )
+    entry = SyncIndexEntry(3, 10, get_chunks_etag(["md5"]))
+    watch.index_entries = {"a/old.txt": None, "result.txt": entry}
+    WatchSupervisor._flush_index(watch)
+    WatchSupervisor._flush_index(watch)
+    assert updates == [
+        ("project/output/", {"a/old.txt": None, "result.txt": entry})
+    ]
+    assert watch.index_entries == {}